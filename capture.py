@@ -0,0 +1,241 @@
+# 流量录制与回放：开启 capture 后，把 Farmer.http 的每个请求、响应和每次合约调用及结果连同耗时
+# 写入 gzip 压缩的 JSONL 文件；回放时用录下的数据代替节点和浏览器，供离线分析和性能回归对比
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Deque, List, Tuple
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, RequestException
+from requests.structures import CaseInsensitiveDict
+from settings import cfg
+
+# 每写多少条记录刷新一次文件
+flush_every = 50
+
+
+def capture_path(account: str) -> str:
+    return os.path.join(cfg.path_capture, "{0}-{1}.jsonl.gz".format(account, datetime.now().strftime("%Y%m%d-%H%M%S")))
+
+
+def body_text(body) -> str:
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        return body.decode("utf8", errors="replace")
+    return str(body)
+
+
+class Recorder:
+    def __init__(self, path: str, account: str, param: dict):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.file = gzip.open(path, "wt", encoding="utf8")
+        self.lock = threading.Lock()
+        self.begin = time.monotonic()
+        self.count = 0
+        self.write({"kind": "meta", "account": account, "time": time.time(), "user_param": param})
+
+    def write(self, record: dict):
+        record["t"] = round(time.monotonic() - self.begin, 6)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line + "\n")
+            self.count += 1
+            if self.count % flush_every == 0:
+                self.file.flush()
+
+    # 标记事件（如一轮扫描开始），回放时据此确定扫描次数和每轮扫描时的链上时间
+    def mark(self, name: str, **fields):
+        self.write(dict(fields, kind="mark", name=name))
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+
+# 录制 http：在连接层记录，tenacity 的每次重试、节点探测都会被记录
+class RecordingAdapter(HTTPAdapter):
+    def __init__(self, recorder: Recorder, **kwargs):
+        super().__init__(**kwargs)
+        self.recorder = recorder
+
+    def send(self, request, **kwargs):
+        record = {"kind": "http", "method": request.method, "url": request.url, "body": body_text(request.body)}
+        begin = time.perf_counter()
+        try:
+            resp = super().send(request, **kwargs)
+        except RequestException as e:
+            record.update({"elapsed": time.perf_counter() - begin, "error": "{0}: {1}".format(type(e).__name__, e)})
+            self.recorder.write(record)
+            raise
+        record.update({
+            "elapsed": time.perf_counter() - begin,
+            "status": resp.status_code,
+            "reason": resp.reason,
+            "content_type": resp.headers.get("Content-Type"),
+            "content": resp.content.decode("utf8", errors="replace"),
+        })
+        self.recorder.write(record)
+        return resp
+
+
+def install_recorder(http, recorder: Recorder):
+    adapter = RecordingAdapter(recorder)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+
+
+# 录制签名通道
+def recording_bridge(recorder: Recorder, bridge: Callable) -> Callable:
+    def transact(transaction: dict):
+        record = {"kind": "transact", "transaction": transaction}
+        begin = time.perf_counter()
+        try:
+            success, result = bridge(transaction)
+        except Exception as e:
+            record.update({"elapsed": time.perf_counter() - begin, "error": str(e)})
+            recorder.write(record)
+            raise
+        record.update({"elapsed": time.perf_counter() - begin, "success": success, "result": result})
+        recorder.write(record)
+        return success, result
+    return transact
+
+
+def read_records(path: str) -> List[dict]:
+    with gzip.open(path, "rt", encoding="utf8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def http_key(method: str, url: str, body: str) -> Tuple[str, str, str]:
+    return method, url, body or ""
+
+
+def transact_key(transaction: dict) -> str:
+    return json.dumps(transaction, sort_keys=True)
+
+
+def transact_names(transaction: dict) -> str:
+    return "+".join(action["name"] for action in transaction.get("actions", []))
+
+
+# 按请求匹配录下的记录：相同请求按录制顺序依次返回，用完后重复最后一次；
+# speed 为回放速度倍数，0 表示不等待
+class Replay:
+    def __init__(self, path: str, speed: float = 1.0):
+        records = read_records(path)
+        self.meta: dict = next((item for item in records if item["kind"] == "meta"), {})
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.http: Dict[Tuple, Deque[dict]] = {}
+        self.http_last: Dict[Tuple, dict] = {}
+        self.transacts: Dict[str, Deque[dict]] = {}
+        self.transacts_by_name: Dict[str, Deque[dict]] = {}
+        # 每轮扫描开始时的链上时间戳
+        self.scan_times: List[float] = []
+        self.total = 0
+        self.served = 0
+        self.misses = 0
+        for item in records:
+            if item["kind"] == "http":
+                self.http.setdefault(http_key(item["method"], item["url"], item.get("body")), deque()).append(item)
+                self.total += 1
+            elif item["kind"] == "transact":
+                self.transacts.setdefault(transact_key(item["transaction"]), deque()).append(item)
+                self.transacts_by_name.setdefault(transact_names(item["transaction"]), deque()).append(item)
+                self.total += 1
+            elif item["kind"] == "mark" and item["name"] == "scan":
+                self.scan_times.append(item.get("chain_time"))
+
+    def wait(self, record: dict):
+        if self.speed > 0 and record.get("elapsed"):
+            time.sleep(record["elapsed"] / self.speed)
+
+    def next_http(self, method: str, url: str, body: str) -> dict:
+        key = http_key(method, url, body)
+        with self.lock:
+            queue = self.http.get(key)
+            if queue:
+                record = queue.popleft()
+                self.http_last[key] = record
+                self.served += 1
+                return record
+            record = self.http_last.get(key)
+            if not record:
+                self.misses += 1
+            return record
+
+    def next_transact(self, transaction: dict) -> dict:
+        with self.lock:
+            queue = self.transacts.get(transact_key(transaction))
+            if not queue:
+                queue = self.transacts_by_name.get(transact_names(transaction))
+            if not queue:
+                self.misses += 1
+                return None
+            record = queue.popleft()
+            # 两个索引指向同一条记录，从另一个索引中也移除
+            for index in (self.transacts.get(transact_key(record["transaction"])),
+                          self.transacts_by_name.get(transact_names(record["transaction"]))):
+                if index and record in index:
+                    index.remove(record)
+            self.served += 1
+            return record
+
+
+class ReplayAdapter(HTTPAdapter):
+    def __init__(self, replay: Replay, **kwargs):
+        super().__init__(**kwargs)
+        self.replay = replay
+
+    def send(self, request, **kwargs):
+        record = self.replay.next_http(request.method, request.url, body_text(request.body))
+        if record is None:
+            return self.make_response(request, 404, "Not Recorded", json.dumps({"error": "not recorded"}),
+                                      "application/json")
+        self.replay.wait(record)
+        if record.get("error"):
+            raise RequestsConnectionError("replay: {0}".format(record["error"]), request=request)
+        return self.make_response(request, record["status"], record.get("reason"), record["content"],
+                                  record.get("content_type"))
+
+    @staticmethod
+    def make_response(request, status: int, reason: str, content: str, content_type: str) -> Response:
+        resp = Response()
+        resp.status_code = status
+        resp.reason = reason
+        resp._content = content.encode("utf8")
+        resp.headers = CaseInsensitiveDict({"Content-Type": content_type or "application/json"})
+        resp.encoding = "utf8"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+
+def install_replay(http, replay: Replay):
+    adapter = ReplayAdapter(replay)
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+
+
+def replay_bridge(replay: Replay, error_type: type) -> Callable:
+    def transact(transaction: dict):
+        record = replay.next_transact(transaction)
+        if record is None:
+            return False, "replay: transaction not recorded"
+        replay.wait(record)
+        if record.get("error"):
+            raise error_type(record["error"])
+        return record["success"], record["result"]
+    return transact
@@ -0,0 +1,361 @@
+# 直连浏览器：不经过 chromedriver，用 Chrome DevTools Protocol (CDP) 直接控制 Chrome。
+# POSIX 上通过 --remote-debugging-pipe 的管道通信，Windows 上通过调试端口的 websocket 通信（需要 websocket-client），
+# 整个运行期间只有一条连接。只实现了程序用到的 selenium 接口：
+# execute_script、execute_cdp_cmd、get、find_element（ID、XPATH、CLASS_NAME）、click、quit
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, List, Tuple
+
+
+# 与 selenium 的 By 取值相同，两种后端可以共用
+class By:
+    ID = "id"
+    XPATH = "xpath"
+    CLASS_NAME = "class name"
+    CSS_SELECTOR = "css selector"
+
+
+class CdpException(Exception):
+    pass
+
+
+class NoSuchElementException(CdpException):
+    pass
+
+
+class JavascriptException(CdpException):
+    pass
+
+
+# 页面加载超时（秒）
+page_load_timeout = 300
+# 查找元素的轮询间隔（秒）
+find_interval = 0.5
+
+chrome_names = ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"]
+chrome_paths = [
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+    os.path.expandvars(r"%LOCALAPPDATA%\Google\Chrome\Application\chrome.exe"),
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+
+
+def find_chrome() -> str:
+    for name in chrome_names:
+        path = shutil.which(name)
+        if path:
+            return path
+    for path in chrome_paths:
+        if os.path.exists(path):
+            return path
+    raise CdpException("找不到Chrome，请在 user.yml 中设置 chrome_path")
+
+
+# 管道通信：Chrome 从 fd 3 读取命令，向 fd 4 写入结果，消息以 \0 分隔
+class PipeTransport:
+    def __init__(self, args: List[str]):
+        to_chrome_r, to_chrome_w = os.pipe()
+        from_chrome_r, from_chrome_w = os.pipe()
+
+        # 两端先作为子进程的 stdin、stdout 传入（由 subprocess 安全地完成），再由 sh 移到 fd 3、4 后 exec Chrome，
+        # 不用 preexec_fn（多线程时不安全）；其他描述符不继承，父进程关闭写端后 Chrome 能读到 EOF
+        command = ["/bin/sh", "-c", 'exec "$@" 3<&0 4>&1 0</dev/null 1>/dev/null', "sh"]
+        self.process = subprocess.Popen(command + args + ["--remote-debugging-pipe"], stdin=to_chrome_r,
+                                        stdout=from_chrome_w, stderr=subprocess.DEVNULL)
+        os.close(to_chrome_r)
+        os.close(from_chrome_w)
+        self.writer = to_chrome_w
+        self.reader = from_chrome_r
+        self.buffer = b""
+
+    def send(self, text: str):
+        data = text.encode() + b"\0"
+        while data:
+            written = os.write(self.writer, data)
+            data = data[written:]
+
+    # 连接断开时返回 None
+    def recv(self) -> str:
+        while b"\0" not in self.buffer:
+            chunk = os.read(self.reader, 1 << 16)
+            if not chunk:
+                return None
+            self.buffer += chunk
+        message, self.buffer = self.buffer.split(b"\0", 1)
+        return message.decode()
+
+    def close(self):
+        for fd in (self.writer, self.reader):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+# 端口通信：Chrome 把调试端口写在用户目录的 DevToolsActivePort 文件里
+class SocketTransport:
+    def __init__(self, args: List[str], data_dir: str, timeout: float = 30):
+        try:
+            import websocket
+        except ImportError:
+            raise CdpException("直连浏览器需要安装 websocket-client: pip install websocket-client")
+        port_file = os.path.join(data_dir, "DevToolsActivePort")
+        if os.path.exists(port_file):
+            os.remove(port_file)
+        self.process = subprocess.Popen(args + ["--remote-debugging-port=0"], stdin=subprocess.DEVNULL,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + timeout
+        lines = []
+        while len(lines) < 2:
+            if time.monotonic() > deadline or self.process.poll() is not None:
+                raise CdpException("Chrome启动失败，未能获取调试端口")
+            time.sleep(0.1)
+            try:
+                with open(port_file, "r", encoding="utf8") as file:
+                    lines = file.read().split()
+            except OSError:
+                continue
+        url = "ws://127.0.0.1:{0}{1}".format(lines[0], lines[1])
+        self.ws = websocket.create_connection(url, suppress_origin=True, enable_multithread=True)
+        self.closed_errors = (websocket.WebSocketConnectionClosedException, OSError)
+
+    def send(self, text: str):
+        try:
+            self.ws.send(text)
+        except self.closed_errors as e:
+            raise BrokenPipeError(str(e))
+
+    def recv(self) -> str:
+        try:
+            return self.ws.recv() or None
+        except self.closed_errors:
+            return None
+
+    def close(self):
+        self.ws.close()
+
+
+# 一条持久连接：后台线程读取消息，按 id 分发命令结果，按 (会话, 事件名) 分发事件
+class Connection:
+    def __init__(self, transport):
+        self.transport = transport
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.next_id = 0
+        self.pending: Dict[int, Future] = {}
+        self.waiters: Dict[Tuple[str, str], List[Future]] = {}
+        self.closed = False
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+
+    def read_loop(self):
+        while True:
+            try:
+                text = self.transport.recv()
+            except OSError:
+                text = None
+            if text is None:
+                break
+            message = json.loads(text)
+            if "id" in message:
+                with self.lock:
+                    future = self.pending.pop(message["id"], None)
+                if not future:
+                    continue
+                if "error" in message:
+                    future.set_exception(CdpException(message["error"].get("message")))
+                else:
+                    future.set_result(message.get("result", {}))
+            elif "method" in message:
+                with self.lock:
+                    futures = self.waiters.pop((message.get("sessionId"), message["method"]), [])
+                for future in futures:
+                    future.set_result(message.get("params", {}))
+        with self.lock:
+            self.closed = True
+            futures = list(self.pending.values())
+            self.pending.clear()
+        for future in futures:
+            future.set_exception(CdpException("浏览器连接已断开"))
+
+    def send(self, method: str, params: dict = None, session_id: str = None, timeout: float = None) -> dict:
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise CdpException("浏览器连接已断开")
+            self.next_id += 1
+            message = {"id": self.next_id, "method": method, "params": params or {}}
+            if session_id:
+                message["sessionId"] = session_id
+            self.pending[self.next_id] = future
+        # 单独的写锁：多个线程同时发送时消息不会交错，写入阻塞时也不影响读取线程分发结果
+        try:
+            with self.send_lock:
+                self.transport.send(json.dumps(message))
+        except OSError as e:
+            with self.lock:
+                self.pending.pop(message["id"], None)
+            raise CdpException("浏览器连接已断开: {0}".format(e))
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            with self.lock:
+                self.pending.pop(message["id"], None)
+            raise CdpException("{0} 超时".format(method))
+
+    # 在发出命令前调用，返回的 Future 在收到事件时完成
+    def expect_event(self, method: str, session_id: str = None) -> Future:
+        future = Future()
+        with self.lock:
+            self.waiters.setdefault((session_id, method), []).append(future)
+        return future
+
+
+# 在 this（document 或元素）下查找第一个匹配的元素
+find_js = """function(by, value) {
+    if (by === "id") return this.querySelector("#" + CSS.escape(value));
+    if (by === "class name") return this.querySelector("." + CSS.escape(value));
+    if (by === "css selector") return this.querySelector(value);
+    if (by === "xpath") {
+        var doc = this.ownerDocument || this;
+        return doc.evaluate(value, this, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    throw new Error("unsupported locator: " + by);
+}"""
+
+# 滚动到可见位置，返回元素中心的坐标
+center_js = """function() {
+    this.scrollIntoView({block: "center", inline: "center"});
+    var rect = this.getBoundingClientRect();
+    return [rect.left + rect.width / 2, rect.top + rect.height / 2, rect.width, rect.height];
+}"""
+
+
+class CdpElement:
+    def __init__(self, driver: "CdpDriver", object_id: str):
+        self.driver = driver
+        self.object_id = object_id
+
+    def find_element(self, by: str, value: str) -> "CdpElement":
+        return self.driver.find_from(lambda: self.object_id, by, value)
+
+    # 与 selenium 一样是真实的鼠标点击，而不是 js 的 click()
+    def click(self):
+        result = self.driver.command("Runtime.callFunctionOn", {
+            "functionDeclaration": center_js,
+            "objectId": self.object_id,
+            "returnByValue": True,
+        })
+        x, y, width, height = result["result"]["value"]
+        if width == 0 or height == 0:
+            raise CdpException("元素不可见，无法点击")
+        self.driver.command("Input.dispatchMouseEvent", {"type": "mouseMoved", "x": x, "y": y})
+        for event in ("mousePressed", "mouseReleased"):
+            self.driver.command("Input.dispatchMouseEvent", {
+                "type": event, "x": x, "y": y, "button": "left", "clickCount": 1})
+
+
+class CdpDriver:
+    def __init__(self, chrome_path: str, data_dir: str, arguments: List[str]):
+        args = [chrome_path, "--user-data-dir={0}".format(data_dir), "--no-first-run",
+                "--no-default-browser-check"] + arguments + ["about:blank"]
+        if os.name == "posix":
+            self.transport = PipeTransport(args)
+        else:
+            self.transport = SocketTransport(args, data_dir)
+        self.process: subprocess.Popen = self.transport.process
+        self.conn = Connection(self.transport)
+        # 查找元素最多等待的时间，执行脚本的超时时间（秒）
+        self.implicit_wait: float = 0
+        self.script_timeout: float = 30
+        self.session_id = self.attach_page()
+        self.command("Page.enable")
+
+    def attach_page(self) -> str:
+        targets = self.conn.send("Target.getTargets", timeout=30)["targetInfos"]
+        pages = [item for item in targets if item["type"] == "page"]
+        if pages:
+            target_id = pages[0]["targetId"]
+        else:
+            target_id = self.conn.send("Target.createTarget", {"url": "about:blank"}, timeout=30)["targetId"]
+        result = self.conn.send("Target.attachToTarget", {"targetId": target_id, "flatten": True}, timeout=30)
+        return result["sessionId"]
+
+    def command(self, method: str, params: dict = None, timeout: float = 30) -> dict:
+        return self.conn.send(method, params, self.session_id, timeout)
+
+    def implicitly_wait(self, seconds: float):
+        self.implicit_wait = seconds
+
+    def set_script_timeout(self, seconds: float):
+        self.script_timeout = seconds
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict) -> dict:
+        return self.command(cmd, cmd_args)
+
+    # 与 selenium 相同：script 是函数体，参数为 arguments，返回 Promise 时等待其完成
+    def execute_script(self, script: str, *args):
+        expression = "(function() {{\n{0}\n}}).apply(window, {1})".format(script, json.dumps(list(args)))
+        result = self.command("Runtime.evaluate", {
+            "expression": expression,
+            "awaitPromise": True,
+            "returnByValue": True,
+            "userGesture": True,
+        }, timeout=self.script_timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise JavascriptException(details.get("exception", {}).get("description") or details.get("text"))
+        return result["result"].get("value")
+
+    def get(self, url: str):
+        loaded = self.conn.expect_event("Page.loadEventFired", self.session_id)
+        result = self.command("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise CdpException("打开页面失败: {0}".format(result["errorText"]))
+        try:
+            loaded.result(page_load_timeout)
+        except FutureTimeout:
+            raise CdpException("页面加载超时: {0}".format(url))
+
+    def document_id(self) -> str:
+        result = self.command("Runtime.evaluate", {"expression": "document"})
+        return result["result"]["objectId"]
+
+    def find_element(self, by: str, value: str) -> CdpElement:
+        return self.find_from(self.document_id, by, value)
+
+    # 按隐式等待时间轮询查找，root 每次重新获取，页面刷新后不会失效
+    def find_from(self, root, by: str, value: str) -> CdpElement:
+        deadline = time.monotonic() + self.implicit_wait
+        while True:
+            result = self.command("Runtime.callFunctionOn", {
+                "functionDeclaration": find_js,
+                "objectId": root(),
+                "arguments": [{"value": by}, {"value": value}],
+            })
+            if "exceptionDetails" in result:
+                raise JavascriptException(result["exceptionDetails"].get("text"))
+            object_id = result["result"].get("objectId")
+            if object_id:
+                return CdpElement(self, object_id)
+            if time.monotonic() >= deadline:
+                raise NoSuchElementException("找不到元素: {0}={1}".format(by, value))
+            time.sleep(find_interval)
+
+    def quit(self):
+        try:
+            self.conn.send("Browser.close", timeout=5)
+        except CdpException:
+            pass
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.transport.close()
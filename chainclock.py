@@ -0,0 +1,53 @@
+# 链上时间：用 get_info 的 head_block_time 估计本机时间与链上时间的偏差，
+# 可操作时间都以链上时间为准，避免本机时间不准导致过早操作（合约报错）或过晚操作（少收益）
+import time
+from datetime import datetime, timedelta, timezone
+import requests
+
+# 出块间隔，head_block_time 比真实的链上时间晚 0 ~ 0.5 秒
+block_interval = 0.5
+
+
+def parse_block_time(text: str) -> float:
+    t = datetime.fromisoformat(text.rstrip("Z")).replace(tzinfo=timezone.utc)
+    return t.timestamp()
+
+
+class ChainClock:
+    def __init__(self, default_padding: float):
+        # 链上时间 - 本机时间（秒）
+        self.offset = 0.0
+        # 偏差的误差范围（秒），未同步时使用默认值
+        self.uncertainty = default_padding
+        self.synced = False
+        self.last_sync: float = 0
+
+    # 采样几次，取往返耗时最短的一次：偏差 = 区块时间 + 半个出块间隔 - 请求中点的本机时间，
+    # 误差 = 往返耗时的一半 + 半个出块间隔
+    def sync(self, http: requests.Session, url_rpc: str, samples: int = 3):
+        # 失败时也要等下一个同步周期再试
+        self.last_sync = time.monotonic()
+        best = None
+        for _ in range(samples):
+            begin = time.time()
+            resp = http.post(url_rpc + "get_info", timeout=5)
+            end = time.time()
+            resp.raise_for_status()
+            head = parse_block_time(resp.json()["head_block_time"])
+            offset = head + block_interval / 2 - (begin + end) / 2
+            uncertainty = (end - begin) / 2 + block_interval / 2
+            if best is None or uncertainty < best[1]:
+                best = (offset, uncertainty)
+        self.offset, self.uncertainty = best
+        self.synced = True
+
+    # 以本机时区表示的链上当前时间，与 datetime.fromtimestamp(链上时间戳) 可直接比较
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(time.time() + self.offset)
+
+    # 可操作时间之后再等多久才操作
+    def padding(self) -> timedelta:
+        return timedelta(seconds=self.uncertainty)
+
+    def show(self) -> str:
+        return "链上时间偏差{0:+.2f}秒 误差±{1:.2f}秒".format(self.offset, self.uncertainty)
@@ -0,0 +1,225 @@
+# 多账号面板：每个账号一个独立的 main.py 进程，界面只读取各账号输出的状态文件
+from PyQt6.QtWidgets import *
+from PyQt6.QtCore import Qt, QTimer, QProcess
+from PyQt6 import QtGui
+from typing import List
+import fleet
+import glob
+import sys
+import os
+import state
+from settings import cfg
+
+version = "1.2"
+
+columns = ["账号", "进程", "阶段", "能量", "金币", "木头", "食物", "下次操作时间", "错误次数", "合约耗时", "状态更新时间"]
+
+
+def resource_path(relative_path):
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, relative_path)
+
+
+# 启动单个账号的命令行
+def farmer_command(config_file: str, account: str):
+    if getattr(sys, 'frozen', False):
+        return os.path.join(os.path.dirname(sys.executable), "main.exe"), [config_file, account]
+    return sys.executable, [resource_path("main.py"), config_file, account]
+
+
+class AccountProcess:
+    def __init__(self, config_file: str, account: str):
+        self.config_file = config_file
+        self.account = account
+        self.process: QProcess = None
+        self.state_mtime = 0.0
+        self.state: dict = None
+
+    def running(self) -> bool:
+        return self.process is not None and self.process.state() != QProcess.ProcessState.NotRunning
+
+    # 非阻塞启动
+    def start(self):
+        if self.running():
+            return
+        program, args = farmer_command(os.path.abspath(self.config_file), self.account)
+        self.process = QProcess()
+        # 与面板使用同一工作目录，状态文件、日志、浏览器数据目录保持一致
+        self.process.setWorkingDirectory(os.getcwd())
+        # 日志已写入文件，这里不再收集子进程输出
+        self.process.setStandardOutputFile(QProcess.nullDevice())
+        self.process.setStandardErrorFile(QProcess.nullDevice())
+        self.process.start(program, args)
+
+    # 非阻塞停止：先通过管道请求程序自行退出（会关闭浏览器），超时后强制结束
+    def stop(self):
+        if not self.running():
+            return
+        self.process.write(b"stop\n")
+        process = self.process
+        QTimer.singleShot(cfg.dashboard_stop_timeout * 1000, lambda: self.kill_if_running(process))
+
+    @staticmethod
+    def kill_if_running(process: QProcess):
+        if process.state() != QProcess.ProcessState.NotRunning:
+            process.kill()
+
+    def process_text(self) -> str:
+        if self.process is None:
+            return "未启动"
+        if self.running():
+            return "运行中[{0}]".format(self.process.processId())
+        return "已退出[{0}]".format(self.process.exitCode())
+
+
+class Dashboard(QWidget):
+    def __init__(self, config_files: List[str], parent=None):
+        super().__init__(parent)
+        self.accounts: List[AccountProcess] = []
+        self.closing = False
+        self.setWindowTitle("农民世界助手{0} 多账号面板".format(version))
+        self.setWindowIcon(QtGui.QIcon(resource_path("favicon.ico")))
+        self.resize(1100, 500)
+
+        self.table = QTableWidget(0, len(columns), self)
+        self.table.setHorizontalHeaderLabels(columns)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+
+        button_add = QPushButton("添加账号", self)
+        button_add.clicked.connect(self.add_dialog)
+        button_start = QPushButton("启动选中", self)
+        button_start.clicked.connect(lambda: self.for_selected(AccountProcess.start))
+        button_stop = QPushButton("停止选中", self)
+        button_stop.clicked.connect(lambda: self.for_selected(AccountProcess.stop))
+        button_start_all = QPushButton("全部启动", self)
+        button_start_all.clicked.connect(lambda: self.for_all(AccountProcess.start))
+        button_stop_all = QPushButton("全部停止", self)
+        button_stop_all.clicked.connect(lambda: self.for_all(AccountProcess.stop))
+        buttons = QHBoxLayout()
+        for button in [button_add, button_start, button_stop, button_start_all, button_stop_all]:
+            buttons.addWidget(button)
+        buttons.addStretch()
+        layout = QVBoxLayout(self)
+        layout.addLayout(buttons)
+        layout.addWidget(self.table)
+
+        for config_file in config_files:
+            self.add_account(config_file)
+
+        # 定时读取状态文件，文件未变化时不解析
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+    def add_dialog(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "选择账号配置", ".", "YAML (*.yml *.yaml)")
+        for config_file in files:
+            self.add_account(config_file)
+
+    def add_account(self, config_file: str):
+        # 多账号配置文件中的每个账号各占一行
+        for account in fleet.fleet_accounts(fleet.read_yaml(config_file)):
+            self.add_row(config_file, account)
+
+    def add_row(self, config_file: str, account: str):
+        if any(item.account == account for item in self.accounts):
+            return
+        self.accounts.append(AccountProcess(config_file, account))
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        for col in range(len(columns)):
+            self.table.setItem(row, col, QTableWidgetItem(""))
+        self.table.item(row, 0).setText(account)
+        self.refresh_row(row, force=True)
+
+    def for_selected(self, action):
+        rows = sorted({index.row() for index in self.table.selectedIndexes()})
+        for row in rows:
+            action(self.accounts[row])
+
+    def for_all(self, action):
+        for item in self.accounts:
+            action(item)
+
+    def refresh(self):
+        for row in range(len(self.accounts)):
+            self.refresh_row(row)
+        if self.closing and not any(item.running() for item in self.accounts):
+            self.close()
+
+    def refresh_row(self, row: int, force=False):
+        item = self.accounts[row]
+        self.table.item(row, 1).setText(item.process_text())
+        mtime = state.state_mtime(item.account)
+        if not force and mtime == item.state_mtime:
+            return
+        item.state_mtime = mtime
+        s = state.read_state(item.account)
+        if not s:
+            return
+        item.state = s
+        values = [
+            s.get("stage"),
+            self.show_pair(s.get("energy"), s.get("max_energy")),
+            self.show_number(s.get("gold")),
+            self.show_number(s.get("wood")),
+            self.show_number(s.get("food")),
+            s.get("next_operate_time"),
+            s.get("count_error_total"),
+            "{0:.2f}s".format(s["last_transact_latency"]) if s.get("last_transact_latency") is not None else None,
+            s.get("updated"),
+        ]
+        for col, value in enumerate(values, start=2):
+            self.table.item(row, col).setText("" if value is None else str(value))
+
+    @staticmethod
+    def show_number(value) -> str:
+        return "" if value is None else "{0:.2f}".format(value)
+
+    @staticmethod
+    def show_pair(value, max_value) -> str:
+        if value is None:
+            return ""
+        return "{0:.0f}/{1:.0f}".format(value, max_value)
+
+    # 有账号在运行时先发出停止请求，等全部退出后由定时器再次关闭窗口
+    def closeEvent(self, event: QtGui.QCloseEvent):
+        running = [item for item in self.accounts if item.running()]
+        if not running:
+            event.accept()
+            return
+        if not self.closing:
+            ret = QMessageBox.question(self, "退出", "还有{0}个账号在运行，是否全部停止并退出？".format(len(running)))
+            if ret != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+            self.closing = True
+            self.setWindowTitle("正在停止全部账号，请稍等...")
+            for item in running:
+                item.stop()
+        event.ignore()
+
+
+# 命令行参数可以是多个配置文件，也可以是配置文件所在的目录
+def collect_config_files(args: List[str]) -> List[str]:
+    files = []
+    for arg in args:
+        if os.path.isdir(arg):
+            files.extend(sorted(glob.glob(os.path.join(arg, "*.yml"))))
+        else:
+            files.append(arg)
+    return files
+
+
+def main():
+    app = QApplication(sys.argv)
+    ui = Dashboard(collect_config_files(sys.argv[1:]))
+    ui.show()
+    sys.exit(app.exec())
+
+
+if __name__ == '__main__':
+    main()
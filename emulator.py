@@ -0,0 +1,387 @@
+# 本地模拟链：在内存里模拟 wax 节点（get_info、get_table_rows、余额）、原子市场接口和交易签名，
+# 用于压测，延迟和出错率可配置。只模拟压测用到的玩法：工具采矿、种地、喂鸡。
+# 成功的交易和铸造推送到各账号的本地动作流（LocalActionFeed），也可以模拟其他设备上的操作和别人的转账
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List
+from urllib.parse import urlparse, parse_qs
+from actionfeed import LocalActionFeed
+from farmer import BridgeException
+from res import NFT
+
+
+@dataclass
+class Distribution:
+    # 平均延迟（秒）和抖动（秒），出错率（0~1）
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+
+    def delay(self):
+        value = random.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        if value > 0:
+            time.sleep(value)
+
+    def failed(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+# 游戏配置，charge 为所有东西统一的操作间隔（秒），压测时调小以产生足够的操作
+def config_tables(charge: int) -> Dict[str, List[dict]]:
+    return {
+        "toolconfs": [{"template_id": 203881, "template_name": "Axe", "type": "Wood", "charged_time": charge,
+                       "energy_consumed": 10, "durability_consumed": 5}],
+        "cropconf": [{"template_id": NFT.BarleySeed, "name": "Barley Seed", "charge_time": charge,
+                      "energy_consumed": 60, "required_claims": 1000000}],
+        "anmconf": [{"template_id": 298614, "name": "Chicken", "energy_consumed": 35, "charge_time": charge,
+                     "required_claims": 1000000, "daily_claim_limit": 1000000, "consumed_card": NFT.Barley,
+                     "required_building": 298591}],
+        "mbsconf": [],
+        "config": [{"fee": 5}],
+    }
+
+
+@dataclass
+class Account:
+    name: str
+    energy: float = 5000
+    max_energy: float = 5000
+    food: float = 100000
+    tools: Dict[str, dict] = field(default_factory=dict)
+    crops: Dict[str, dict] = field(default_factory=dict)
+    animals: Dict[str, dict] = field(default_factory=dict)
+    # 箱子 {asset_id: template_id}
+    assets: Dict[str, int] = field(default_factory=dict)
+
+
+class ChainEmulator:
+    def __init__(self, charge: int, rpc: Distribution, assets: Distribution, sign: Distribution):
+        self.charge = charge
+        self.rpc_dist = rpc
+        self.assets_dist = assets
+        self.sign_dist = sign
+        self.tables = config_tables(charge)
+        self.accounts: Dict[str, Account] = {}
+        # 各账号的动作流
+        self.feeds: Dict[str, LocalActionFeed] = {}
+        self.lock = threading.Lock()
+        self.next_asset_id = 1099500000000
+        # 统计
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.request_errors = 0
+        self.transactions = 0
+        self.transaction_errors = 0
+        self.claims = 0
+        # 其他设备上的操作次数
+        self.external_claims = 0
+        # 每次操作的延迟：到达模拟链的时间 - 可操作时间（秒）
+        self.lags: List[float] = []
+        self.server: ThreadingHTTPServer = None
+
+    def new_asset_id(self) -> str:
+        self.next_asset_id += 1
+        return str(self.next_asset_id)
+
+    # 添加一个账号：tools 把斧头、crops 块大麦田、animals 只鸡，各自的首次可操作时间在一个周期内随机分布
+    def add_account(self, name: str, tools: int, crops: int, animals: int):
+        now = time.time()
+        account = Account(name)
+        for _ in range(tools):
+            asset_id = self.new_asset_id()
+            account.tools[asset_id] = {"asset_id": asset_id, "owner": name, "type": "Wood", "template_id": 203881,
+                                       "durability": 1000000, "current_durability": 1000000,
+                                       "next_availability": int(now + random.uniform(0, self.charge))}
+        for _ in range(crops):
+            asset_id = self.new_asset_id()
+            account.crops[asset_id] = {"asset_id": asset_id, "owner": name, "name": "Barley Seed",
+                                       "template_id": NFT.BarleySeed, "times_claimed": 0,
+                                       "last_claimed": int(now),
+                                       "next_availability": int(now + random.uniform(0, self.charge))}
+        for _ in range(animals):
+            asset_id = self.new_asset_id()
+            account.animals[asset_id] = {"asset_id": asset_id, "owner": name, "name": "Chicken",
+                                         "template_id": 298614, "times_claimed": 0, "day_claims_at": [],
+                                         "last_claimed": int(now),
+                                         "next_availability": int(now + random.uniform(0, self.charge))}
+        for _ in range(animals * 1000):
+            account.assets[self.new_asset_id()] = NFT.Barley
+        with self.lock:
+            self.accounts[name] = account
+            self.feeds[name] = LocalActionFeed()
+
+    def action_feed(self, name: str) -> LocalActionFeed:
+        return self.feeds[name]
+
+    def count(self, name: str, value=1):
+        with self.stats_lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    # ======== wax 节点 ========
+    def get_table_rows(self, body: dict) -> dict:
+        table = body["table"]
+        if table in self.tables:
+            return {"rows": self.tables[table], "more": False}
+        with self.lock:
+            if table == "accounts":
+                account = self.accounts.get(body["lower_bound"])
+                if not account:
+                    return {"rows": []}
+                return {"rows": [{"account": account.name, "energy": account.energy,
+                                  "max_energy": account.max_energy,
+                                  "balances": ["0.0000 GOLD", "0.0000 WOOD",
+                                               "{0:.4f} FOOD".format(account.food)]}]}
+            rows = []
+            for account in self.accounts.values():
+                items = {"tools": account.tools, "crops": account.crops, "animals": account.animals}.get(table)
+                if items is None:
+                    continue
+                if body.get("index_position") == 1:
+                    row = items.get(str(body["lower_bound"]))
+                    if row:
+                        rows.append(dict(row))
+                elif account.name == body["lower_bound"]:
+                    rows.extend(dict(row) for row in items.values())
+            return {"rows": rows, "more": False}
+
+    def rpc(self, path: str, body: dict):
+        if path.endswith("/get_info"):
+            head = datetime.now(timezone.utc).replace(tzinfo=None)
+            head = head.replace(microsecond=head.microsecond // 500000 * 500000)
+            return {"head_block_time": head.isoformat(timespec="milliseconds"), "head_block_num": 1}
+        if path.endswith("/get_table_rows"):
+            return self.get_table_rows(body)
+        if path.endswith("/get_currency_balance"):
+            return ["0.0000 FWF", "0.0000 FWG", "0.0000 FWW"]
+        if path.endswith("/get_account"):
+            return {"account_name": body.get("account_name")}
+        return None
+
+    # ======== 原子市场 ========
+    def atomic(self, path: str, query: dict):
+        if path.startswith("/atomicassets/v1/accounts/"):
+            name = path.split("/")[4]
+            with self.lock:
+                account = self.accounts.get(name)
+                counts = {}
+                for template_id in account.assets.values() if account else []:
+                    counts[template_id] = counts.get(template_id, 0) + 1
+            templates = [{"template_id": str(key), "assets": str(value)} for key, value in counts.items()]
+            return {"success": True, "data": {"templates": templates}}
+        if path == "/atomicassets/v1/assets":
+            template_id = int(query.get("template_id", ["0"])[0])
+            limit = int(query.get("limit", ["100"])[0])
+            with self.lock:
+                account = self.accounts.get(query.get("owner", [""])[0])
+                ids = sorted(key for key, value in account.assets.items() if value == template_id) if account else []
+            data = [{"asset_id": asset_id, "name": "Barley", "is_transferable": True,
+                     "schema": {"schema_name": "foods"}, "template": {"template_id": str(template_id)}}
+                    for asset_id in ids[:limit]]
+            return {"success": True, "data": data}
+        return None
+
+    # ======== 签名 ========
+    # 替代浏览器里的 waxjs：返回 (是否成功, 交易结果或错误信息)
+    def bridge(self, account_name: str):
+        def transact(transaction: dict):
+            self.sign_dist.delay()
+            if self.sign_dist.failed():
+                self.count("transaction_errors")
+                if random.random() < 0.5:
+                    raise BridgeException("network error: simulated")
+                return False, "billed CPU time (300 us) is greater than the maximum billable CPU time"
+            arrived = time.time()
+            with self.lock:
+                account = self.accounts[account_name]
+                minted = []
+                for action in transaction["actions"]:
+                    error = self.apply(account, action, arrived, minted)
+                    if error:
+                        self.count("transaction_errors")
+                        return False, "assertion failure with message: {0}".format(error)
+                trx_id = "{0:064x}".format(random.getrandbits(256))
+                self.publish(account_name, transaction["actions"] + minted, arrived, trx_id)
+            self.count("transactions")
+            return True, {"transaction_id": trx_id}
+        return transact
+
+    # 把一笔交易的动作推送到账号的动作流
+    def publish(self, account_name: str, actions: List[dict], now: float, trx_id: str):
+        feed = self.feeds[account_name]
+        for action in actions:
+            feed.push(action["account"], action["name"], action["data"], datetime.fromtimestamp(now), trx_id)
+
+    # 模拟其他设备上的操作：随机收获或喂养一个到期的东西，交易推送到动作流，不计入压测的操作数
+    def external_claim(self, account_name: str) -> bool:
+        now = time.time()
+        with self.lock:
+            account = self.accounts[account_name]
+            ready = [("claim", "asset_id", key) for key, row in account.tools.items()
+                     if row["next_availability"] <= now]
+            ready += [("cropclaim", "crop_id", key) for key, row in account.crops.items()
+                      if row["next_availability"] <= now]
+            food = [key for key, value in account.assets.items() if value == NFT.Barley]
+            if food:
+                ready += [("feed", None, key) for key, row in account.animals.items()
+                          if row["next_availability"] <= now]
+            if not ready:
+                return False
+            name, field_name, key = random.choice(ready)
+            if name == "feed":
+                action = {"account": "atomicassets", "name": "transfer",
+                          "data": {"from": account_name, "to": "farmersworld", "asset_ids": [food[0]],
+                                   "memo": "feed_animal:{0}".format(key)}}
+            else:
+                action = {"account": "farmersworld", "name": name,
+                          "data": {field_name: key, "owner": account_name}}
+            minted = []
+            if self.apply(account, action, now, minted, counted=False):
+                return False
+            self.count("external_claims")
+            self.publish(account_name, [action] + minted, now, "{0:064x}".format(random.getrandbits(256)))
+            return True
+
+    # 别人转入 count 个资产，推送 atomicassets 的 transfer
+    def gift(self, account_name: str, template_id: int, count: int):
+        with self.lock:
+            account = self.accounts[account_name]
+            asset_ids = [self.new_asset_id() for _ in range(count)]
+            for asset_id in asset_ids:
+                account.assets[asset_id] = template_id
+            action = {"account": "atomicassets", "name": "transfer",
+                      "data": {"from": "gift.wam", "to": account_name, "asset_ids": asset_ids, "memo": ""}}
+            self.publish(account_name, [action], time.time(), "{0:064x}".format(random.getrandbits(256)))
+
+    # counted 为 False 时不计入压测统计（其他设备上的操作）
+    def claim(self, account: Account, row: dict, energy: float, now: float, counted: bool = True):
+        if now < row["next_availability"]:
+            return "not ready"
+        if account.energy < energy:
+            return "not enough energy"
+        account.energy -= energy
+        if counted:
+            with self.stats_lock:
+                self.lags.append(now - row["next_availability"])
+                self.claims += 1
+        row["next_availability"] = int(now) + self.charge
+        row["last_claimed"] = int(now)
+        return None
+
+    # minted 收集交易中铸造的资产（atomicassets 的 logmint 动作）
+    def apply(self, account: Account, action: dict, now: float, minted: List[dict], counted: bool = True):
+        name = action["name"]
+        data = action["data"]
+        if name == "claim":
+            row = account.tools.get(str(data["asset_id"]))
+            if not row:
+                return "tool not found"
+            error = self.claim(account, row, 10, now, counted)
+            if not error:
+                row["current_durability"] -= 5
+            return error
+        if name == "cropclaim":
+            row = account.crops.get(str(data["crop_id"]))
+            if not row:
+                return "crop not found"
+            error = self.claim(account, row, 60, now, counted)
+            if not error:
+                row["times_claimed"] += 1
+                # 每次收获产出一个大麦
+                asset_id = self.new_asset_id()
+                account.assets[asset_id] = NFT.Barley
+                minted.append({"account": "atomicassets", "name": "logmint",
+                               "data": {"asset_id": asset_id, "template_id": NFT.Barley,
+                                        "new_asset_owner": account.name}})
+            return error
+        if name == "transfer" and data.get("memo", "").startswith("feed_animal:"):
+            row = account.animals.get(data["memo"].split(":")[1])
+            if not row:
+                return "animal not found"
+            food = [str(item) for item in data["asset_ids"]]
+            if any(account.assets.get(item) != NFT.Barley for item in food):
+                return "wrong food"
+            error = self.claim(account, row, 35, now, counted)
+            if not error:
+                row["times_claimed"] += 1
+                row["day_claims_at"] = (row["day_claims_at"] + [int(now)])[-10:]
+                for item in food:
+                    del account.assets[item]
+            return error
+        if name == "recover":
+            count = data["energy_recovered"]
+            account.energy = min(account.energy + count, account.max_energy)
+            account.food -= count / 5
+            return None
+        return None
+
+    # ======== http ========
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status: int, value):
+                content = json.dumps(value).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def handle_request(self, body: dict):
+                url = urlparse(self.path)
+                dist = emulator.rpc_dist if url.path.startswith("/v1/") else emulator.assets_dist
+                emulator.count("requests")
+                dist.delay()
+                if dist.failed():
+                    emulator.count("request_errors")
+                    self.reply(500, {"error": "simulated"})
+                    return
+                if url.path == "/health":
+                    result = {"success": True}
+                elif url.path.startswith("/v1/"):
+                    result = emulator.rpc(url.path, body)
+                else:
+                    result = emulator.atomic(url.path, parse_qs(url.query))
+                if result is None:
+                    self.reply(404, {"error": "not found"})
+                else:
+                    self.reply(200, result)
+
+            def do_GET(self):
+                self.handle_request({})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                self.handle_request(json.loads(raw) if raw else {})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return "http://{0}:{1}".format(host, self.server.server_address[1])
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    # 取出并清空统计
+    def take_stats(self) -> dict:
+        with self.stats_lock:
+            stats = {"requests": self.requests, "request_errors": self.request_errors,
+                     "transactions": self.transactions, "transaction_errors": self.transaction_errors,
+                     "claims": self.claims, "external_claims": self.external_claims, "lags": self.lags}
+            self.requests = self.request_errors = self.transactions = self.transaction_errors = self.claims = 0
+            self.external_claims = 0
+            self.lags = []
+        return stats
@@ -1,10 +1,6 @@
 #!/usr/bin/python3
 import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import WebDriverException
+# selenium 较重，在启动浏览器时才导入，以便游戏配置的加载可以先开始
 import tenacity
 from tenacity import stop_after_attempt, wait_fixed, retry_if_exception_type, RetryCallState
 import logging
@@ -12,13 +8,18 @@ import requests
 from requests.exceptions import RequestException
 import functools
 from decimal import Decimal
-from typing import List, Dict
+from typing import List, Dict, Tuple
 import base64
+import math
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 import logger
 import utils
 from utils import plat
-from settings import user_param
+from settings import user_param, UserParam
 import res
 from res import Building, Resoure, Animal, Asset, Farming, Crop, NFT, Axe, Tool, Token, Chicken, FishingRod, MBS
 from res import BabyCalf, Calf, FeMaleCalf, MaleCalf, Bull, DairyCow, MbsSavedClaims
@@ -27,6 +28,20 @@ from datetime import datetime, timedelta
 from settings import cfg
 import os
 from logger import log
+from state import StateFeed
+import memo
+from memo import ScanMemo
+from actionfeed import ActionFeed, ChainAction, HyperionFeed
+from chainclock import ChainClock
+from profiler import Profiler
+from metrics import Metrics, MetricsServer, BrowserMemory
+import retry
+from retry import Kind, RetryQueue
+import cdp
+import capture
+import faults
+import fleet
+from cdp import By
 
 
 class FarmerException(Exception):
@@ -39,11 +54,17 @@ class CookieExpireException(FarmerException):
 
 # 调用智能合约出错，此时应停止并检查日志，不宜反复重试
 class TransactException(FarmerException):
-    # 有的智能合约错误可以重试,-1为无限重试
-    def __init__(self, msg, retry=True, max_retry_times: int = -1):
+    # 有的智能合约错误可以重试,-1为无限重试，kind 为失败类型（见 retry.Kind）
+    def __init__(self, msg, retry=True, max_retry_times: int = -1, kind: str = Kind.Other):
         super().__init__(msg)
         self.retry = retry
         self.max_retry_times = max_retry_times
+        self.kind = kind
+
+
+# 签名通道（浏览器或压测用的模拟器）本身出错，交易可能没有发出
+class BridgeException(FarmerException):
+    pass
 
 
 # 遇到不可恢复的错误 ,终止程序
@@ -67,18 +88,34 @@ class Farmer:
     waxjs: str = None
     myjs: str = None
     chrome_data_dir = os.path.abspath(cfg.chrome_data_dir)
-
-    def __init__(self):
+    # 扫描阶段在重试队列中的键前缀
+    phase_prefix = "phase:"
+
+    def __init__(self, param: UserParam = None):
+        # 账号配置，同一进程运行多个账号时各自传入
+        self.param: UserParam = param or user_param
+        # 游戏配置表，每个实例单独加载
+        self.game = res.GameConfig()
+        # 游戏配置表及其加载函数
+        self.config_tables = [
+            ("toolconfs", self.game.init_tool_config),
+            ("cropconf", self.game.init_crop_config),
+            ("anmconf", self.game.init_animal_config),
+            ("mbsconf", self.game.init_mbs_config),
+        ]
         self.url_rpc: str = None
         self.url_table_row: str = None
         self.url_assets: str = None
+        self.url_accounts: str = None
 
         self.wax_account: str = None
         self.login_name: str = None
         self.password: str = None
-        self.driver: webdriver.Chrome = None
+        self.driver = None
         self.proxy: str = None
         self.http: requests.Session = None
+        # 读请求的重试，非2xx的响应也重试
+        self.http_retry = None
         self.cookies: List[dict] = None
         self.log: logging.LoggerAdapter = log
         # 下一次可以操作东西的时间
@@ -97,18 +134,202 @@ class Farmer:
         self.resoure: Resoure = None
         self.token: Token = None
         self.mbs_saved_claims: MbsSavedClaims = None
+        # 智能合约累计出错次数
+        self.count_error_total = 0
+        # 最近一次合约调用耗时（秒）
+        self.last_transact_latency: float = None
+        # 当前运行阶段，用于状态输出
+        self.stage: str = "初始化"
+        # 外部请求停止（面板、GUI），run_forever 检测到后退出
+        self.stop_event = threading.Event()
+        self.state_feed: StateFeed = None
+        self.close_lock = threading.Lock()
+        # 启动各阶段耗时
+        self.timer: utils.StageTimer = None
+        self.first_claim_reported = False
+        # 一轮扫描内的请求缓存
+        self.memo = ScanMemo(cfg.global_table_ttl.total_seconds())
+        # 链上动作流，为空时只靠定时扫描
+        self.action_feed: ActionFeed = None
+        self.last_feed_poll: float = 0
+        # 本轮扫描到的作物 {asset_id: 作物}，繁殖中的动物用 bearer_id，动作流据此更新本地状态
+        self.items: Dict[str, Farming] = {}
+        # 箱子里各模板NFT的数量，开启动作流时由动作流维护，None表示需要重新读取
+        self.inventory: Dict[int, int] = None
+        # 已读取过的资产模板 {asset_id: template_id}
+        self.asset_templates: Dict[str, int] = {}
+        # 下一次一致性检查（完整扫描）的时间
+        self.next_check_time: datetime = datetime.min
+        # 链上时间，所有可操作时间的判断都以它为准
+        self.clock = ChainClock(cfg.clock_default_padding)
+        # 到期前预热好的操作 [(作物, 交易)]，以及它们对应的到期时间
+        self.prepared: List[Tuple[Farming, dict]] = []
+        self.prepared_due: datetime = None
+        # 不计算下次操作时间的扫描时间
+        self.next_full_scan_time: datetime = datetime.min
+        # 最近一次准时操作，到期到提交的延迟（秒）
+        self.last_claim_lag: float = None
+        # 操作失败的东西各自按失败类型退避重试
+        self.retry_queue = RetryQueue(cfg.retry_policy)
+        # 操作后已重新读取过的交易，动作流不再重复应用
+        self.refreshed_transactions = set()
+        # 已喂掉的食物资产 {asset_id: 喂养时间}，原子市场可能还没更新，分配食物时排除
+        self.spent_food: Dict[str, float] = {}
+        # 本轮建造检查读到的建筑数据，种地时复用
+        self.buildings_rows: List[dict] = None
+        # 扫描性能分析，未开启时不计时
+        self.profiler = Profiler(False, None, cfg.path_profile, cfg.profile_sample_interval)
+        # 签名并发送交易，压测时替换为模拟器
+        self.transact_bridge = self.browser_transact
+        # 流量录制，开启 capture 时创建
+        self.recorder: capture.Recorder = None
+        # 故障注入，设置 fault_scenario 时创建
+        self.faults: faults.FaultInjector = None
+        # 配置文件监视，修改后在两轮扫描之间应用
+        self.config_watcher: fleet.ConfigWatcher = None
+        self.last_config_reload: float = time.monotonic()
+        # 重启浏览器失败，等待重试
+        self.browser_restart_pending = False
+        self.last_browser_restart: float = 0
+        # 运行指标，开启 metrics_port 时通过本地 http 端口输出
+        self.metrics = Metrics()
+        self.metrics_server: MetricsServer = None
+        self.browser_memory: BrowserMemory = None
+        # 游戏配置表的哈希，用于检测配置变化
+        self.config_hashes: Dict[str, str] = {}
+        self.last_config_check: float = time.monotonic()
 
     def close(self):
-        if self.driver:
-            self.log.info("稍等，程序正在退出")
-            self.driver.quit()
+        # 可能同时从界面和工作线程调用，只退出一次
+        with self.close_lock:
+            if self.driver:
+                self.log.info("稍等，程序正在退出")
+                driver = self.driver
+                self.driver = None
+                driver.quit()
+                utils.unregister_farmer(self.wax_account)
+            if self.metrics_server:
+                self.metrics_server.stop()
+                self.metrics_server = None
+            if self.recorder:
+                self.recorder.close()
+            if self.faults:
+                self.log.info("故障注入统计: {0}".format(self.faults.show()))
+
+    # 请求停止，不阻塞调用方
+    def request_stop(self):
+        self.stop_event.set()
+
+    # 当前状态快照
+    def snapshot(self) -> dict:
+        state = {
+            "account": self.wax_account,
+            "pid": os.getpid(),
+            "stage": self.stage,
+            "updated": utils.show_time(datetime.now()),
+            "energy": None,
+            "max_energy": None,
+            "gold": None,
+            "wood": None,
+            "food": None,
+            "fwg": None,
+            "fww": None,
+            "fwf": None,
+            "next_operate_time": None,
+            "next_scan_time": None,
+            "count_error_total": self.count_error_total,
+            "count_error_transact": self.count_error_transact,
+            "last_transact_latency": self.last_transact_latency,
+            "last_claim_lag": self.last_claim_lag,
+        }
+        if self.resoure:
+            state.update({
+                "energy": float(self.resoure.energy),
+                "max_energy": float(self.resoure.max_energy),
+                "gold": float(self.resoure.gold),
+                "wood": float(self.resoure.wood),
+                "food": float(self.resoure.food),
+            })
+        if self.token:
+            state.update({"fwg": float(self.token.fwg), "fww": float(self.token.fww), "fwf": float(self.token.fwf)})
+        if self.next_operate_time != datetime.max:
+            state["next_operate_time"] = utils.show_time(self.next_operate_time)
+        if self.next_scan_time != datetime.min:
+            state["next_scan_time"] = utils.show_time(self.next_scan_time)
+        return state
+
+    # 输出运行状态（节流）
+    def publish_state(self, force=False):
+        if not self.state_feed:
+            return
+        try:
+            self.state_feed.publish(self.snapshot(), force)
+        except OSError as e:
+            self.log.debug("publish state error: {0}".format(e))
 
-    def init(self):
-        self.url_rpc = user_param.rpc_domain + '/v1/chain/'
-        self.url_table_row = user_param.rpc_domain + '/v1/chain/get_table_rows'
-        self.url_assets = user_param.assets_domain + '/atomicassets/v1/assets'
+    def set_endpoints(self):
+        self.url_rpc = self.param.rpc_domain + '/v1/chain/'
+        self.url_table_row = self.param.rpc_domain + '/v1/chain/get_table_rows'
+        self.url_assets = self.param.assets_domain + '/atomicassets/v1/assets'
+        self.url_accounts = self.param.assets_domain + '/atomicassets/v1/accounts/'
 
-        self.log.extra["tag"] = self.wax_account
+    def set_http_proxy(self):
+        if self.proxy:
+            self.http.proxies = {
+                "http": "http://{0}".format(self.proxy),
+                "https": "http://{0}".format(self.proxy),
+            }
+        else:
+            self.http.proxies = {}
+
+    def init(self):
+        # 界面上停止后再次开始时，复用同一个 Farmer，清除上一次的停止请求
+        self.stop_event.clear()
+        self.set_endpoints()
+
+        self.log = logger.get_log(self.wax_account)
+        self.state_feed = StateFeed(self.wax_account)
+        self.profiler = Profiler(self.param.profile, self.wax_account, cfg.path_profile, cfg.profile_sample_interval)
+        if not self.timer:
+            self.timer = utils.StageTimer()
+        self.http = requests.Session()
+        self.http.trust_env = False
+        self.http.request = functools.partial(self.http.request, timeout=30)
+        self.set_http_proxy()
+        http_retry_wrapper = tenacity.retry(wait=wait_fixed(cfg.req_interval), stop=stop_after_attempt(5),
+                                            retry=retry_if_exception_type(RequestException),
+                                            before_sleep=self.log_retry, reraise=True)
+        self.http.get = http_retry_wrapper(self.http.get)
+        self.http.post = http_retry_wrapper(self.http.post)
+        self.http_retry = http_retry_wrapper
+        if self.param.capture:
+            self.recorder = capture.Recorder(capture.capture_path(self.wax_account), self.wax_account,
+                                             self.param.to_dict())
+            capture.install_recorder(self.http, self.recorder)
+            self.transact_bridge = capture.recording_bridge(self.recorder, self.transact_bridge)
+            self.log.info("流量录制: {0}".format(self.recorder.path))
+        # 包在录制外层，录下的仍是节点的真实响应
+        if self.param.fault_scenario:
+            self.faults = faults.FaultInjector(faults.load_scenario(self.param.fault_scenario))
+            faults.install_faults(self.http, self.faults)
+            self.transact_bridge = faults.fault_bridge(self.faults, self.transact_bridge, BridgeException)
+            self.log.warning("已开启故障注入: {0}".format(self.param.fault_scenario))
+        if self.param.action_feed:
+            self.action_feed = HyperionFeed(self.param.action_feed, self.wax_account, self.http)
+        self.browser_memory = BrowserMemory(self.wax_account, cfg.metrics_rss_ttl)
+        if self.param.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self, self.param.metrics_port)
+                self.metrics_server.start()
+            except OSError as e:
+                self.log.warning("指标端口{0}开启失败: {1}".format(self.param.metrics_port, e))
+
+    # 启动浏览器
+    def init_browser(self):
+        if self.param.browser_backend == "cdp":
+            self.init_cdp_browser()
+            return
+        from selenium import webdriver
         options = webdriver.ChromeOptions()
         # options.add_argument("--headless")
         # options.add_argument("--no-sandbox")
@@ -122,23 +343,94 @@ class Farmer:
         if self.proxy:
             options.add_argument("--proxy-server={0}".format(self.proxy))
         self.driver = webdriver.Chrome(plat.driver_path, options=options)
+        utils.register_farmer(self.wax_account, self.driver.service.process.pid)
         self.driver.implicitly_wait(60)
         self.driver.set_script_timeout(60)
-        self.http = requests.Session()
-        self.http.trust_env = False
-        self.http.request = functools.partial(self.http.request, timeout=30)
+
+    # 直连Chrome，不启动 chromedriver，进程登记中只有 chrome
+    def init_cdp_browser(self):
+        arguments = ["--disable-extensions", "--log-level=3", "--disable-logging"]
         if self.proxy:
-            self.http.proxies = {
-                "http": "http://{0}".format(self.proxy),
-                "https": "http://{0}".format(self.proxy),
-            }
-        http_retry_wrapper = tenacity.retry(wait=wait_fixed(cfg.req_interval), stop=stop_after_attempt(5),
-                                            retry=retry_if_exception_type(RequestException),
-                                            before_sleep=self.log_retry, reraise=True)
-        self.http.get = http_retry_wrapper(self.http.get)
-        self.http.post = http_retry_wrapper(self.http.post)
+            arguments.append("--proxy-server={0}".format(self.proxy))
+        data_dir = os.path.join(Farmer.chrome_data_dir, self.wax_account)
+        chrome_path = self.param.chrome_path or cdp.find_chrome()
+        self.driver = cdp.CdpDriver(chrome_path, data_dir, arguments)
+        utils.register_farmer(self.wax_account, browser_pids=[self.driver.process.pid])
+        self.driver.implicitly_wait(60)
+        self.driver.set_script_timeout(60)
+
+    # 当前浏览器后端的异常类型
+    def browser_errors(self) -> tuple:
+        if self.param.browser_backend == "cdp":
+            return (cdp.CdpException,)
+        from selenium.common.exceptions import WebDriverException
+        return (WebDriverException,)
+
+    # 探测节点延迟，配置的节点不可用时换成最快的可用节点
+    def probe_endpoints(self):
+        def probe_rpc(domain: str):
+            begin = time.perf_counter()
+            try:
+                resp = self.http.request("POST", domain + "/v1/chain/get_info", timeout=5)
+                resp.raise_for_status()
+                return domain, time.perf_counter() - begin
+            except RequestException:
+                return domain, None
+
+        def probe_assets(domain: str):
+            begin = time.perf_counter()
+            try:
+                resp = self.http.request("GET", domain + "/health", timeout=5)
+                resp.raise_for_status()
+                return domain, time.perf_counter() - begin
+            except RequestException:
+                return domain, None
+
+        rpc_domains = list(dict.fromkeys([self.param.rpc_domain] + list(self.param.rpc_domain_list)))
+        assets_domains = list(dict.fromkeys([self.param.assets_domain] + list(self.param.assets_domain_list)))
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            rpc_result = list(executor.map(probe_rpc, rpc_domains))
+            assets_result = list(executor.map(probe_assets, assets_domains))
+        for domain, latency in rpc_result + assets_result:
+            if latency is None:
+                self.log.info("节点不可用: {0}".format(domain))
+            else:
+                self.log.info("节点延迟: {0} [{1:.0f}ms]".format(domain, latency * 1000))
+        self.param.rpc_domain = self.pick_endpoint(self.param.rpc_domain, rpc_result, "wax节点")
+        self.param.assets_domain = self.pick_endpoint(self.param.assets_domain, assets_result, "原子市场节点")
+        self.set_endpoints()
+
+    def pick_endpoint(self, current: str, result: list, name: str) -> str:
+        alive = sorted([item for item in result if item[1] is not None], key=lambda item: item[1])
+        if not alive or current in [domain for domain, _ in alive]:
+            return current
+        self.log.warning("{0}[{1}]不可用，切换到[{2}]".format(name, current, alive[0][0]))
+        return alive[0][0]
+
+    # 同步链上时间，失败时沿用上次的结果
+    def sync_clock(self):
+        try:
+            self.clock.sync(self.http, self.url_rpc)
+        except (RequestException, ValueError, KeyError) as e:
+            self.log.warning("同步链上时间失败: {0}".format(e))
+            return
+        self.log.info(self.clock.show())
+
+    # 不依赖浏览器的启动准备：探测节点，加载游戏配置
+    def prefetch(self):
+        with self.timer.stage("探测节点"):
+            self.probe_endpoints()
+        with self.timer.stage("同步链上时间"):
+            self.sync_clock()
+        # 从服务器获取游戏参数
+        self.log.info("正在加载游戏配置")
+        with self.timer.stage("加载游戏配置"):
+            self.init_farming_config()
 
     def inject_waxjs(self):
+        # 没有浏览器时（压测）不需要注入
+        if not self.driver:
+            return False
         # 如果已经注入过就不再注入了
         if self.driver.execute_script("return window.mywax != undefined;"):
             return True
@@ -150,22 +442,47 @@ class Farmer:
                 Farmer.waxjs = base64.b64encode(Farmer.waxjs.encode()).decode()
         if not Farmer.myjs:
             with open("inject.js", "r") as file:
-                inject_rpc = "window.mywax = new waxjs.WaxJS({rpcEndpoint: '" + user_param.rpc_domain + "'});"
-                Farmer.myjs = inject_rpc + file.read()
+                Farmer.myjs = file.read()
                 file.close()
+        # 节点地址因账号而异，不放进共享的缓存
+        inject_rpc = "window.mywax = new waxjs.WaxJS({rpcEndpoint: '" + self.param.rpc_domain + "'});"
 
         code = "var s = document.createElement('script');"
         code += "s.type = 'text/javascript';"
         code += "s.text = atob('{0}');".format(Farmer.waxjs)
         code += "document.head.appendChild(s);"
         self.driver.execute_script(code)
-        self.driver.execute_script(Farmer.myjs)
+        self.driver.execute_script(inject_rpc + Farmer.myjs)
         return True
 
+    # 浏览器启动、打开游戏页面的同时，在后台探测节点并加载游戏配置
     def start(self):
+        self.stage = "登录"
+        self.publish_state(force=True)
+        executor = ThreadPoolExecutor(max_workers=1)
+        prefetch = executor.submit(self.prefetch)
+        executor.shutdown(wait=False)
         self.log.info("启动浏览器")
-        self.log.info("wax节点: {0}".format(user_param.rpc_domain))
-        self.log.info("原子市场节点: {0}".format(user_param.assets_domain))
+        with self.timer.stage("启动浏览器"):
+            self.init_browser()
+        with self.timer.stage("打开游戏页面"):
+            self.open_game()
+        with self.timer.stage("等待后台加载"):
+            prefetch.result()
+        self.log.info("wax节点: {0}".format(self.param.rpc_domain))
+        self.log.info("原子市场节点: {0}".format(self.param.assets_domain))
+        with self.timer.stage("钱包登录"):
+            self.inject_waxjs()
+            ret = self.driver.execute_script("return window.wax_login();")
+            self.log.info("window.wax_login(): {0}".format(ret))
+            self.driver.execute_script("window.document.title = '"+self.wax_account+"'")
+            if not ret[0]:
+                raise CookieExpireException("cookie失效")
+        for line in self.timer.report():
+            self.log.info(line)
+
+    # 打开游戏页面并等待登录成功
+    def open_game(self):
         if self.cookies:
             self.log.info("使用预设的cookie自动登录")
             cookies = self.cookies["cookies"]
@@ -197,22 +514,15 @@ class Farmer:
         elem.click()
         # 等待登录成功
         self.log.info("等待登录")
-        WebDriverWait(self.driver, wait_seconds, 1).until(
-            EC.presence_of_element_located((By.XPATH, "//img[@class='navbar-group--icon' and @alt='Map']")))
+        # 两种后端都支持隐式等待，临时延长等待时间，直到地图图标出现
+        self.driver.implicitly_wait(wait_seconds)
+        try:
+            self.driver.find_element(By.XPATH, "//img[@class='navbar-group--icon' and @alt='Map']")
+        finally:
+            self.driver.implicitly_wait(60)
         # self.driver.find_element(By.XPATH, "//img[@class='navbar-group--icon' and @alt='Map']")
         self.log.info("登录成功,稍等...")
-        time.sleep(cfg.req_interval)
-        self.inject_waxjs()
-        ret = self.driver.execute_script("return window.wax_login();")
-        self.log.info("window.wax_login(): {0}".format(ret))
-        self.driver.execute_script("window.document.title = '"+self.wax_account+"'")
-        if not ret[0]:
-            raise CookieExpireException("cookie失效")
-
-        # 从服务器获取游戏参数
-        self.log.info("正在加载游戏配置")
-        self.init_farming_config()
-        time.sleep(cfg.req_interval)
+        self.sleep(cfg.req_interval)
 
     def may_cache_login(self):
         cookies = self.driver.execute_cdp_cmd("Network.getCookies", {"urls": ["https://all-access.wax.io"]})
@@ -221,12 +531,45 @@ class Farmer:
                 return True
         return False
 
+    # 所有固定等待都经过这里，以便统计等待时间
+    def sleep(self, seconds: float):
+        with self.profiler.io("sleep"):
+            time.sleep(seconds)
+
     def log_retry(self, state: RetryCallState):
         exp = state.outcome.exception()
         if isinstance(exp, RequestException):
             self.log.info("网络错误: {0}".format(exp))
             self.log.info("正在重试: [{0}]".format(state.attempt_number))
 
+    # 读请求走缓存，一轮扫描内相同请求只发一次；
+    # 限流、节点错误（非2xx）和不完整的 JSON 在重试内抛出，只缓存成功的结果
+    def http_post_json(self, url: str, post_data: dict, tag: str, name: str):
+        def fetch():
+            return self.fetch_json("POST", url, name, json=post_data)
+        return self.memo.get_or_fetch(memo.request_key("POST", url, post_data), tag, self.http_retry(fetch))
+
+    def http_get_json(self, url: str, params: dict, tag: str, name: str):
+        def fetch():
+            return self.fetch_json("GET", url, name, params=params)
+        return self.memo.get_or_fetch(memo.request_key("GET", url, params), tag, self.http_retry(fetch))
+
+    def fetch_json(self, method: str, url: str, name: str, **kwargs):
+        begin = time.perf_counter()
+        with self.profiler.io("http"):
+            resp = self.http.request(method, url, **kwargs)
+        self.count_http(name, begin)
+        self.log.debug("{0}:{1}".format(name, resp.text))
+        resp.raise_for_status()
+        return resp.json()
+
+    def count_http(self, name: str, begin: float):
+        self.metrics.inc("farmer_http_requests_total", endpoint=name)
+        self.metrics.inc("farmer_http_request_seconds_total", time.perf_counter() - begin, endpoint=name)
+
+    def get_table_rows(self, post_data: dict, name: str) -> dict:
+        return self.http_post_json(self.url_table_row, post_data, post_data["table"], name)
+
     def table_row_template(self) -> dict:
         post_data = {
             "json": True,
@@ -245,12 +588,18 @@ class Farmer:
 
     # 从服务器获取各种工具和作物的参数
     def init_farming_config(self):
-        # 工具
-        post_data = {
+        for table, init_config in self.config_tables:
+            resp = self.get_table_rows(self.config_post_data(table), "get {0}".format(table))
+            init_config(resp["rows"])
+            self.config_hashes[table] = hashlib.sha1(json.dumps(resp["rows"], sort_keys=True).encode()).hexdigest()
+
+    @staticmethod
+    def config_post_data(table: str) -> dict:
+        return {
             "json": True,
             "code": "farmersworld",
             "scope": "farmersworld",
-            "table": "toolconfs",
+            "table": table,
             "lower_bound": "",
             "upper_bound": "",
             "index_position": 1,
@@ -259,31 +608,36 @@ class Farmer:
             "reverse": False,
             "show_payer": False
         }
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get tools config:{0}".format(resp.text))
-        resp = resp.json()
-        res.init_tool_config(resp["rows"])
-        time.sleep(cfg.req_interval)
-
-        # 农作物
-        post_data["table"] = "cropconf"
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get crop config:{0}".format(resp.text))
-        resp = resp.json()
-        res.init_crop_config(resp["rows"])
-        # 动物
-        post_data["table"] = "anmconf"
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get animal conf:{0}".format(resp.text))
-        resp = resp.json()
-        res.init_animal_config(resp["rows"])
-
-        # 会员卡
-        post_data["table"] = "mbsconf"
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get mbs config:{0}".format(resp.text))
-        resp = resp.json()
-        res.init_mbs_config(resp["rows"])
+
+    # 定期检查游戏配置表是否有变化：绕过请求缓存读取，只计算哈希，变化时才重新加载，
+    # 并更新调度中已持有的东西，不需要重启浏览器
+    def check_farming_config(self):
+        self.last_config_check = time.monotonic()
+        changed = []
+        try:
+            for table, init_config in self.config_tables:
+                resp = self.http.post(self.url_table_row, json=self.config_post_data(table))
+                rows = resp.json()["rows"]
+                digest = hashlib.sha1(json.dumps(rows, sort_keys=True).encode()).hexdigest()
+                if digest == self.config_hashes.get(table):
+                    continue
+                init_config(rows)
+                self.config_hashes[table] = digest
+                changed.append(table)
+        except (RequestException, ValueError, KeyError) as e:
+            self.log.warning("检查游戏配置失败: {0}".format(e))
+        if not changed:
+            return
+        self.log.info("游戏配置已更新: {0}".format(",".join(changed)))
+        self.memo.invalidate(changed)
+        for item in self.items.values():
+            if isinstance(item, Tool):
+                self.apply_mbs_mint(item)
+            elif isinstance(item, Animal) and len(item.day_claims_at) >= item.daily_claim_limit:
+                item.next_availability = max(item.next_availability, item.day_claims_at[0] + timedelta(hours=24))
+        if self.items:
+            self.next_operate_time = self.local_next_operate_time()
+            self.next_scan_time = min(self.next_full_scan_time, self.next_operate_time)
 
     # 从服务器获取配置
     def get_farming_config(self):
@@ -300,9 +654,7 @@ class Farmer:
             "reverse": False,
             "show_payer": False
         }
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get farming config:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get farming config")
 
         return resp["rows"][0]
 
@@ -312,9 +664,7 @@ class Farmer:
         post_data["table"] = "accounts"
         post_data["index_position"] = 1
 
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_table_rows:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get_table_rows")
         if len(resp["rows"]) == 0:
             self.log.info("获取不到账号数据，请检查账号名是否有误")
         resource = Resoure()
@@ -336,16 +686,18 @@ class Farmer:
         return resource
 
     # 获取建造信息
-    def get_buildings(self) -> List[Building]:
+    # 建筑表原始数据，建造和种地共用
+    def get_buildings_rows(self) -> List[dict]:
         post_data = self.table_row_template()
         post_data["table"] = "buildings"
         post_data["index_position"] = 2
 
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_buildings_info:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get_buildings_info")
+        return resp["rows"]
+
+    def get_buildings(self, rows: List[dict] = None) -> List[Building]:
         buildings = []
-        for item in resp["rows"]:
+        for item in rows if rows is not None else self.get_buildings_rows():
             build = Building()
             build.asset_id = item["asset_id"]
             build.name = item["name"]
@@ -365,12 +717,10 @@ class Farmer:
         post_data["table"] = "crops"
         post_data["index_position"] = 2
 
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_crops_info:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get_crops_info")
         crops = []
         for item in resp["rows"]:
-            crop = res.create_crop(item)
+            crop = self.game.create_crop(item)
             if crop:
                 crops.append(crop)
             else:
@@ -399,47 +749,78 @@ class Farmer:
 
     # 耕种农作物
     def claim_crop(self, crop: Crop):
-        energy_consumed = crop.energy_consumed
-        fake_consumed = Decimal(0)
-        if crop.times_claimed == crop.required_claims - 1:
-            # 收获前的最后一次耕作，多需要200点能量，游戏合约BUG（玉米需要245）
-            fake_consumed = Decimal(250)
-        self.consume_energy(Decimal(energy_consumed), fake_consumed)
-        transaction = {
+        self.consume_energy(*self.energy_cost(crop))
+        return self.wax_transact(self.build_crop_claim(crop))
+
+    # 构造只有一个动作的合约交易
+    def build_transaction(self, account: str, name: str, data: dict) -> dict:
+        return {
             "actions": [{
-                "account": "farmersworld",
-                "name": "cropclaim",
+                "account": account,
+                "name": name,
                 "authorization": [{
                     "actor": self.wax_account,
                     "permission": "active",
                 }],
-                "data": {
-                    "crop_id": crop.asset_id,
-                    "owner": self.wax_account,
-                },
+                "data": data,
             }],
         }
-        return self.wax_transact(transaction)
+
+    def build_tool_claim(self, tool: Tool) -> dict:
+        return self.build_transaction("farmersworld", "claim", {"asset_id": tool.asset_id, "owner": self.wax_account})
+
+    def build_crop_claim(self, crop: Crop) -> dict:
+        return self.build_transaction("farmersworld", "cropclaim", {"crop_id": crop.asset_id, "owner": self.wax_account})
+
+    def build_animal_claim(self, animal: Animal) -> dict:
+        return self.build_transaction("farmersworld", "anmclaim",
+                                      {"animal_id": animal.asset_id, "owner": self.wax_account})
+
+    def build_animal_feed(self, asset_id_food: str, animal: Animal, breeding=False) -> dict:
+        if not breeding:
+            memo = "feed_animal:{0}".format(animal.asset_id)
+        else:
+            memo = "breed_animal:{0},{1}".format(animal.bearer_id, animal.partner_id)
+        return self.build_transaction("atomicassets", "transfer", {
+            "asset_ids": [asset_id_food],
+            "from": self.wax_account,
+            "memo": memo,
+            "to": "farmersworld"
+        })
+
+    # 操作需要的能量 (实际消耗, 额外需要但不消耗)
+    @staticmethod
+    def energy_cost(item: Farming):
+        fake_consumed = Decimal(0)
+        if isinstance(item, Crop) and item.times_claimed == item.required_claims - 1:
+            # 收获前的最后一次耕作，多需要200点能量，游戏合约BUG（玉米需要245）
+            fake_consumed = Decimal(250)
+        if isinstance(item, Animal) and item.times_claimed == item.required_claims - 1:
+            # 收获前的最后一次喂养，多需要200点能量，游戏合约BUG
+            fake_consumed = Decimal(200)
+        return Decimal(item.energy_consumed), fake_consumed
 
     def claim_buildings(self, blds: List[Building]):
         for item in blds:
             self.log.info("正在建造: {0}".format(item.show()))
-            if self.claim_building(item):
+            if self.try_claim(item, lambda: self.claim_building(item)):
                 self.log.info("建造成功: {0}".format(item.show(more=False)))
+                # 建造后地块可能变化，种地时重新读取
+                self.buildings_rows = None
             else:
                 self.log.info("建造失败: {0}".format(item.show(more=False)))
                 self.count_error_claim += 1
-            time.sleep(cfg.req_interval)
+            self.sleep(cfg.req_interval)
 
     def claim_crops(self, crops: List[Crop]):
         for item in crops:
             self.log.info("正在耕作: {0}".format(item.show()))
-            if self.claim_crop(item):
+            if self.try_claim(item, lambda: self.claim_crop(item)):
                 self.log.info("耕作成功: {0}".format(item.show(more=False)))
             else:
                 self.log.info("耕作失败: {0}".format(item.show(more=False)))
                 self.count_error_claim += 1
-            time.sleep(cfg.req_interval)
+            self.sleep(cfg.req_interval)
 
     # 获取箱子里的NTF
     def get_chest(self) -> dict:
@@ -449,9 +830,7 @@ class Farmer:
             "owner": self.wax_account,
             "template_blacklist": "260676",
         }
-        resp = self.http.get(self.url_assets, params=payload)
-        self.log.debug("get_chest:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.http_get_json(self.url_assets, payload, "assets", "get_chest")
         assert resp["success"]
         return resp
 
@@ -463,23 +842,21 @@ class Farmer:
             "owner": self.wax_account,
             "schema_name": schema_name,
         }
-        resp = self.http.get(self.url_assets, params=payload)
-        self.log.debug("get_chest_by_schema_name:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.http_get_json(self.url_assets, payload, "assets", "get_chest_by_schema_name")
         assert resp["success"]
         return resp
 
     # template_id: [大麦 318606] [玉米 318607]
-    def get_chest_by_template_id(self, template_id: int):
+    def get_chest_by_template_id(self, template_id: int, limit: int = None):
         payload = {
-            "limit": 1000,
+            "limit": min(limit, 1000) if limit else 1000,
             "collection_name": "farmersworld",
             "owner": self.wax_account,
             "template_id": template_id,
+            "sort": "asset_id",
+            "order": "asc",
         }
-        resp = self.http.get(self.url_assets, params=payload)
-        self.log.debug("get_chest_by_template_id:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.http_get_json(self.url_assets, payload, "assets", "get_chest_by_template_id")
         assert resp["success"]
         return resp
 
@@ -503,10 +880,26 @@ class Farmer:
         corn_list = self.get_asset(NFT.Corn, 'Corn')
         return corn_list
 
-    # 获取NFT资产，可以是小麦，小麦种子，牛奶等
-    def get_asset(self, template_id, name) -> List[Asset]:
+    # 箱子里各模板NFT的数量 {template_id: 数量}，一次请求，不下载资产详情
+    def get_inventory(self) -> Dict[int, int]:
+        if self.action_feed and self.inventory is not None:
+            return dict(self.inventory)
+        url = self.url_accounts + self.wax_account + "/farmersworld"
+        resp = self.http_get_json(url, None, "assets", "get_inventory")
+        assert resp["success"]
+        inventory = {}
+        for item in resp["data"]["templates"]:
+            if item["template_id"] is None:
+                continue
+            inventory[int(item["template_id"])] = int(item["assets"])
+        self.log.debug("inventory: {0}".format(inventory))
+        self.inventory = dict(inventory)
+        return inventory
+
+    # 获取NFT资产，可以是小麦，小麦种子，牛奶等，limit为需要的数量（默认全部）
+    def get_asset(self, template_id, name, limit: int = None) -> List[Asset]:
         asset_list = []
-        chest = self.get_chest_by_template_id(template_id)
+        chest = self.get_chest_by_template_id(template_id, limit)
         if len(chest["data"]) <= 0:
             return asset_list
         for item in chest["data"]:
@@ -518,6 +911,7 @@ class Farmer:
             asset.schema_name = item["schema"]["schema_name"]
             asset.template_id = item["template"]["template_id"]
             asset_list.append(asset)
+            self.asset_templates[asset.asset_id] = int(asset.template_id)
         self.log.debug("[{0}]_get_asset_list: [{1}]".format(name, format(asset_list)))
         return asset_list
 
@@ -527,14 +921,12 @@ class Farmer:
         post_data["table"] = "breedings"
         post_data["index_position"] = 2
 
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_breedings:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get_breedings")
         if len(resp["rows"]) == 0:
             self.log.warning("没有正在繁殖的动物，请先手动开启繁殖")
         animals = []
         for item in resp["rows"]:
-            anim = res.create_animal(item, True)
+            anim = self.game.create_animal(item, True)
             if anim:
                 animals.append(anim)
             else:
@@ -546,19 +938,17 @@ class Farmer:
         post_data["table"] = "animals"
         post_data["index_position"] = 2
 
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_animal_info:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get_animal_info")
         if len(resp["rows"]) == 0:
             self.log.warning("账户中没有动物")
         animals = []
         for item in resp["rows"]:
-            anim = res.create_animal(item)
+            anim = self.game.create_animal(item)
             if anim:
-                if anim.required_building == 298590 and user_param.cow:
+                if anim.required_building == 298590 and self.param.cow:
                     # 牛棚
                     animals.append(anim)
-                elif anim.required_building == 298591 and user_param.chicken:
+                elif anim.required_building == 298591 and self.param.chicken:
                     # 鸡舍
                     animals.append(anim)
             else:
@@ -566,124 +956,110 @@ class Farmer:
 
         return animals
 
-    # 喂动物
-    def feed_animal(self, asset_id_food: str, animal: Animal, breeding=False) -> bool:
+    # 动物的喂养动作：鸡蛋只需照料，其他动物转入分配好的食物
+    def build_animal_action(self, animal: Animal, asset_id_food: str = None) -> dict:
+        if 'Egg' in animal.name:
+            return self.build_animal_claim(animal)
+        return self.build_animal_feed(asset_id_food, animal, bool(animal.bearer_id))
 
-        fake_consumed = Decimal(0)
-        if animal.times_claimed == animal.required_claims - 1:
-            # 收获前的最后一次喂养，多需要200点能量，游戏合约BUG
-            fake_consumed = Decimal(200)
-        self.consume_energy(Decimal(animal.energy_consumed), fake_consumed)
-        if not breeding:
-            self.log.info("feed [{0}] to [{1}]".format(asset_id_food, animal.asset_id))
-            memo = "feed_animal:{0}".format(animal.asset_id)
-        else:
-            self.log.info("feed [{0}] to [{1}]".format(asset_id_food, animal.bearer_id))
-            memo = "breed_animal:{0},{1}".format(animal.bearer_id, animal.partner_id)
-
-        transaction = {
-            "actions": [{
-                "account": "atomicassets",
-                "name": "transfer",
-                "authorization": [{
-                    "actor": self.wax_account,
-                    "permission": "active",
-                }],
-                "data": {
-                    "asset_ids": [asset_id_food],
-                    "from": self.wax_account,
-                    "memo": memo,
-                    "to": "farmersworld"
-                },
-            }],
-        }
-        return self.wax_transact(transaction)
-
-    #  获取动物需要的食物
-    def get_animal_food(self, animal: Animal):
-        food_class = res.farming_table.get(animal.consumed_card)
-        list_food = self.get_asset(animal.consumed_card, food_class.name)
-        self.log.info("剩余[{0}]数量: [{1}]".format(food_class.name, len(list_food)))
-        if len(list_food) <= 0:
-            rs = self.buy_corps(animal.consumed_card, user_param.buy_food_num)
-            if not rs:
-                self.log.warning("{0}数量不足,请及时补充".format(food_class.name))
-                return False
-            else:
-                list_food = self.get_asset(animal.consumed_card, food_class.name)
-        asset = list_food.pop()
-
-        return asset.asset_id
-
-    # 饲养动物
-    def claim_animal(self, animals: List[Animal]):
+    # 食物池：按 consumed_card 分组，每种食物只读一次箱子，给每只动物分配不同的食物资产，
+    # 返回 {item_key(动物): 食物asset_id}，分不到食物的动物不在其中
+    def allocate_food(self, animals: List[Animal]) -> Dict[str, str]:
+        groups: Dict[int, List[Animal]] = {}
         for item in animals:
-            self.log.info("正在喂[{0}]: [{1}]".format(item.name, item.show()))
-            if 'Egg' in item.name:
-                success = self.care_animal(item)
-            else:
-                feed_asset_id = self.get_animal_food(item)
-                if not feed_asset_id:
-                    return False
-                success = self.feed_animal(feed_asset_id, item)
-
-            if success:
-                self.log.info("喂养成功: {0}".format(item.show(more=False)))
-            else:
-                self.log.info("喂养失败: {0}".format(item.show(more=False)))
-                self.count_error_claim += 1
-            time.sleep(cfg.req_interval)
-        return True
-
-    # 饲养繁殖的动物
-    def breeding_claim(self, animals: List[Animal]):
-
+            if 'Egg' not in item.name:
+                groups.setdefault(item.consumed_card, []).append(item)
+        if not groups:
+            return {}
+        inventory = self.get_inventory()
+        allocation = {}
+        for card, group in groups.items():
+            food_class = self.game.farming_table.get(card)
+            if not food_class:
+                self.log.warning("未知的食物[{0}]，跳过{1}只动物: {2}".format(
+                    card, len(group), " ".join(item.show(more=False) for item in group)))
+                continue
+            count = inventory.get(card, 0)
+            self.log.info("需要[{0}]{1}个，剩余{2}个".format(food_class.name, len(group), count))
+            if count < len(group) and self.param.buy_food:
+                self.buy_corps(card, max(len(group) - count, self.param.buy_food_num))
+            # 刚喂掉的食物可能还没从原子市场消失，多取一些再排除
+            assets = self.get_asset(card, food_class.name, len(group) + len(self.spent_food))
+            assets = [asset for asset in assets if asset.asset_id not in self.spent_food]
+            if len(assets) < len(group):
+                self.log.warning("{0}数量不足,请及时补充".format(food_class.name))
+            for item, asset in zip(group, assets):
+                allocation[self.item_key(item)] = asset.asset_id
+        return allocation
+
+    # 喂养引擎：一次分配好所有动物的食物，把喂养动作合并成尽量少的交易（每个交易最多 feed_batch_size 个动作），
+    # 一个批次失败时逐个重新提交，每只动物单独报告结果
+    def feed_animals(self, animals: List[Animal]):
+        allocation = self.allocate_food(animals)
+        ready = []
         for item in animals:
-            self.log.info("【繁殖】正在喂[{0}]: [{1}]".format(item.name, item.show(False, True)))
-            feed_asset_id = self.get_animal_food(item)
-            if not feed_asset_id:
-                return False
-            success = self.feed_animal(feed_asset_id, item, True)
-
-            if success:
-                self.log.info("【繁殖】喂养成功: {0}".format(item.show(more=False, breeding=True)))
-            else:
-                self.log.info("【繁殖】喂养失败: {0}".format(item.show(more=False, breeding=True)))
-                self.count_error_claim += 1
-            time.sleep(cfg.req_interval)
-        return True
-
-    def care_animal(self, animal: Animal):
-        self.log.info("care_animal {0}".format(animal.asset_id))
-        fake_consumed = Decimal(0)
-        if animal.times_claimed == animal.required_claims - 1:
-            # 收获前的最后一次喂养，多需要200点能量，游戏合约BUG
-            fake_consumed = Decimal(200)
-        self.consume_energy(Decimal(animal.energy_consumed), fake_consumed)
-
-        transaction = {
-            "actions": [{
-                "account": "farmersworld",
-                "name": "anmclaim",
-                "authorization": [{
-                    "actor": self.wax_account,
-                    "permission": "active",
-                }],
-                "data": {
-                    "animal_id": animal.asset_id,
-                    "owner": self.wax_account,
-                },
-            }],
-        }
-        return self.wax_transact(transaction)
+            food = allocation.get(self.item_key(item))
+            if 'Egg' not in item.name and not food:
+                self.log.info("没有食物，跳过: {0}".format(self.show_animal(item)))
+                continue
+            self.consume_energy(*self.energy_cost(item))
+            ready.append((item, self.build_animal_action(item, food)))
+        for i in range(0, len(ready), cfg.feed_batch_size):
+            self.submit_feed_batch(ready[i:i + cfg.feed_batch_size])
+            self.sleep(cfg.req_interval)
+
+    def submit_feed_batch(self, batch: List[Tuple[Animal, dict]]):
+        if len(batch) == 1:
+            self.feed_one(*batch[0])
+            return
+        self.log.info("正在喂养{0}只动物: {1}".format(
+            len(batch), " ".join(self.show_animal(item, more=False) for item, _ in batch)))
+        transaction = {"actions": [action for _, item in batch for action in item["actions"]]}
+        try:
+            result = self.wax_transact(transaction)
+        except TransactException as e:
+            if not e.retry:
+                raise
+            self.log.warning("批量喂养失败[{0}]，逐个重新提交".format(e.kind))
+            for item, transaction in batch:
+                self.feed_one(item, transaction)
+                self.sleep(cfg.req_interval)
+            return
+        for item, transaction in batch:
+            self.retry_queue.succeeded(self.item_key(item))
+            self.feed_succeeded(item, transaction, result)
+
+    def feed_one(self, item: Animal, transaction: dict):
+        self.log.info("正在喂[{0}]: {1}".format(item.name, self.show_animal(item)))
+        result = self.try_claim(item, lambda: self.wax_transact(transaction))
+        if result:
+            self.feed_succeeded(item, transaction, result, refreshed=True)
+        else:
+            self.log.info("喂养失败: {0}".format(self.show_animal(item, more=False)))
+            self.count_error_claim += 1
+
+    def feed_succeeded(self, item: Animal, transaction: dict, result, refreshed=False):
+        self.mark_food_spent(transaction)
+        if not refreshed:
+            self.refresh_claimed(item, result)
+        self.log.info("喂养成功: {0}".format(self.show_animal(item, more=False)))
+
+    # 记录交易中转走的食物资产
+    def mark_food_spent(self, transaction: dict):
+        now = time.monotonic()
+        for action in transaction["actions"]:
+            for asset_id in action["data"].get("asset_ids", []):
+                self.spent_food[str(asset_id)] = now
+
+    @staticmethod
+    def show_animal(item: Animal, more=True) -> str:
+        return item.show(more, bool(item.bearer_id))
 
     # 获取wax账户信息
     def wax_get_account(self):
         url = self.url_rpc + "get_account"
         post_data = {"account_name": self.wax_account}
-        resp = self.http.post(url, json=post_data)
-        self.log.debug("get_account:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.http_post_json(url, post_data, "account", "get_account")
         return resp
 
     # 获取三种资源的代币余额 FWF FWG FWW
@@ -694,10 +1070,7 @@ class Farmer:
             "account": self.wax_account,
             "symbol": None
         }
-        resp = self.http.post(url, json=post_data)
-
-        self.log.debug("get_fw_balance:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.http_post_json(url, post_data, "balance", "get_fw_balance")
         balance = Token()
         balance.fwf = 0
         balance.fwg = 0
@@ -715,14 +1088,30 @@ class Farmer:
 
     # 签署交易(只许成功，否则抛异常）
     def wax_transact(self, transaction: dict):
-        self.inject_waxjs()
         self.log.info("begin transact: {0}".format(transaction))
+        result = None
         try:
-            success, result = self.driver.execute_script("return window.wax_transact(arguments[0]);", transaction)
+            begin = time.perf_counter()
+            with self.profiler.io("browser"):
+                success, result = self.transact_bridge(transaction)
+            self.last_transact_latency = time.perf_counter() - begin
+            action_name = "+".join(action["name"] for action in transaction["actions"])
+            self.metrics.inc("farmer_transactions_total", action=action_name, outcome="ok" if success else "error")
+            if not success:
+                self.count_error_total += 1
+            self.publish_state()
             if success:
+                tags = memo.transaction_tags(transaction)
+                self.memo.invalidate(tags)
+                if tags is None or "assets" in tags:
+                    # 本地箱子数量不再准确，下次使用时重新读取
+                    self.inventory = None
                 self.log.info("transact ok, transaction_id: [{0}]".format(result["transaction_id"]))
+                if not self.first_claim_reported:
+                    self.first_claim_reported = True
+                    self.log.info("启动到首次操作耗时: {0:.1f}秒".format(self.timer.elapsed()))
                 self.log.debug("transact result: {0}".format(result))
-                time.sleep(cfg.transact_interval)
+                self.sleep(cfg.transact_interval)
                 return result
             else:
                 if "is greater than the maximum billable" in result:
@@ -731,16 +1120,79 @@ class Farmer:
                     self.log.error("CPU资源不足，可能需要质押更多WAX，一般为误报，稍后重试 estimated")
                 else:
                     self.log.error("transact error: {0}".format(result))
-                raise TransactException(result)
+                kind = retry.classify(result)
+                raise TransactException(result, retry=kind not in retry.fatal_kinds, kind=kind)
 
-        except WebDriverException as e:
+        except BridgeException as e:
+            self.count_error_total += 1
             self.log.error("transact error: {0}".format(e))
             self.log.exception(str(e))
-            raise TransactException(result)
+            raise TransactException(result, kind=Kind.Network)
+
+    # 默认的签名通道：浏览器里的 waxjs，返回 (是否成功, 交易结果或错误信息)
+    def browser_transact(self, transaction: dict):
+        try:
+            self.inject_waxjs()
+            return self.driver.execute_script("return window.wax_transact(arguments[0]);", transaction)
+        except self.browser_errors() as e:
+            raise BridgeException(str(e)) from e
+
+    # 单个东西的操作：可重试的合约失败放进重试队列，返回 None，本轮继续处理其他东西；不可重试的继续抛出
+    def try_claim(self, item: Farming, claim):
+        key = self.item_key(item)
+        try:
+            result = claim()
+        except TransactException as e:
+            if not e.retry:
+                raise
+            retry_at = self.retry_queue.failed(key, e.kind, self.clock.now(), str(e))
+            self.metrics.inc("farmer_retries_total", kind=e.kind)
+            item.next_availability = max(item.next_availability, retry_at)
+            self.not_operational.append(item)
+            self.log.warning("操作失败[{0}]: {1}，{2}后重试".format(e.kind, item.show(more=False),
+                                                             utils.show_time(retry_at)))
+            return None
+        self.retry_queue.succeeded(key)
+        self.refresh_claimed(item, result)
+        return result
+
+    # 操作成功后按主键重新读取这一行，把新的可操作时间直接交给调度；
+    # 节点还没反映出这次操作时，按配置参数在本地推算
+    def refresh_claimed(self, item: Farming, result):
+        if not isinstance(item, (Tool, Crop, Animal)) or (isinstance(item, Animal) and item.bearer_id):
+            return
+        now = self.clock.now()
+        try:
+            exists = self.refresh_item(item)
+        except (RequestException, ValueError, KeyError) as e:
+            self.log.debug("refresh row error: {0}".format(e))
+            exists = True
+            item.next_availability = now
+        if not exists:
+            # 收获后作物消失，或动物成长为新的资产
+            self.items.pop(self.item_key(item), None)
+            return
+        if item.next_availability <= now:
+            if isinstance(item, Tool):
+                self.apply_tool_claim(item, now)
+            elif self.apply_item_claim(self.item_key(item), now):
+                return
+        if isinstance(result, dict) and result.get("transaction_id"):
+            self.refreshed_transactions.add(result["transaction_id"])
+        self.items[self.item_key(item)] = item
+        if item not in self.not_operational:
+            self.not_operational.append(item)
+        self.log.info("操作后状态: {0}".format(item.show()))
+
+    @staticmethod
+    def item_key(item: Farming) -> str:
+        if isinstance(item, Animal) and item.bearer_id:
+            return str(item.bearer_id)
+        return str(item.asset_id)
 
     # 过滤可操作的作物
     def filter_operable(self, items: List[Farming]) -> Farming:
-        now = datetime.now()
+        now = self.clock.now()
         op = []
         for item in items:
             if isinstance(item, Building):
@@ -752,6 +1204,11 @@ class Farmer:
                     next_op_time = item.day_claims_at[0] + timedelta(hours=24)
                     item.next_availability = max(item.next_availability, next_op_time)
                     self.log.info("[{0}]24小时内最多喂[{1}]次 ".format(item.name, item.daily_claim_limit))
+            retry_at = self.retry_queue.blocked_until(self.item_key(item), now)
+            if retry_at:
+                item.next_availability = max(item.next_availability, retry_at)
+                self.log.info("等待重试: {0}".format(item.show()))
+            self.items[self.item_key(item)] = item
             if now < item.next_availability:
                 self.not_operational.append(item)
                 continue
@@ -761,7 +1218,8 @@ class Farmer:
 
     def scan_buildings(self):
         self.log.info("检查建筑物")
-        buildings = self.get_buildings()
+        self.buildings_rows = self.get_buildings_rows()
+        buildings = self.get_buildings(self.buildings_rows)
         if not buildings:
             self.log.info("没有未完成的建筑物")
             return True
@@ -778,22 +1236,16 @@ class Farmer:
         self.claim_buildings(buildings)
         return True
 
+    # 种地：所有农田的空闲地块一起计算，建筑数据优先用本轮建造检查读到的
     def scan_plants(self):
         self.log.info("自动种地")
-        post_data = self.table_row_template()
-        post_data["table"] = "buildings"
-        post_data["index_position"] = 2
-
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_buildings_info:{0}".format(resp.text))
-        resp = resp.json()
-        for item in resp["rows"]:
-            if item["template_id"] == 298592 and item["is_ready"] == 1:
-                slots_num = 8 - item["slots_used"]
-                if slots_num > 0:
-                    self.plant_corps(slots_num)
-                else:
-                    self.log.info("没有未使用的地块")
+        rows = self.buildings_rows if self.buildings_rows is not None else self.get_buildings_rows()
+        slots_num = sum(8 - item["slots_used"] for item in rows
+                        if item["template_id"] == 298592 and item["is_ready"] == 1)
+        if slots_num > 0:
+            self.plant_corps(slots_num)
+        else:
+            self.log.info("没有未使用的地块")
         return True
 
     # 购买作物
@@ -801,7 +1253,10 @@ class Farmer:
         if buy_num <= 0:
             self.log.info("购买数量为0")
             return False
-        item_class = res.farming_table.get(template_id)
+        item_class = self.game.farming_table.get(template_id)
+        if not item_class or not getattr(item_class, "golds_cost", None):
+            self.log.info("[{0}]不能购买，请自行准备".format(item_class.name if item_class else template_id))
+            return False
         total_golds = item_class.golds_cost * buy_num
         if total_golds > self.resoure.gold:
             new_buy_num = int(self.resoure.gold / item_class.golds_cost)
@@ -812,22 +1267,22 @@ class Farmer:
                 self.log.info("金币不足，需要购买[{0}]个，实际购买[{1}]个".format(buy_num, new_buy_num))
                 buy_num = new_buy_num
 
-        if user_param.buy_barley_seed and template_id == 298595:
+        if self.param.buy_barley_seed and template_id == 298595:
             self.log.info("开始购买大麦种子,数量：{0}".format(buy_num))
             self.market_buy(template_id, buy_num)
-        elif user_param.buy_corn_seed and template_id == 298596:
+        elif self.param.buy_corn_seed and template_id == 298596:
             self.log.info("开始购买玉米种子,数量：{0}".format(buy_num))
             self.market_buy(template_id, buy_num)
-        elif user_param.buy_food and template_id == 318606:
+        elif self.param.buy_food and template_id == 318606:
             self.log.info("开始购买大麦,数量：{0}".format(buy_num))
             self.market_buy(template_id, buy_num)
-        elif user_param.buy_food and template_id == 318607:
+        elif self.param.buy_food and template_id == 318607:
             self.log.info("开始购买玉米,数量：{0}".format(buy_num))
             self.market_buy(template_id, buy_num)
         else:
             self.log.info("配置不执行购买，请检查")
 
-        time.sleep(2)
+        self.sleep(2)
         return True
 
     # 市场购买
@@ -853,54 +1308,139 @@ class Farmer:
 
         return True
 
-    # 种植
+    # 一次种地时大麦、玉米种子的数量：先种大麦，剩下的地块种玉米，合计不超过空闲地块
+    def seed_plan(self, slots_num: int) -> Dict[int, int]:
+        barley = min(slots_num, self.param.barleyseed_num)
+        corn = min(slots_num - barley, self.param.cornseed_num)
+        return {NFT.BarleySeed: barley, NFT.CornSeed: corn}
+
+    # 预计范围内每只动物还需要喂养的次数，受喂养间隔、24小时次数上限和剩余次数限制
+    def forecast_claims(self, animal: Animal, end: datetime) -> int:
+        begin = max(self.clock.now(), animal.next_availability)
+        if begin > end:
+            return 0
+        by_charge = int((end - begin) / animal.charge_time) + 1
+        by_daily = math.ceil(animal.daily_claim_limit * (end - self.clock.now()) / timedelta(hours=24))
+        remaining = animal.required_claims - (animal.times_claimed or 0)
+        return max(0, min(by_charge, by_daily, remaining))
+
+    # 预计范围内需要的食物 {模板: 数量}，读取的动物数据在本轮扫描内缓存，喂养时不再重复请求
+    def forecast_food(self, end: datetime) -> Dict[int, int]:
+        animals = []
+        if self.param.chicken or self.param.cow:
+            animals.extend(self.get_animals())
+        if self.param.breeding:
+            animals.extend(self.get_breedings())
+        need = {}
+        for item in animals:
+            if 'Egg' in item.name or not item.consumed_card:
+                continue
+            need[item.consumed_card] = need.get(item.consumed_card, 0) + self.forecast_claims(item, end)
+        return need
+
+    # 预计范围内需要的种子 {模板: 数量}：现有的空闲地块，加上范围内收获后空出来的地块
+    def forecast_seeds(self, end: datetime) -> Dict[int, int]:
+        need = {}
+
+        def add(plan: Dict[int, int]):
+            for template_id, count in plan.items():
+                need[template_id] = need.get(template_id, 0) + count
+
+        for item in self.get_buildings_rows():
+            if item["template_id"] == 298592 and item["is_ready"] == 1:
+                add(self.seed_plan(8 - item["slots_used"]))
+        for crop in self.get_crops():
+            remaining = crop.required_claims - (crop.times_claimed or 0)
+            if crop.next_availability + crop.charge_time * (remaining - 1) <= end:
+                add(self.seed_plan(1))
+        return need
+
+    # 补货：扫描开始时按预计需要的食物和种子，与箱子里的数量比较，
+    # 在金币预算内每种模板只买一次，所有购买合在一个交易里
+    def scan_provision(self):
+        self.log.info("检查食物和种子储备")
+        end = self.clock.now() + timedelta(hours=self.param.provision_hours)
+        need = {}
+        if self.param.buy_food:
+            need.update(self.forecast_food(end))
+        if self.param.auto_plant:
+            seeds = self.forecast_seeds(end)
+            if self.param.buy_barley_seed:
+                need[NFT.BarleySeed] = seeds[NFT.BarleySeed]
+            if self.param.buy_corn_seed:
+                need[NFT.CornSeed] = seeds[NFT.CornSeed]
+        inventory = self.get_inventory()
+        budget = self.resoure.gold
+        if self.param.provision_gold > 0:
+            budget = min(budget, Decimal(self.param.provision_gold))
+        orders = []
+        # 食物在前：动物缺食物会错过喂养，种子晚一点种影响较小
+        for template_id, count in need.items():
+            item_class = self.game.farming_table.get(template_id)
+            shortage = count - inventory.get(template_id, 0)
+            if shortage <= 0 or not item_class:
+                continue
+            # 牛奶等只能自己产出，市场不能购买
+            if not getattr(item_class, "golds_cost", None):
+                self.log.info("[{0}] 预计需要{1} 现有{2}，不能购买，请自行准备".format(
+                    item_class.name, count, inventory.get(template_id, 0)))
+                continue
+            if template_id in (NFT.Barley, NFT.Corn):
+                shortage = max(shortage, self.param.buy_food_num)
+            buy_num = min(shortage, int(budget / item_class.golds_cost))
+            self.log.info("[{0}] 预计需要{1} 现有{2} 购买{3}".format(
+                item_class.name, count, inventory.get(template_id, 0), buy_num))
+            if buy_num < shortage:
+                self.log.warning("金币预算不足，[{0}]少买{1}个".format(item_class.name, shortage - buy_num))
+            if buy_num <= 0:
+                continue
+            budget -= item_class.golds_cost * buy_num
+            orders.append((template_id, buy_num))
+        if not orders:
+            self.log.info("食物和种子储备充足")
+            return True
+        actions = [self.build_transaction("farmersworld", "mktbuy", {
+            "owner": self.wax_account,
+            "quantity": buy_num,
+            "template_id": template_id,
+        })["actions"][0] for template_id, buy_num in orders]
+        self.wax_transact({"actions": actions})
+        self.resoure.gold -= sum(self.game.farming_table[template_id].golds_cost * buy_num for template_id, buy_num in orders)
+        self.log.info("购买完成")
+        return True
+
+    # 种植：按种子搭配取出所有种子，一次转账全部种下
     def plant_corps(self, slots_num):
-        self.log.info("获取大麦或玉米种子")
-        if user_param.barleyseed_num > 0:
-            barleyseed_list = self.get_asset(298595, 'Barley Seed')
-            plant_times = min(slots_num, user_param.barleyseed_num)
-            if len(barleyseed_list) < plant_times and user_param.buy_barley_seed:
-                self.log.warning("大麦种子数量不足,开始市场购买")
-                buy_barleyseed_num = plant_times - len(barleyseed_list)
-                rs = self.buy_corps(298595, buy_barleyseed_num)
-                if not rs:
-                    return False
-                else:
-                    barleyseed_list = self.get_asset(298595, 'Barley Seed')
-            if len(barleyseed_list) > 0:
-                for i in range(plant_times):
-                    asset = barleyseed_list.pop()
-                    self.wear_assets([asset.asset_id])
-            else:
-                self.log.info("大麦种子数量不足，请及时补充")
-        else:
-            self.log.info("设置的大麦种子数量为0")
-
-        if user_param.cornseed_num > 0:
-            cornseed_list = self.get_asset(298596, 'Corn Seed')
-            plant_times2 = min(slots_num, user_param.cornseed_num)
-            if len(cornseed_list) < plant_times2 and user_param.buy_corn_seed:
-                self.log.warning("玉米种子数量不足,开始市场购买")
-                buy_cornseed_num = plant_times2 - len(cornseed_list)
-                rs = self.buy_corps(298596, buy_cornseed_num)
-                if not rs:
+        self.log.info("获取大麦或玉米种子，空闲地块{0}个".format(slots_num))
+        inventory = self.get_inventory()
+        asset_ids = []
+        seeds = [
+            (NFT.BarleySeed, "Barley Seed", "大麦种子", self.param.buy_barley_seed),
+            (NFT.CornSeed, "Corn Seed", "玉米种子", self.param.buy_corn_seed),
+        ]
+        plan = self.seed_plan(slots_num)
+        for template_id, name, show_name, can_buy in seeds:
+            plant_times = plan[template_id]
+            if plant_times <= 0:
+                continue
+            count = inventory.get(template_id, 0)
+            if count < plant_times and can_buy:
+                self.log.warning("{0}数量不足,开始市场购买".format(show_name))
+                if not self.buy_corps(template_id, plant_times - count):
                     return False
-                else:
-                    cornseed_list = self.get_asset(298596, 'Corn Seed')
-            if len(cornseed_list) > 0:
-                for i in range(plant_times2):
-                    asset = cornseed_list.pop()
-                    self.wear_assets([asset.asset_id])
-            else:
-                self.log.info("玉米种子数量不足，请及时补充")
-        else:
-            self.log.info("设置的玉米种子数量为0")
-
+            asset_list = self.get_asset(template_id, name, plant_times)
+            if len(asset_list) < plant_times:
+                self.log.info("{0}数量不足，请及时补充".format(show_name))
+            asset_ids.extend(asset.asset_id for asset in asset_list)
+        if not asset_ids:
+            self.log.info("没有可种的种子")
+            return True
+        self.wear_assets(asset_ids)
         return True
 
     # 穿戴工具，种地-（种地：玉米、小麦）
     def wear_assets(self, asset_ids):
-        self.log.info("正在种地【玉米种子|小麦种子】")
+        self.log.info("正在种地【玉米种子|小麦种子】{0}个".format(len(asset_ids)))
         transaction = {
             "actions": [{
                 "account": "atomicassets",
@@ -919,7 +1459,7 @@ class Farmer:
         }
         self.wax_transact(transaction)
         self.log.info("种地完成")
-        time.sleep(cfg.req_interval)
+        self.sleep(cfg.req_interval)
 
     def scan_crops(self):
         self.log.info("检查农田")
@@ -940,55 +1480,33 @@ class Farmer:
         self.claim_crops(crops)
         return True
 
-    # 售卖玉米和大麦
+    # 售卖玉米和大麦，先一次取得各模板数量，只获取需要卖出的那部分资产
     def scan_nft_assets(self):
+        inventory = self.get_inventory()
         asset_ids = []
-        sell_barley_num = 0
-        sell_corn_num = 0
-        sell_milk_num = 0
-        sell_egg_num = 0
-        if user_param.sell_corn:
-            self.log.info("检查玉米NFT")
-            list_corn = self.get_corn()
-            self.log.info("剩余玉米数量: {0}".format(len(list_corn)))
-            if len(list_corn) > 0:
-                for item in list_corn:
-                    if len(list_corn) - sell_corn_num <= user_param.remaining_corn_num:
-                        break
-                    asset_ids.append(item.asset_id)
-                    sell_corn_num = sell_corn_num + 1
-
-        if user_param.sell_barley:
-            self.log.info("检查大麦")
-            list_barley = self.get_barley()
-            self.log.info("剩余大麦数量: {0}".format(len(list_barley)))
-            if len(list_barley) > 0:
-                for item in list_barley:
-                    if len(list_barley) - sell_barley_num <= user_param.remaining_barley_num:
-                        break
-                    asset_ids.append(item.asset_id)
-                    sell_barley_num = sell_barley_num + 1
-        if user_param.sell_milk:
-            self.log.info("检查牛奶")
-            list_milk = self.get_milk()
-            self.log.info("剩余牛奶数量: {0}".format(len(list_milk)))
-            if len(list_milk) > 0:
-                for item in list_milk:
-                    if len(list_milk) - sell_milk_num <= user_param.remaining_milk_num:
-                        break
-                    asset_ids.append(item.asset_id)
-                    sell_milk_num = sell_milk_num + 1
-
-        if user_param.sell_egg:
-            self.log.info("检查鸡蛋")
-            list_egg = self.get_egg()
-            self.log.info("剩余鸡蛋数量: {0}".format(len(list_egg)))
-            if len(list_egg) > 0:
-                for item in list_egg:
-                    if len(list_egg) - sell_egg_num <= user_param.remaining_egg_num:
-                        break
-                    asset_ids.append(item.asset_id)
-                    sell_egg_num = sell_egg_num + 1
+        sell_num = {}
+        sell_items = [
+            (self.param.sell_corn, NFT.Corn, "玉米", self.param.remaining_corn_num),
+            (self.param.sell_barley, NFT.Barley, "大麦", self.param.remaining_barley_num),
+            (self.param.sell_milk, NFT.Milk, "牛奶", self.param.remaining_milk_num),
+            (self.param.sell_egg, NFT.ChickenEgg, "鸡蛋", self.param.remaining_egg_num),
+        ]
+        for enabled, template_id, name, remaining_num in sell_items:
+            sell_num[template_id] = 0
+            if not enabled:
+                continue
+            self.log.info("检查{0}".format(name))
+            count = inventory.get(template_id, 0)
+            self.log.info("剩余{0}数量: {1}".format(name, count))
+            if count - remaining_num <= 0:
+                continue
+            assets = self.get_asset(template_id, name, count - remaining_num)
+            asset_ids.extend([item.asset_id for item in assets])
+            sell_num[template_id] = len(assets)
+        sell_corn_num = sell_num[NFT.Corn]
+        sell_barley_num = sell_num[NFT.Barley]
+        sell_milk_num = sell_num[NFT.Milk]
+        sell_egg_num = sell_num[NFT.ChickenEgg]
 
         if len(asset_ids) <= 0:
             self.log.warning("没有可售卖的NFT资产【玉米|小麦|牛奶|鸡蛋】")
@@ -1021,38 +1539,40 @@ class Farmer:
         }
         self.wax_transact(transaction)
         self.log.info("售卖已完成")
-        time.sleep(cfg.req_interval)
+        self.sleep(cfg.req_interval)
 
-    def scan_breedings(self):
+    # 正在繁殖的动物中可以喂养的
+    def check_breedings(self) -> List[Animal]:
         self.log.info("检查繁殖的动物")
         breedings = self.get_breedings()
         self.log.info("饲养繁殖的动物:")
         for item in breedings:
-            self.log.info(item.show())
-        breedings = self.filter_operable(breedings)
-        if not breedings:
-            self.log.info("没有可操作繁殖的动物")
-            return True
-        self.log.info("可操作繁殖的动物:")
-        for item in breedings:
-            self.log.info(item.show())
-        self.breeding_claim(breedings)
-        return True
+            self.log.info(item.show(breeding=True))
+        return self.filter_operable(breedings)
 
-    def scan_animals(self):
+    # 动物中可以喂养的
+    def check_animals(self) -> List[Animal]:
         self.log.info("检查动物")
         animals = self.get_animals()
         self.log.info("饲养的动物:")
         for item in animals:
             self.log.info(item.show())
-        animals = self.filter_operable(animals)
+        return self.filter_operable(animals)
+
+    # 养鸡、养牛和繁殖喂养在一轮中一起处理
+    def scan_animals(self):
+        animals = []
+        if self.param.chicken or self.param.cow:
+            animals.extend(self.check_animals())
+        if self.param.breeding:
+            animals.extend(self.check_breedings())
         if not animals:
             self.log.info("没有可操作的动物")
             return True
         self.log.info("可操作的动物:")
         for item in animals:
-            self.log.info(item.show())
-        self.claim_animal(animals)
+            self.log.info(self.show_animal(item))
+        self.feed_animals(animals)
         return True
 
     def get_tools(self):
@@ -1060,12 +1580,10 @@ class Farmer:
         post_data["table"] = "tools"
         post_data["index_position"] = 2
 
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_tools:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get_tools")
         tools = []
         for item in resp["rows"]:
-            tool = res.create_tool(item)
+            tool = self.game.create_tool(item)
             if tool:
                 tools.append(tool)
             else:
@@ -1091,49 +1609,25 @@ class Farmer:
     def do_mining(self, tools: List[Tool]):
         for item in tools:
             self.log.info("正在采矿: {0}".format(item.show()))
-            self.consume_energy(Decimal(item.energy_consumed))
+            self.consume_energy(*self.energy_cost(item))
             self.consume_durability(item)
-            transaction = {
-                "actions": [{
-                    "account": "farmersworld",
-                    "name": "claim",
-                    "authorization": [{
-                        "actor": self.wax_account,
-                        "permission": "active",
-                    }],
-                    "data": {
-                        "asset_id": item.asset_id,
-                        "owner": self.wax_account,
-                    },
-                }],
-            }
-            self.wax_transact(transaction)
-            # ming_resource = result["processed"]["action_traces"][0]["inline_traces"][1]["act"]["data"]["rewards"]
-            # self.log.info("采矿成功: {0},{1}".format(item.show(more=False), ming_resource))
-            self.log.info("采矿成功: {0}".format(item.show(more=False)))
-            time.sleep(cfg.req_interval)
+            if self.try_claim(item, lambda: self.wax_transact(self.build_tool_claim(item))):
+                # ming_resource = result["processed"]["action_traces"][0]["inline_traces"][1]["act"]["data"]["rewards"]
+                # self.log.info("采矿成功: {0},{1}".format(item.show(more=False), ming_resource))
+                self.log.info("采矿成功: {0}".format(item.show(more=False)))
+            else:
+                self.count_error_claim += 1
+            self.sleep(cfg.req_interval)
 
     def scan_mining(self):
         self.log.info("检查矿场")
         tools = self.get_tools()
         self.log.info("采矿的工具:")
-        if user_param.mbs and user_param.mbs_mint:
+        if self.param.mbs and self.param.mbs_mint:
             self.log.info("已开启会员卡存储挖矿")
             
         for item in tools:
-            if user_param.mbs and user_param.mbs_mint:
-                if item.mining_type == 'Wood':
-                    item.next_availability = item.next_availability + item.charge_time * self.mbs_saved_claims.Wood
-                    item.energy_consumed = item.energy_consumed * (self.mbs_saved_claims.Wood+1)
-                    item.durability_consumed = item.durability_consumed * (self.mbs_saved_claims.Wood+1)
-                if item.mining_type == 'Food':
-                    item.next_availability = item.next_availability + item.charge_time * self.mbs_saved_claims.Food
-                    item.energy_consumed = item.energy_consumed * (self.mbs_saved_claims.Food + 1)
-                    item.durability_consumed = item.durability_consumed * (self.mbs_saved_claims.Food + 1)
-                if item.mining_type == 'Gold':
-                    item.next_availability = item.next_availability + item.charge_time * self.mbs_saved_claims.Gold
-                    item.energy_consumed = item.energy_consumed * (self.mbs_saved_claims.Gold + 1)
-                    item.durability_consumed = item.durability_consumed * (self.mbs_saved_claims.Gold + 1)
+            self.apply_mbs_mint(item)
             self.log.info(item.show())
         tools = self.filter_operable(tools)
         if not tools:
@@ -1145,6 +1639,22 @@ class Farmer:
         self.claim_mining(tools)
         return True
 
+    # 开启会员卡存储挖矿时，工具每次领取额外存储的次数
+    def mbs_saved_times(self, tool: Tool) -> int:
+        if not (self.param.mbs and self.param.mbs_mint) or not self.mbs_saved_claims:
+            return 0
+        return getattr(self.mbs_saved_claims, tool.mining_type, 0)
+
+    # 按当前的工具配置和会员卡存储次数调整工具的可操作时间和消耗，可重复调用
+    def apply_mbs_mint(self, tool: Tool):
+        saved = self.mbs_saved_times(tool)
+        tool_class = type(tool)
+        delay = tool_class.charge_time * saved
+        tool.next_availability = tool.next_availability - tool.mbs_delay + delay
+        tool.mbs_delay = delay
+        tool.energy_consumed = tool_class.energy_consumed * (saved + 1)
+        tool.durability_consumed = tool_class.durability_consumed * (saved + 1)
+
     # 充值
     def scan_deposit(self):
         self.log.info("检查是否需要充值")
@@ -1154,24 +1664,24 @@ class Farmer:
         deposit_food = 0
         deposit_gold = 0
 
-        if r.wood <= user_param.fww_min:
-            deposit_wood = user_param.deposit_fww
+        if r.wood <= self.param.fww_min:
+            deposit_wood = self.param.deposit_fww
             if 0 < self.token.fww < deposit_wood:
                 deposit_wood = self.token.fww
                 self.log.info(f"fww不足，剩余{deposit_wood}个fww代币将全部充值")
             elif self.token.fww == 0 and deposit_wood > 0:
                 self.log.info(f"fww为0，请先购买{deposit_wood}个fww代币")
                 return False
-        if r.gold <= user_param.fwg_min:
-            deposit_gold = user_param.deposit_fwg
+        if r.gold <= self.param.fwg_min:
+            deposit_gold = self.param.deposit_fwg
             if 0 < self.token.fwg < deposit_gold:
                 deposit_gold = self.token.fwg
                 self.log.info(f"fwg不足，剩余{deposit_gold}个fwg代币将全部充值")
             elif self.token.fwg == 0 and deposit_gold > 0:
                 self.log.info(f"fwg为0，请先购买{deposit_gold}个fwg代币")
                 return False
-        if r.food <= user_param.fwf_min:
-            deposit_food = user_param.deposit_fwf
+        if r.food <= self.param.fwf_min:
+            deposit_food = self.param.deposit_fwf
             if 0 < self.token.fwf < deposit_food:
                 deposit_food = self.token.fwf
                 self.log.info(f"fwf不足，剩余{deposit_food}个fwf代币将全部充值")
@@ -1285,7 +1795,7 @@ class Farmer:
         if need_food > self.resoure.food:
             if self.resoure.food <= 0:
                 # 食物不足，开启充值
-                if user_param.auto_deposit:
+                if self.param.auto_deposit:
                     self.log.info("食物不足，开启充值")
                     self.scan_deposit()
                 else:
@@ -1319,7 +1829,7 @@ class Farmer:
             return True
         else:
             self.log.info("能量不足")
-            recover = min(user_param.recover_energy, self.resoure.max_energy) - self.resoure.energy
+            recover = min(self.param.recover_energy, self.resoure.max_energy) - self.resoure.energy
             recover = (recover // Decimal(5)) * Decimal(5)
             self.recover_energy(recover)
             self.resoure.energy += recover
@@ -1337,7 +1847,7 @@ class Farmer:
 
     # 判断耐久度 （操作前模拟计算）
     def check_durability(self, tool: Tool):
-        if tool.current_durability / tool.durability < (user_param.min_durability / 100):
+        if tool.current_durability / tool.durability < (self.param.min_durability / 100):
             return False
         elif tool.current_durability < tool.durability_consumed:
             return False
@@ -1366,13 +1876,11 @@ class Farmer:
         post_data["index_position"] = 2
         post_data["key_type"] = "i64"
 
-        resp = self.http.post(self.url_table_row, json=post_data)
-        self.log.debug("get_mbs:{0}".format(resp.text))
-        resp = resp.json()
+        resp = self.get_table_rows(post_data, "get_mbs")
         mbs = []
         self.mbs_saved_claims = MbsSavedClaims()
         for item in resp["rows"]:
-            mb = res.create_mbs(item)
+            mb = self.game.create_mbs(item)
             if mb:
                 self.add_saved_claims(mb)
                 mbs.append(mb)
@@ -1408,9 +1916,11 @@ class Farmer:
                     },
                 }],
             }
-            self.wax_transact(transaction)
-            self.log.info("点击会员卡成功: {0}".format(item.show(more=False)))
-            time.sleep(cfg.req_interval)
+            if self.try_claim(item, lambda: self.wax_transact(transaction)):
+                self.log.info("点击会员卡成功: {0}".format(item.show(more=False)))
+            else:
+                self.count_error_claim += 1
+            self.sleep(cfg.req_interval)
 
     def scan_withdraw(self):
         self.log.info("检查是否可以提现")
@@ -1424,13 +1934,13 @@ class Farmer:
         self.log.info(f"提现费率：{withdraw_fee}% ")
 
         if withdraw_fee == 5:
-            if r.wood > user_param.need_fww:
-                withdraw_wood = r.wood - user_param.need_fww
-            if r.gold > user_param.need_fwg:
-                withdraw_gold = r.gold - user_param.need_fwg
-            if r.food > user_param.need_fwf:
-                withdraw_food = r.food - user_param.need_fwf
-            if withdraw_food + withdraw_gold + withdraw_wood < user_param.withdraw_min:
+            if r.wood > self.param.need_fww:
+                withdraw_wood = r.wood - self.param.need_fww
+            if r.gold > self.param.need_fwg:
+                withdraw_gold = r.gold - self.param.need_fwg
+            if r.food > self.param.need_fwf:
+                withdraw_food = r.food - self.param.need_fwf
+            if withdraw_food + withdraw_gold + withdraw_wood < self.param.withdraw_min:
                 self.log.info("提现数量太少了，下次再提")
                 return True
             self.do_withdraw(withdraw_food, withdraw_gold, withdraw_wood, withdraw_fee)
@@ -1444,81 +1954,367 @@ class Farmer:
         r = self.get_resource()
         self.log.info(f"金币【{r.gold}】 木头【{r.wood}】 食物【{r.food}】 能量【{r.energy}/{r.max_energy}】")
         self.resoure = r
-        if self.resoure.energy <= user_param.min_energy:
+        if self.resoure.energy <= self.param.min_energy:
             self.log.info("能量小于配置的最小能量，开启能量补充{0}".format(self.resoure.max_energy))
-            recover = min(user_param.recover_energy, self.resoure.max_energy) - self.resoure.energy
+            recover = min(self.param.recover_energy, self.resoure.max_energy) - self.resoure.energy
             recover = (recover // Decimal(5)) * Decimal(5)
             self.recover_energy(recover)
             self.resoure.energy += recover
 
-        time.sleep(cfg.req_interval)
+        self.sleep(cfg.req_interval)
         self.token = self.get_fw_balance()
         self.log.info(f"FWG【{self.token.fwg}】 FWW【{self.token.fww}】 FWF【{self.token.fwf}】")
 
+    # 把链上动作应用到本地状态，返回是否需要尽快做一次完整扫描
+    def apply_chain_action(self, action: ChainAction) -> bool:
+        if action.trx_id in self.refreshed_transactions and action.name != "logmint":
+            return False
+        data = action.data
+        if action.account == "farmersworld":
+            if action.name == "claim":
+                tool = self.items.get(str(data.get("asset_id")))
+                if isinstance(tool, Tool):
+                    self.apply_tool_claim(tool, action.timestamp)
+                    self.log.info("[动作流] 采矿: {0}".format(tool.show()))
+                return False
+            if action.name == "repair":
+                tool = self.items.get(str(data.get("asset_id")))
+                if isinstance(tool, Tool):
+                    tool.current_durability = tool.durability
+                return False
+            if action.name == "cropclaim":
+                return self.apply_item_claim(str(data.get("crop_id")), action.timestamp)
+            if action.name == "anmclaim":
+                return self.apply_item_claim(str(data.get("animal_id")), action.timestamp)
+            # 只影响资源和能量的动作，下次扫描时读取
+            if action.name in ("recover", "withdraw", "mbsclaim", "bldclaim"):
+                return False
+            return True
+        if action.account == "atomicassets" and action.name == "logmint":
+            if data.get("new_asset_owner") == self.wax_account and self.inventory is not None:
+                template_id = int(data["template_id"])
+                self.inventory[template_id] = self.inventory.get(template_id, 0) + 1
+                self.asset_templates[str(data["asset_id"])] = template_id
+            return False
+        if action.account == "atomicassets" and action.name == "transfer":
+            return self.apply_transfer(action)
+        return True
+
+    def apply_tool_claim(self, tool: Tool, timestamp: datetime):
+        tool.next_availability = timestamp + tool.charge_time
+        tool.mbs_delay = timedelta(0)
+        self.apply_mbs_mint(tool)
+        tool.current_durability -= tool.durability_consumed
+
+    # 作物、动物被收获或喂养一次
+    def apply_item_claim(self, key: str, timestamp: datetime) -> bool:
+        item = self.items.get(key)
+        if not isinstance(item, (Crop, Animal)):
+            return False
+        item.times_claimed = (item.times_claimed or 0) + 1
+        item.last_claimed = timestamp
+        item.next_availability = timestamp + item.charge_time
+        if isinstance(item, Animal):
+            item.day_claims_at = [t for t in item.day_claims_at if t > timestamp - timedelta(hours=24)]
+            item.day_claims_at.append(timestamp)
+            if len(item.day_claims_at) >= item.daily_claim_limit:
+                item.next_availability = max(item.next_availability, item.day_claims_at[0] + timedelta(hours=24))
+        self.log.info("[动作流] 操作: {0}".format(item.show()))
+        if item.required_claims and item.times_claimed >= item.required_claims:
+            # 收获或成长后作物消失或变成新的资产，重新扫描
+            del self.items[key]
+            return True
+        return False
+
+    def apply_transfer(self, action: ChainAction) -> bool:
+        data = action.data
+        asset_ids = [str(item) for item in data.get("asset_ids", [])]
+        if data.get("to") == self.wax_account:
+            # 转入的资产模板未知
+            self.inventory = None
+            return False
+        if data.get("from") != self.wax_account:
+            return False
+        memo_text = data.get("memo", "")
+        changed = False
+        if memo_text.startswith("feed_animal:"):
+            changed = self.apply_item_claim(memo_text[len("feed_animal:"):], action.timestamp)
+        elif memo_text.startswith("breed_animal:"):
+            changed = self.apply_item_claim(memo_text[len("breed_animal:"):].split(",")[0], action.timestamp)
+        elif memo_text == "stake":
+            # 种下的作物、放入的动物需要完整扫描才能得到
+            changed = True
+        if self.inventory is not None:
+            for asset_id in asset_ids:
+                template_id = self.asset_templates.pop(asset_id, None)
+                if template_id is None:
+                    self.inventory = None
+                    break
+                self.inventory[template_id] = max(self.inventory.get(template_id, 0) - 1, 0)
+        return changed
+
+    # 拉取链上动作流并更新本地状态和下次操作时间
+    def poll_action_feed(self):
+        if not self.action_feed or time.monotonic() - self.last_feed_poll < cfg.feed_poll_interval:
+            return
+        self.last_feed_poll = time.monotonic()
+        try:
+            actions = self.action_feed.poll()
+        except (RequestException, ValueError, KeyError) as e:
+            self.log.warning("拉取链上动作流失败: {0}".format(e))
+            # 动作流不可用时，退回到定时扫描
+            self.next_scan_time = min(self.next_scan_time, self.clock.now() + cfg.max_scan_interval)
+            return
+        if not actions:
+            return
+        need_scan = False
+        for action in actions:
+            need_scan = self.apply_chain_action(action) or need_scan
+        self.next_operate_time = self.local_next_operate_time()
+        self.next_scan_time = min(self.next_scan_time, self.next_operate_time)
+        if need_scan:
+            self.log.info("[动作流] 状态有变化，准备重新扫描")
+            self.next_scan_time = min(self.next_scan_time, self.clock.now() + cfg.min_scan_interval)
+        self.publish_state()
+
+    # 根据本地状态计算下一次可操作时间
+    def local_next_operate_time(self) -> datetime:
+        now = self.clock.now()
+        times = [item.next_availability for item in self.items.values() if item.next_availability > now]
+        if not times:
+            return datetime.max
+        return min(times) + self.clock.padding()
+
+    # 按主键读取一行，只刷新即将操作的东西
+    def get_row(self, table: str, asset_id) -> dict:
+        post_data = self.table_row_template()
+        post_data["table"] = table
+        post_data["index_position"] = 1
+        post_data["lower_bound"] = str(asset_id)
+        post_data["upper_bound"] = str(asset_id)
+        post_data["limit"] = 1
+        resp = self.get_table_rows(post_data, "get_{0}_row".format(table))
+        if not resp["rows"]:
+            return None
+        return resp["rows"][0]
+
+    # 用链上最新的一行更新作物，返回是否还存在
+    def refresh_item(self, item: Farming) -> bool:
+        if isinstance(item, Tool):
+            row = self.get_row("tools", item.asset_id)
+            if not row:
+                return False
+            item.next_availability = datetime.fromtimestamp(row["next_availability"])
+            item.mbs_delay = timedelta(0)
+            self.apply_mbs_mint(item)
+            item.current_durability = row["current_durability"]
+            return True
+        row = self.get_row("crops" if isinstance(item, Crop) else "animals", item.asset_id)
+        if not row:
+            return False
+        item.times_claimed = row.get("times_claimed", None)
+        item.last_claimed = datetime.fromtimestamp(row["last_claimed"])
+        item.next_availability = datetime.fromtimestamp(row["next_availability"])
+        if isinstance(item, Animal):
+            item.day_claims_at = [datetime.fromtimestamp(t) for t in row["day_claims_at"]]
+            if len(item.day_claims_at) >= item.daily_claim_limit:
+                item.next_availability = max(item.next_availability, item.day_claims_at[0] + timedelta(hours=24))
+        return True
+
+    # 到期前预热：刷新即将到期的东西，提前检查能量和耐久、准备食物、构造交易、注入waxjs，
+    # 不能提前准备的（建筑、会员卡、繁殖、需要维修的工具等）返回 False，到期时交给完整扫描处理
+    def prepare_due_claims(self, due: datetime) -> bool:
+        self.prepared = []
+        items = [item for item in self.items.values() if item.next_availability <= due]
+        if not items or not self.resoure:
+            return False
+        for item in items:
+            if not isinstance(item, (Tool, Crop, Animal)) or (isinstance(item, Animal) and item.bearer_id):
+                return False
+        allocation = self.allocate_food([item for item in items if isinstance(item, Animal)])
+        for item in items:
+            if not self.refresh_item(item):
+                self.log.info("[预热] 已不存在: {0}".format(item.show(more=False)))
+                continue
+            if item.next_availability > due + cfg.jit_warmup:
+                self.log.info("[预热] 可操作时间已变化: {0}".format(item.show()))
+                continue
+            if isinstance(item, Tool):
+                if not self.check_durability(item):
+                    return False
+                transaction = self.build_tool_claim(item)
+            elif isinstance(item, Crop):
+                transaction = self.build_crop_claim(item)
+            else:
+                food = allocation.get(self.item_key(item))
+                if 'Egg' not in item.name and not food:
+                    return False
+                transaction = self.build_animal_action(item, food)
+            self.consume_energy(*self.energy_cost(item))
+            self.prepared.append((item, transaction))
+        self.inject_waxjs()
+        self.prepared.sort(key=lambda x: x[0].next_availability)
+        self.log.info("[预热] 已准备{0}个操作".format(len(self.prepared)))
+        return True
+
+    # 等到每个操作生效的时刻立即提交，记录到期到提交的延迟
+    def submit_prepared(self):
+        for item, transaction in self.prepared:
+            wait = (item.next_availability + self.clock.padding() - self.clock.now()).total_seconds()
+            if wait > 0 and self.stop_event.wait(wait):
+                return
+            self.last_claim_lag = (self.clock.now() - item.next_availability).total_seconds()
+            if not self.try_claim(item, lambda: self.wax_transact(transaction)):
+                continue
+            if isinstance(item, Animal):
+                self.mark_food_spent(transaction)
+            self.log.info("准时操作成功: {0} 到期后{1:.3f}秒提交，合约耗时{2:.3f}秒".format(
+                item.show(more=False), self.last_claim_lag, self.last_transact_latency))
+
+    # 下次操作时间前 jit_warmup 预热，到期立即提交，成功后不再做完整扫描
+    def run_due_claims(self) -> int:
+        if self.next_operate_time == datetime.max or self.prepared_due == self.next_operate_time:
+            return Status.Continue
+        due = self.next_operate_time - self.clock.padding()
+        if self.clock.now() < due - cfg.jit_warmup:
+            return Status.Continue
+        self.prepared_due = self.next_operate_time
+        self.stage = "预热"
+        self.publish_state(force=True)
+        try:
+            if not self.prepare_due_claims(due):
+                self.log.info("[预热] 无法提前准备，到期后完整扫描")
+                return Status.Continue
+            self.submit_prepared()
+        except TransactException as e:
+            if not e.retry:
+                self.log.error("合约调用出错，不可重试: {0}".format(e))
+                return Status.Stop
+            self.log.error("准时操作出错，稍后完整扫描")
+            self.next_scan_time = self.clock.now() + cfg.min_scan_interval
+            return Status.Continue
+        except Exception as e:
+            self.log.exception(str(e))
+            self.log.error("准时操作出错，稍后完整扫描")
+            self.next_scan_time = self.clock.now() + cfg.min_scan_interval
+            return Status.Continue
+        finally:
+            self.prepared = []
+            self.stage = "等待"
+        self.next_operate_time = self.local_next_operate_time()
+        self.next_scan_time = min(self.next_full_scan_time, self.next_operate_time)
+        self.log.info("下一轮扫描时间: {0}".format(utils.show_time(self.next_scan_time)))
+        self.publish_state(force=True)
+        return Status.Continue
+
     def reset_before_scan(self):
         self.not_operational.clear()
+        self.items.clear()
+        self.buildings_rows = None
+        if len(self.refreshed_transactions) > 1000:
+            self.refreshed_transactions.clear()
+        # 按时间过期，原子市场早已更新的食物不再排除
+        expire = time.monotonic() - cfg.spent_food_ttl
+        self.spent_food = {asset_id: spent for asset_id, spent in self.spent_food.items() if spent > expire}
+        if self.clock.now() >= self.next_check_time:
+            # 一致性检查时重新读取箱子
+            self.inventory = None
         self.count_success_claim = 0
         self.count_error_claim = 0
 
+    # 扫描中的一个阶段：阶段内可重试的合约失败（购买、提现、充值、出售、建造、种植、修理、恢复能量等）
+    # 按阶段放进重试队列，本轮继续后面的阶段，到重试时间前跳过该阶段；不可重试的继续抛出。
+    # 资源和各作物的阶段不跳过：后面的阶段依赖资源数据，作物有各自的重试时间，跳过会漏掉到期的操作
+    def scan_phase(self, name: str, scan, skip_blocked: bool = True):
+        key = self.phase_prefix + name
+        retry_at = self.retry_queue.blocked_until(key, self.clock.now())
+        if retry_at and skip_blocked:
+            self.log.info("[{0}]等待重试: {1}".format(name, utils.show_time(retry_at)))
+            return
+        try:
+            with self.profiler.phase(name):
+                scan()
+        except TransactException as e:
+            if not e.retry:
+                raise
+            retry_at = self.retry_queue.failed(key, e.kind, self.clock.now(), str(e))
+            self.metrics.inc("farmer_retries_total", kind=e.kind)
+            self.log.warning("操作失败[{0}]: [{1}]，{2}后重试".format(e.kind, name, utils.show_time(retry_at)))
+            return
+        self.retry_queue.succeeded(key)
+
     # 检查正在培养的作物， 返回值：是否继续运行程序
     def scan_all(self) -> int:
         status = Status.Continue
+        scan_begin = time.perf_counter()
+        self.memo.begin()
+        self.profiler.begin_scan()
+        if self.recorder:
+            self.recorder.mark("scan", chain_time=self.clock.now().timestamp())
         try:
             self.reset_before_scan()
             self.log.info("开始一轮扫描")
-            self.scan_resource()
-            time.sleep(cfg.req_interval)
-
-            if user_param.mbs:
-                self.scan_mbs()
-                time.sleep(cfg.req_interval)
-            if user_param.mining:
-                self.scan_mining()
-                time.sleep(cfg.req_interval)
-            if user_param.plant:
-                self.scan_crops()
-                time.sleep(cfg.req_interval)
-            # 养牛和养鸡
-            if user_param.chicken or user_param.cow:
-                self.scan_animals()
-                time.sleep(cfg.req_interval)
-            # 繁殖喂养
-            if user_param.breeding:
-                self.scan_breedings()
-                time.sleep(cfg.req_interval)
-            if user_param.withdraw:
-                self.scan_withdraw()
-                time.sleep(cfg.req_interval)
-            if user_param.auto_deposit:
-                self.scan_deposit()
-                time.sleep(cfg.req_interval)
-            if user_param.sell_corn or user_param.sell_barley or user_param.sell_milk or user_param.sell_egg:
+            self.scan_phase("scan_resource", self.scan_resource, skip_blocked=False)
+            self.sleep(cfg.req_interval)
+            if self.param.buy_food or self.param.buy_barley_seed or self.param.buy_corn_seed:
+                self.scan_phase("scan_provision", self.scan_provision)
+                self.sleep(cfg.req_interval)
+
+            if self.param.mbs:
+                self.scan_phase("scan_mbs", self.scan_mbs, skip_blocked=False)
+                self.sleep(cfg.req_interval)
+            if self.param.mining:
+                self.scan_phase("scan_mining", self.scan_mining, skip_blocked=False)
+                self.sleep(cfg.req_interval)
+            if self.param.plant:
+                self.scan_phase("scan_crops", self.scan_crops, skip_blocked=False)
+                self.sleep(cfg.req_interval)
+            # 养牛、养鸡和繁殖喂养
+            if self.param.chicken or self.param.cow or self.param.breeding:
+                self.scan_phase("scan_animals", self.scan_animals, skip_blocked=False)
+                self.sleep(cfg.req_interval)
+            if self.param.withdraw:
+                self.scan_phase("scan_withdraw", self.scan_withdraw)
+                self.sleep(cfg.req_interval)
+            if self.param.auto_deposit:
+                self.scan_phase("scan_deposit", self.scan_deposit)
+                self.sleep(cfg.req_interval)
+            if self.param.sell_corn or self.param.sell_barley or self.param.sell_milk or self.param.sell_egg:
                 # 卖玉米和大麦和牛奶
-                self.scan_nft_assets()
-                time.sleep(cfg.req_interval)
-            if user_param.build:
-                self.scan_buildings()
-                time.sleep(cfg.req_interval)
-            if user_param.auto_plant:
-                self.scan_plants()
-                time.sleep(cfg.req_interval)
+                self.scan_phase("scan_nft_assets", self.scan_nft_assets)
+                self.sleep(cfg.req_interval)
+            if self.param.build:
+                self.scan_phase("scan_buildings", self.scan_buildings, skip_blocked=False)
+                self.sleep(cfg.req_interval)
+            if self.param.auto_plant:
+                self.scan_phase("scan_plants", self.scan_plants)
+                self.sleep(cfg.req_interval)
             self.log.info("结束一轮扫描")
-            if self.not_operational:
-                self.next_operate_time = min([item.next_availability for item in self.not_operational])
+            retry_times = [item.next_availability for item in self.not_operational]
+            phase_retry_at = self.retry_queue.earliest(self.phase_prefix, self.clock.now())
+            if phase_retry_at:
+                retry_times.append(phase_retry_at)
+            if retry_times:
+                self.next_operate_time = min(retry_times)
                 self.log.info("下一次可操作时间: {0}".format(utils.show_time(self.next_operate_time)))
-                # 可操作时间到了，也要延后5秒再扫，以免
-                self.next_operate_time += timedelta(seconds=5)
+                # 可操作时间到了，也要再等链上时间的误差范围再扫，以免过早操作
+                self.next_operate_time += self.clock.padding()
             else:
                 self.next_operate_time = datetime.max
             if self.count_success_claim > 0 or self.count_error_claim > 0:
                 self.log.info(f"本轮操作成功数量: {self.count_success_claim} 操作失败数量: {self.count_error_claim}")
 
             if self.count_error_claim > 0:
-                self.log.info("本轮有失败操作，稍后重试")
-                self.next_scan_time = datetime.now() + cfg.min_scan_interval
+                self.log.info("本轮有失败操作，按各自的重试时间重试，等待重试的有{0}个".format(len(self.retry_queue)))
+            if self.action_feed:
+                # 有动作流时由动作流推动下次操作时间，完整扫描只作为一致性检查
+                if self.clock.now() >= self.next_check_time:
+                    self.next_check_time = self.clock.now() + cfg.feed_scan_interval
+                self.next_scan_time = self.next_check_time
             else:
-                self.next_scan_time = datetime.now() + cfg.max_scan_interval
+                self.next_scan_time = self.clock.now() + cfg.max_scan_interval
 
+            self.next_full_scan_time = self.next_scan_time
             self.next_scan_time = min(self.next_scan_time, self.next_operate_time)
 
             # 没有合约出错，清空错误计数器
@@ -1533,7 +2329,7 @@ class Farmer:
             if self.count_error_transact >= e.max_retry_times and e.max_retry_times != -1:
                 self.log.error("合约连续调用异常")
                 return Status.Stop
-            self.next_scan_time = datetime.now() + cfg.min_scan_interval
+            self.next_scan_time = self.clock.now() + cfg.min_scan_interval
         except CookieExpireException as e:
             self.log.exception(str(e))
             self.log.error("Cookie失效，请手动重启程序并重新登录")
@@ -1545,24 +2341,115 @@ class Farmer:
         except FarmerException as e:
             self.log.exception(str(e))
             self.log.error("常规错误，稍后重试")
-            self.next_scan_time = datetime.now() + cfg.min_scan_interval
+            self.next_scan_time = self.clock.now() + cfg.min_scan_interval
         except Exception as e:
             self.log.exception(str(e))
             self.log.error("常规错误，稍后重试")
-            self.next_scan_time = datetime.now() + cfg.min_scan_interval
-
+            self.next_scan_time = self.clock.now() + cfg.min_scan_interval
+
+        self.memo.end()
+        self.log.info(self.memo.report())
+        summary = self.profiler.end_scan()
+        if summary:
+            self.log.info(summary)
+        self.metrics.inc("farmer_scans_total")
+        self.metrics.inc("farmer_scan_seconds_total", time.perf_counter() - scan_begin)
         self.log.info("下一轮扫描时间: {0}".format(utils.show_time(self.next_scan_time)))
+        self.stage = "等待"
+        self.publish_state(force=True)
         return status
 
+    # 配置文件修改后，把变化的配置应用到当前账号
+    def reload_config(self) -> int:
+        self.last_config_reload = time.monotonic()
+        try:
+            changed = self.config_watcher.poll()
+        except fleet.ConfigError as e:
+            self.log.warning("{0}，继续使用原配置".format(e))
+            return Status.Continue
+        ignored = [key for key in changed if key in fleet.restart_keys]
+        if ignored:
+            self.log.warning("以下配置需要重启程序才能生效: {0}".format(",".join(ignored)))
+        changed = {key: value for key, value in changed.items() if key not in fleet.restart_keys}
+        if not changed:
+            return Status.Continue
+        self.log.info("配置已更新: {0}".format(",".join(changed)))
+        for key, value in changed.items():
+            setattr(self.param, key, value)
+        self.set_endpoints()
+        self.proxy = self.param.proxy if self.param.use_proxy else None
+        self.set_http_proxy()
+        # 按新配置完整扫描一次，已安排的操作以新配置为准
+        self.prepared = []
+        self.prepared_due = None
+        self.next_operate_time = datetime.max
+        self.next_scan_time = datetime.min
+        if fleet.browser_keys & set(changed) and (self.driver or self.browser_restart_pending):
+            self.log.info("浏览器相关配置已变化，重启浏览器")
+            return self.restart_browser()
+        return Status.Continue
+
+    # 重启浏览器并重新登录，其他状态保留；失败时不退出，过一段时间再试，期间暂停操作
+    def restart_browser(self) -> int:
+        self.last_browser_restart = time.monotonic()
+        with self.close_lock:
+            driver = self.driver
+            self.driver = None
+        try:
+            if driver:
+                driver.quit()
+                utils.unregister_farmer(self.wax_account)
+            self.start()
+        except CookieExpireException as e:
+            self.log.exception(str(e))
+            self.log.error("Cookie失效，请手动重启程序并重新登录")
+            return Status.Stop
+        except Exception as e:
+            self.log.exception(str(e))
+            self.log.error("重启浏览器失败，{0}秒后重试，可先检查配置文件中的代理和节点".format(
+                cfg.browser_restart_interval))
+            self.browser_restart_pending = True
+            return Status.Continue
+        self.browser_restart_pending = False
+        return Status.Continue
+
     def run_forever(self):
-        while True:
-            if datetime.now() > self.next_scan_time:
+        while not self.stop_event.is_set():
+            status = Status.Continue
+            if self.config_watcher and time.monotonic() - self.last_config_reload > cfg.config_reload_interval:
+                status = self.reload_config()
+            if status == Status.Continue and self.browser_restart_pending:
+                if time.monotonic() - self.last_browser_restart > cfg.browser_restart_interval:
+                    status = self.restart_browser()
+                if status == Status.Continue and self.browser_restart_pending:
+                    self.stop_event.wait(1)
+                    continue
+            if status == Status.Continue:
+                status = self.run_due_claims()
+            if status == Status.Continue and self.clock.now() > self.next_scan_time:
+                self.stage = "扫描"
+                self.publish_state(force=True)
                 status = self.scan_all()
-                if status == Status.Stop:
-                    self.close()
-                    self.log.info("程序已停止，请检查日志后手动重启程序")
-                    return 1
-            time.sleep(1)
+            if status == Status.Stop:
+                self.close()
+                self.stage = "已停止"
+                self.publish_state(force=True)
+                self.log.info("程序已停止，请检查日志后手动重启程序")
+                return utils.ExitCode.Fatal
+            self.poll_action_feed()
+            if time.monotonic() - self.clock.last_sync > cfg.clock_sync_interval:
+                self.sync_clock()
+            if time.monotonic() - self.last_config_check > cfg.config_check_interval:
+                self.check_farming_config()
+            # 空闲时定期输出状态，作为心跳
+            if self.state_feed and time.monotonic() - self.state_feed.last_publish > cfg.state_heartbeat_interval:
+                self.publish_state(force=True)
+            self.stop_event.wait(1)
+        self.close()
+        self.stage = "已停止"
+        self.publish_state(force=True)
+        self.log.info("程序已按请求停止")
+        return utils.ExitCode.Stopped
 
 
 def test():
@@ -0,0 +1,211 @@
+# 故障注入：按场景文件在 http 会话和签名通道上注入延迟、超时、限流（429）、节点错误（5xx）、
+# 截断的 JSON 和合约错误，统计浪费的请求和每次故障后的恢复时间，用来检验重试和退避的表现
+#
+# 场景文件（yaml）示例：
+#   seed: 1
+#   http:
+#     - fault: status        # latency | timeout | reset | status | truncate
+#       status: 429
+#       rate: 0.5            # 命中概率
+#       start: 30            # 开始后第几秒生效，默认一直生效
+#       end: 90
+#       match: get_table_rows  # 只对包含该字符串的 url 生效
+#   transact:
+#     - fault: error         # latency | error | bridge
+#       message: "billed CPU time (1200 us) is greater than the maximum billable CPU time for the transaction"
+#       rate: 0.2
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, List
+import yaml
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, ReadTimeout, RequestException
+from requests.structures import CaseInsensitiveDict
+
+
+@dataclass
+class Rule:
+    fault: str
+    rate: float = 1.0
+    start: float = 0
+    end: float = None
+    match: str = None
+    # 延迟、超时的秒数
+    seconds: float = 5
+    # status 故障返回的状态码
+    status: int = 503
+    # error、bridge 故障的错误信息
+    message: str = "assertion failure with message: injected fault"
+
+    def active(self, elapsed: float, target: str, rng: random.Random) -> bool:
+        if elapsed < self.start or (self.end is not None and elapsed >= self.end):
+            return False
+        if self.match and self.match not in target:
+            return False
+        return rng.random() < self.rate
+
+
+def make_rules(items: List[dict]) -> List[Rule]:
+    names = {item.name for item in fields(Rule)}
+    return [Rule(**{key: value for key, value in item.items() if key in names}) for item in items or []]
+
+
+def load_scenario(path: str) -> dict:
+    with open(path, "r", encoding="utf8") as file:
+        return yaml.load(file, Loader=yaml.FullLoader) or {}
+
+
+# 某个通道（http 或 transact）的统计：连续失败算一次故障，从第一次失败到下一次成功为恢复时间
+class Channel:
+    def __init__(self):
+        self.total = 0
+        self.wasted = 0
+        self.injected = Counter()
+        self.failing_since: float = None
+        self.recoveries: List[float] = []
+
+    def outcome(self, ok: bool, now: float):
+        self.total += 1
+        if ok:
+            if self.failing_since is not None:
+                self.recoveries.append(now - self.failing_since)
+                self.failing_since = None
+        else:
+            self.wasted += 1
+            if self.failing_since is None:
+                self.failing_since = now
+
+
+class FaultInjector:
+    def __init__(self, scenario: dict):
+        self.rng = random.Random(scenario.get("seed"))
+        self.http_rules = make_rules(scenario.get("http"))
+        self.transact_rules = make_rules(scenario.get("transact"))
+        self.begin = time.monotonic()
+        self.lock = threading.Lock()
+        self.http = Channel()
+        self.transact = Channel()
+
+    def pick(self, rules: List[Rule], target: str) -> Rule:
+        elapsed = time.monotonic() - self.begin
+        with self.lock:
+            for rule in rules:
+                if rule.active(elapsed, target, self.rng):
+                    return rule
+        return None
+
+    def outcome(self, channel: Channel, ok: bool, rule: Rule = None):
+        with self.lock:
+            if rule:
+                channel.injected[rule.fault] += 1
+            channel.outcome(ok, time.monotonic())
+
+    def report(self) -> Dict[str, dict]:
+        with self.lock:
+            return {name: {"total": channel.total, "wasted": channel.wasted, "injected": dict(channel.injected),
+                           "recoveries": list(channel.recoveries), "failing": channel.failing_since is not None}
+                    for name, channel in (("http", self.http), ("transact", self.transact))}
+
+    def show(self) -> str:
+        texts = []
+        for name, item in self.report().items():
+            recoveries = item["recoveries"]
+            texts.append("{0}: {1}次 浪费{2}次 注入{3} 故障{4}次 平均恢复{5:.1f}s 最长{6:.1f}s".format(
+                name, item["total"], item["wasted"], item["injected"], len(recoveries),
+                sum(recoveries) / len(recoveries) if recoveries else 0, max(recoveries, default=0)))
+        return " | ".join(texts)
+
+
+# 包装会话上原有的 adapter（直连或录制），注入的故障对 tenacity 重试和上层的异常处理都是真实的
+class FaultAdapter(BaseAdapter):
+    def __init__(self, injector: FaultInjector, inner: BaseAdapter):
+        super().__init__()
+        self.injector = injector
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        rule = self.injector.pick(self.injector.http_rules, request.url)
+        try:
+            resp = self.inject(rule, request, **kwargs)
+        except RequestException:
+            self.injector.outcome(self.injector.http, False, rule)
+            raise
+        ok = resp.status_code < 400 and (rule is None or rule.fault == "latency")
+        self.injector.outcome(self.injector.http, ok, rule)
+        return resp
+
+    def inject(self, rule: Rule, request, **kwargs) -> Response:
+        if rule is None:
+            return self.inner.send(request, **kwargs)
+        if rule.fault == "latency":
+            time.sleep(rule.seconds)
+            return self.inner.send(request, **kwargs)
+        if rule.fault == "timeout":
+            timeout = kwargs.get("timeout")
+            if isinstance(timeout, tuple):
+                timeout = timeout[-1]
+            time.sleep(min(rule.seconds, timeout) if timeout else rule.seconds)
+            raise ReadTimeout("injected timeout", request=request)
+        if rule.fault == "reset":
+            raise RequestsConnectionError("injected connection reset", request=request)
+        if rule.fault == "status":
+            return self.make_response(request, rule.status, json.dumps({"code": rule.status, "message": "injected"}))
+        if rule.fault == "truncate":
+            resp = self.inner.send(request, **kwargs)
+            content = resp.content
+            resp._content = content[:len(content) // 2]
+            return resp
+        return self.inner.send(request, **kwargs)
+
+    @staticmethod
+    def make_response(request, status: int, content: str) -> Response:
+        resp = Response()
+        resp.status_code = status
+        resp._content = content.encode("utf8")
+        headers = {"Content-Type": "application/json"}
+        if status == 429:
+            headers["Retry-After"] = "1"
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.encoding = "utf8"
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        self.inner.close()
+
+
+def install_faults(http, injector: FaultInjector):
+    for prefix in ("http://", "https://"):
+        http.mount(prefix, FaultAdapter(injector, http.get_adapter(prefix)))
+
+
+def transact_names(transaction: dict) -> str:
+    return "+".join(action["name"] for action in transaction.get("actions", []))
+
+
+# 签名通道的故障：error 为合约报错（交易失败），bridge 为浏览器端异常
+def fault_bridge(injector: FaultInjector, bridge: Callable, error_type: type) -> Callable:
+    def transact(transaction: dict):
+        rule = injector.pick(injector.transact_rules, transact_names(transaction))
+        if rule and rule.fault == "error":
+            injector.outcome(injector.transact, False, rule)
+            return False, rule.message
+        if rule and rule.fault == "bridge":
+            injector.outcome(injector.transact, False, rule)
+            raise error_type(rule.message)
+        if rule and rule.fault == "latency":
+            time.sleep(rule.seconds)
+        try:
+            success, result = bridge(transaction)
+        except Exception:
+            injector.outcome(injector.transact, False, rule)
+            raise
+        injector.outcome(injector.transact, success, rule)
+        return success, result
+    return transact
@@ -0,0 +1,78 @@
+# 多账号配置：一个配置文件包含公共配置（defaults）和各账号不同的部分（accounts），
+# 运行中修改配置文件后，各账号在两轮扫描之间应用变化的配置，只有浏览器相关的配置变化时才重启浏览器
+import os
+from typing import Dict, List
+import yaml
+from settings import UserParam, load_user_param
+
+# 变化后需要重启浏览器的配置
+browser_keys = {"proxy", "use_proxy", "rpc_domain", "browser_backend", "chrome_path"}
+# 只在启动时生效的配置，运行中修改需要重启程序
+restart_keys = {"wax_account", "profile", "metrics_port", "action_feed", "capture", "fault_scenario"}
+
+
+class ConfigError(Exception):
+    pass
+
+
+def read_yaml(path: str) -> dict:
+    with open(path, "r", encoding="utf8") as file:
+        return yaml.load(file, Loader=yaml.FullLoader) or {}
+
+
+def is_fleet(data: dict) -> bool:
+    return "accounts" in data
+
+
+# 配置文件中的账号，普通的单账号配置文件只有一个
+def fleet_accounts(data: dict) -> List[str]:
+    if is_fleet(data):
+        return list(data["accounts"] or {})
+    return [data["wax_account"]]
+
+
+# 某个账号的配置：公共配置加上该账号不同的部分；普通的单账号配置文件直接使用
+def account_config(data: dict, account: str = None) -> dict:
+    if not is_fleet(data):
+        return data
+    accounts = data["accounts"] or {}
+    if account not in accounts:
+        raise ConfigError("配置文件中没有账号: {0}".format(account))
+    user = dict(data.get("defaults") or {})
+    user.update(accounts[account] or {})
+    user["wax_account"] = account
+    return user
+
+
+def load_account(path: str, account: str) -> UserParam:
+    return load_user_param(account_config(read_yaml(path), account), UserParam())
+
+
+# 按修改时间检查配置文件，与上一次读到的配置比较，只返回文件中变化的配置；
+# 运行中自动调整的配置（如节点切换）不算变化
+class ConfigWatcher:
+    def __init__(self, path: str, account: str):
+        self.path = path
+        self.account = account
+        self.mtime = self.stat()
+        self.values = load_account(path, account).to_dict()
+
+    def stat(self) -> float:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    # 没有变化时返回空字典；文件读取失败时抛出 ConfigError，保留原配置，文件再次修改后重新读取
+    def poll(self) -> Dict[str, object]:
+        mtime = self.stat()
+        if mtime is None or mtime == self.mtime:
+            return {}
+        self.mtime = mtime
+        try:
+            values = load_account(self.path, self.account).to_dict()
+        except (OSError, KeyError, TypeError, AttributeError, yaml.YAMLError) as e:
+            raise ConfigError("读取配置文件失败: {0}".format(e))
+        changed = {key: value for key, value in values.items() if self.values.get(key) != value}
+        self.values = values
+        return changed
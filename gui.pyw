@@ -1,16 +1,17 @@
 from PyQt6.QtWidgets import *
-from PyQt6.QtCore import Qt, QThread, QObject, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QRect
 from PyQt6 import QtGui
 from dialog import Ui_Dialog
+from logview import LogModel, LogFilterModel, LogView, QtLogHandler
 import logging
 from farmer import Farmer
 import logger
-from logger import log
 import yaml
 import sys
 import utils
-from settings import load_user_param, user_param
+from settings import load_user_param, user_param, cfg
 import os
+import threading
 
 version = "1.2"
 
@@ -20,14 +21,6 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-class QTextEditLogHandler(QObject, logging.Handler):
-    signal_log = pyqtSignal(str)
-
-    def emit(self, record):
-        msg = self.format(record)
-        self.signal_log.emit(msg)
-
-
 class Worker(QThread):
     def __init__(self, farmer: Farmer):
         super().__init__()
@@ -35,6 +28,7 @@ class Worker(QThread):
 
     def run(self):
         logger.init_loger(user_param.wax_account)
+        log = logger.get_log(user_param.wax_account)
         log.info("项目开源地址：https://github.com/lintan/OpenFarmer")
         log.info("WAX账号： {0}".format(user_param.wax_account))
         utils.clear_orphan_webdriver()
@@ -61,15 +55,38 @@ class MyDialog(QDialog, Ui_Dialog):
         self.setWindowFlags(Qt.WindowType.WindowMinimizeButtonHint | Qt.WindowType.WindowCloseButtonHint)
         self.setFixedSize(self.size())
         self.button_start.clicked.connect(self.start)
-        handler = QTextEditLogHandler()
-        handler.signal_log.connect(self.show_log)
+        self.setup_log_view()
+        handler = QtLogHandler(self.log_model, cfg.gui_log_flush_ms)
         #logging_format = logging.Formatter("[%(asctime)s][%(levelname)s][%(process)d]: %(message)s")
         logging_format = logging.Formatter("[%(asctime)s][%(tag)s]: %(message)s", "%Y-%m-%d %H:%M:%S")
         handler.setFormatter(logging_format)
         logging.getLogger().addHandler(handler)
+        self.log_handler = handler
         self.load_yaml()
         self.worker = Worker(self.farmer)
 
+    # 用虚拟化的日志列表替换界面上的文本框，底部放级别过滤和搜索
+    def setup_log_view(self):
+        rect = self.plain_text_edit.geometry()
+        self.plain_text_edit.hide()
+        self.log_model = LogModel(cfg.gui_log_max_lines, self)
+        self.log_filter = LogFilterModel(self)
+        self.log_filter.setSourceModel(self.log_model)
+        self.log_view = LogView(self)
+        self.log_view.setModel(self.log_filter)
+        self.log_view.setGeometry(rect)
+        self.combobox_log_level = QComboBox(self)
+        self.combobox_log_level.setGeometry(QRect(rect.left(), rect.bottom() + 6, 90, 22))
+        for name, level in [("全部", logging.NOTSET), ("INFO", logging.INFO), ("WARNING", logging.WARNING),
+                            ("ERROR", logging.ERROR)]:
+            self.combobox_log_level.addItem(name, level)
+        self.combobox_log_level.currentIndexChanged.connect(
+            lambda index: self.log_filter.set_min_level(self.combobox_log_level.itemData(index)))
+        self.edit_log_search = QLineEdit(self)
+        self.edit_log_search.setGeometry(QRect(rect.left() + 100, rect.bottom() + 6, 250, 22))
+        self.edit_log_search.setPlaceholderText("搜索日志")
+        self.edit_log_search.textChanged.connect(self.log_filter.set_keyword)
+
     def load_yaml(self):
         if len(sys.argv) == 2:
             self.user_yml = sys.argv[1]
@@ -258,21 +275,29 @@ class MyDialog(QDialog, Ui_Dialog):
         self.worker.start()
 
     def show_log(self, line: str):
-        self.plain_text_edit.appendPlainText(line)
+        self.log_handler.append_line(line)
 
     def stop(self):
         self.update_ui(True)
         self.setEnabled(True)
         with open(self.user_yml, "w") as file:
             yaml.dump(user_param.to_dict(), file, default_flow_style=False, sort_keys=False)
-        self.plain_text_edit.appendPlainText("稍等，程序正在退出...")
-        self.repaint()
-        self.farmer.close()
-        self.plain_text_edit.appendPlainText("程序已退出")
+        self.show_log("稍等，程序正在退出...")
+        # 关闭浏览器比较慢，放到后台线程，避免界面卡住
+        self.farmer.request_stop()
+        threading.Thread(target=self.farmer.close, daemon=True).start()
 
     def closeEvent(self, event: QtGui.QCloseEvent):
-        self.stop()
-        event.accept()
+        if not self.worker.isRunning():
+            if not self.farmer.stop_event.is_set():
+                self.stop()
+            event.accept()
+            return
+        # 工作线程退出后再关闭窗口
+        if not self.farmer.stop_event.is_set():
+            self.stop()
+            self.worker.finished.connect(self.close)
+        event.ignore()
 
 
 def main():
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+# 多账号压测：在本机启动模拟链（emulator.py），逐步增加同一进程内运行的账号数，
+# 每一档统计吞吐量、准时操作的延迟、每个账号的CPU和内存，找出调度开始跟不上的账号数（饱和点）。
+# 浏览器签名用模拟链的签名延迟代替，不启动浏览器。--action-feed 时各账号使用模拟链推送的动作流，
+# --external-interval 模拟其他设备上的操作和别人的转账，检验动作流对本地状态的更新
+import argparse
+import logging
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+import psutil
+import logger
+from emulator import ChainEmulator, Distribution
+from res import NFT
+from farmer import Farmer
+from settings import cfg, UserParam
+
+
+class Worker:
+    def __init__(self, name: str, emulator: ChainEmulator, param: UserParam, action_feed: bool = False):
+        self.name = name
+        param = param.copy()
+        param.wax_account = name
+        self.farmer = Farmer(param)
+        self.farmer.wax_account = name
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.emulator = emulator
+        self.action_feed = action_feed
+        self.native_id: int = None
+        self.code: int = None
+        # 启动失败的原因（故障注入时可能发生）
+        self.error: str = None
+
+    def start(self):
+        # 先换成模拟签名，开启录制、故障注入时才能包在外层
+        self.farmer.transact_bridge = self.emulator.bridge(self.name)
+        try:
+            self.farmer.init()
+            if self.action_feed:
+                self.farmer.action_feed = self.emulator.action_feed(self.name)
+            self.farmer.prefetch()
+        except Exception as e:
+            self.error = "{0}: {1}".format(type(e).__name__, e)
+            return
+        self.thread.start()
+
+    def run(self):
+        self.native_id = threading.get_native_id()
+        self.code = self.farmer.run_forever()
+
+    def stop(self):
+        self.farmer.request_stop()
+
+
+def make_user_param(url: str) -> UserParam:
+    param = UserParam()
+    param.rpc_domain = url
+    param.rpc_domain_list = [url]
+    param.assets_domain = url
+    param.assets_domain_list = [url]
+    param.use_proxy = False
+    param.mining = True
+    param.plant = True
+    param.chicken = True
+    for name in ["build", "cow", "mbs", "mbs_mint", "withdraw", "auto_deposit", "sell_corn", "sell_barley",
+                 "sell_milk", "sell_egg", "auto_plant", "breeding", "buy_food", "buy_barley_seed",
+                 "buy_corn_seed", "profile"]:
+        setattr(param, name, False)
+    param.action_feed = None
+    param.metrics_port = None
+    return param
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+# 汇总各账号的故障注入统计
+def fault_report(workers: List[Worker]) -> str:
+    total: Dict[str, dict] = {}
+    for worker in workers:
+        if not worker.farmer.faults:
+            continue
+        for name, item in worker.farmer.faults.report().items():
+            merged = total.setdefault(name, {"total": 0, "wasted": 0, "recoveries": [], "failing": 0})
+            merged["total"] += item["total"]
+            merged["wasted"] += item["wasted"]
+            merged["recoveries"] += item["recoveries"]
+            merged["failing"] += item["failing"]
+    texts = []
+    for name, item in total.items():
+        recoveries = item["recoveries"]
+        texts.append("{0} 浪费{1}/{2} 故障{3}次 恢复p50 {4:.1f}s p95 {5:.1f}s 未恢复{6}".format(
+            name, item["wasted"], item["total"], len(recoveries), percentile(recoveries, 0.5),
+            percentile(recoveries, 0.95), item["failing"]))
+    return " | ".join(texts)
+
+
+# 每隔 interval 秒，在每个账号上模拟一次其他设备的操作和一次别人的转账
+def external_actions(emulator: ChainEmulator, workers: List[Worker], interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        for worker in list(workers):
+            emulator.external_claim(worker.name)
+            emulator.gift(worker.name, NFT.Barley, 1)
+
+
+# 各账号线程的CPU时间（秒）
+def thread_cpu(process: psutil.Process, workers: List[Worker]) -> float:
+    ids = {worker.native_id for worker in workers}
+    return sum(item.user_time + item.system_time for item in process.threads() if item.id in ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多账号压测（本地模拟链）")
+    parser.add_argument("--start", type=int, default=5, help="起始账号数")
+    parser.add_argument("--step", type=int, default=5, help="每一档增加的账号数")
+    parser.add_argument("--max", type=int, default=50, help="最多账号数")
+    parser.add_argument("--step-seconds", type=int, default=120, help="每一档运行的时间（秒）")
+    parser.add_argument("--tools", type=int, default=3, help="每个账号的工具数量")
+    parser.add_argument("--crops", type=int, default=4, help="每个账号的农田数量")
+    parser.add_argument("--animals", type=int, default=4, help="每个账号的鸡数量")
+    parser.add_argument("--charge", type=int, default=60, help="所有东西的操作间隔（秒）")
+    parser.add_argument("--latency", type=float, default=0.05, help="节点平均延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02, help="节点延迟抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="节点请求出错率")
+    parser.add_argument("--sign-latency", type=float, default=0.5, help="签名（浏览器）平均延迟（秒）")
+    parser.add_argument("--sign-error-rate", type=float, default=0.0, help="签名出错率")
+    parser.add_argument("--req-interval", type=float, default=0.2, help="请求间隔（秒），代替 cfg.req_interval")
+    parser.add_argument("--lag-limit", type=float, default=10, help="p95延迟超过多少秒视为饱和")
+    parser.add_argument("--faults", help="故障注入场景文件（yaml），见 faults.py")
+    parser.add_argument("--action-feed", action="store_true", help="使用模拟链推送的动作流，完整扫描只作为一致性检查")
+    parser.add_argument("--external-interval", type=float, default=0,
+                        help="每隔多少秒模拟一次其他设备上的操作和别人的转账，0为不模拟")
+    parser.add_argument("--verbose", action="store_true", help="输出各账号的日志")
+    args = parser.parse_args()
+
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+    if not args.verbose:
+        logger.log.logger.setLevel(logging.WARNING)
+    cfg.path_state = tempfile.mkdtemp(prefix="loadtest-state-")
+    cfg.req_interval = args.req_interval
+    cfg.transact_interval = 0
+    cfg.min_scan_interval = cfg.min_scan_interval / 10
+
+    net = Distribution(args.latency, args.jitter, args.error_rate)
+    emulator = ChainEmulator(args.charge, net, net, Distribution(args.sign_latency, args.sign_latency / 4,
+                                                                 args.sign_error_rate))
+    url = emulator.serve()
+    param = make_user_param(url)
+    param.fault_scenario = args.faults
+    print("模拟链: {0}".format(url))
+
+    process = psutil.Process()
+    workers: List[Worker] = []
+    items = args.tools + args.crops + args.animals
+    saturation = None
+    count = args.start
+    stop_external = threading.Event()
+    if args.external_interval > 0:
+        threading.Thread(target=external_actions, args=(emulator, workers, args.external_interval, stop_external),
+                         daemon=True).start()
+    try:
+        while count <= args.max:
+            while len(workers) < count:
+                name = "load{0:04d}.wam".format(len(workers) + 1)
+                emulator.add_account(name, args.tools, args.crops, args.animals)
+                worker = Worker(name, emulator, param, args.action_feed)
+                worker.start()
+                if worker.error:
+                    print("{0} 启动失败: {1}".format(name, worker.error))
+                workers.append(worker)
+            while any(worker.native_id is None and not worker.error for worker in workers):
+                time.sleep(0.1)
+            # 先运行一个操作周期，让新账号完成首轮扫描再开始统计
+            time.sleep(args.charge)
+            emulator.take_stats()
+            cpu_begin = thread_cpu(process, workers)
+            begin = time.monotonic()
+            time.sleep(args.step_seconds)
+            elapsed = time.monotonic() - begin
+            stats = emulator.take_stats()
+            cpu = (thread_cpu(process, workers) - cpu_begin) / elapsed / count * 100
+            rss = process.memory_info().rss / count / 1024 / 1024
+            # 其他设备上的操作占用了一部分可操作次数
+            expected = count * items * elapsed / args.charge - stats["external_claims"]
+            p50 = percentile(stats["lags"], 0.5)
+            p95 = percentile(stats["lags"], 0.95)
+            print("账号{0:4d} | 交易{1:6.2f}/s 请求{2:7.2f}/s | 操作{3}/{4:.0f} | 延迟p50 {5:.2f}s p95 {6:.2f}s | "
+                  "失败交易{7} 失败请求{8} | 每账号CPU {9:.1f}% 内存 {10:.1f}MB".format(
+                      count, stats["transactions"] / elapsed, stats["requests"] / elapsed, stats["claims"],
+                      expected, p50, p95, stats["transaction_errors"], stats["request_errors"], cpu, rss))
+            if args.faults:
+                print("故障注入（累计）: {0}".format(fault_report(workers)))
+            stopped = [worker.name for worker in workers if worker.code is not None or worker.error]
+            if stopped:
+                print("已停止的账号: {0}".format(",".join(stopped)))
+            if p95 > args.lag_limit or stats["claims"] < expected * 0.9:
+                saturation = count
+                break
+            count += args.step
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_external.set()
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            if worker.thread.is_alive():
+                worker.thread.join(timeout=30)
+        emulator.shutdown()
+    if saturation:
+        print("饱和点: {0}个账号（p95延迟超过{1}秒或操作数低于预期的90%）".format(saturation, args.lag_limit))
+    else:
+        print("最多{0}个账号未达到饱和".format(len(workers)))
+
+
+if __name__ == '__main__':
+    main()
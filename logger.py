@@ -9,6 +9,11 @@ _log.setLevel(logging.INFO)
 log = logging.LoggerAdapter(_log, {"tag": "global"})
 
 
+# 每个账号使用自己的日志适配器，同一进程运行多个账号时标签互不干扰
+def get_log(tag: str) -> logging.LoggerAdapter:
+    return logging.LoggerAdapter(_log, {"tag": tag})
+
+
 def init_loger(loger_name: str):
     handler = logging.StreamHandler(sys.stdout)
     #logging_format = logging.Formatter("[%(asctime)s][%(levelname)s][%(process)d][%(tag)s]: %(message)s")
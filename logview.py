@@ -0,0 +1,152 @@
+# GUI日志视图：环形缓冲 + 虚拟化列表 + 按帧合并刷新
+import logging
+import threading
+from collections import deque
+from typing import Deque, List, Tuple
+from PyQt6.QtCore import Qt, QObject, QTimer, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import QListView, QAbstractItemView
+
+# (日志级别, 日志文本)
+LogLine = Tuple[int, str]
+
+level_colors = {
+    logging.WARNING: QColor(180, 110, 0),
+    logging.ERROR: QColor(200, 0, 0),
+    logging.CRITICAL: QColor(200, 0, 0),
+}
+
+
+# 固定容量的日志模型，超出容量时丢弃最早的行，内存占用恒定
+class LogModel(QAbstractListModel):
+    def __init__(self, max_lines: int, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.lines: Deque[LogLine] = deque(maxlen=max_lines)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.lines)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        level, text = self.lines[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return text
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return level_colors.get(level, None)
+        if role == Qt.ItemDataRole.UserRole:
+            return level
+        return None
+
+    # 一次追加一批日志，先移除溢出的旧行，再插入新行
+    def append_lines(self, lines: List[LogLine]):
+        if not lines:
+            return
+        if len(lines) > self.max_lines:
+            lines = lines[-self.max_lines:]
+        overflow = len(self.lines) + len(lines) - self.max_lines
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.lines.popleft()
+            self.endRemoveRows()
+        first = len(self.lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.lines.clear()
+        self.endResetModel()
+
+
+# 按日志级别和关键字过滤
+class LogFilterModel(QSortFilterProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.min_level = logging.NOTSET
+        self.keyword = ""
+
+    def set_min_level(self, level: int):
+        self.min_level = level
+        self.invalidateFilter()
+
+    def set_keyword(self, keyword: str):
+        self.keyword = keyword.lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        level, text = self.sourceModel().lines[source_row]
+        if level < self.min_level:
+            return False
+        if self.keyword and self.keyword not in text.lower():
+            return False
+        return True
+
+
+# 日志handler：工作线程只把日志放入待刷新队列，由GUI线程的定时器按帧批量取出
+class QtLogHandler(QObject, logging.Handler):
+    def __init__(self, model: LogModel, flush_ms: int):
+        QObject.__init__(self)
+        logging.Handler.__init__(self)
+        self.model = model
+        # GUI卡住时也只保留最新的 max_lines 条，避免积压
+        self.pending: Deque[LogLine] = deque(maxlen=model.max_lines)
+        self.pending_lock = threading.Lock()
+        self.timer = QTimer(self)
+        self.timer.setInterval(flush_ms)
+        self.timer.timeout.connect(self.flush_pending)
+        self.timer.start()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            msg = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self.pending_lock:
+            self.pending.append((record.levelno, msg))
+
+    # 在GUI线程直接追加一行（如程序退出提示）
+    def append_line(self, text: str, level: int = logging.INFO):
+        with self.pending_lock:
+            self.pending.append((level, text))
+        self.flush_pending()
+
+    def flush_pending(self):
+        with self.pending_lock:
+            if not self.pending:
+                return
+            lines = list(self.pending)
+            self.pending.clear()
+        self.model.append_lines(lines)
+
+
+# 虚拟化日志列表，只绘制可见的行；停留在底部时自动滚动
+class LogView(QListView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self.follow_tail = True
+        self.verticalScrollBar().valueChanged.connect(self.on_scroll)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.rowsInserted.connect(self.on_rows_inserted)
+
+    def on_scroll(self, value: int):
+        bar = self.verticalScrollBar()
+        self.follow_tail = value >= bar.maximum()
+
+    def on_rows_inserted(self, *args):
+        if self.follow_tail:
+            self.scrollToBottom()
@@ -1,42 +1,82 @@
 #!/usr/bin/python3
-from farmer import Farmer
+from farmer import Farmer, CookieExpireException, StopException
 import logger
 from logger import log
-import yaml
 import sys
+import threading
 import utils
+import fleet
 from settings import load_user_param, user_param
 
-def run(config_file: str):
-    with open(config_file, "r", encoding="utf8") as file:
-        user: dict = yaml.load(file, Loader=yaml.FullLoader)
-        file.close()
-    load_user_param(user)
+# 启动计时，各阶段耗时在登录完成后输出
+timer = utils.StageTimer()
+
+
+# 从标准输入读取控制命令（面板、守护进程通过管道发送 stop 请求退出）
+def watch_stdin(farmer: Farmer):
+    def read_commands():
+        for line in sys.stdin:
+            if line.strip().lower() == "stop":
+                farmer.log.info("收到停止请求")
+                farmer.request_stop()
+                return
+    thread = threading.Thread(target=read_commands, daemon=True)
+    thread.start()
+
+
+# config_file 为单账号配置文件，或多账号配置文件加上账号 account
+def run(config_file: str, account: str = None):
+    with timer.stage("读取配置"):
+        user = fleet.account_config(fleet.read_yaml(config_file), account)
+        load_user_param(user)
     logger.init_loger(user_param.wax_account)
+    log = logger.get_log(user_param.wax_account)
     log.info("项目开源地址：https://github.com/lintan/OpenFarmer")
     log.info("WAX账号: {0}".format(user_param.wax_account))
-    utils.clear_orphan_webdriver()
-    farmer = Farmer()
+    with timer.stage("清理残留进程"):
+        utils.clear_orphan_webdriver()
+    farmer = Farmer(user_param)
+    farmer.timer = timer
     farmer.wax_account = user_param.wax_account
+    if not sys.stdin.isatty():
+        watch_stdin(farmer)
     if user_param.use_proxy:
         farmer.proxy = user_param.proxy
         log.info("use proxy: {0}".format(user_param.proxy))
+    # 配置文件修改后在两轮扫描之间生效
+    farmer.config_watcher = fleet.ConfigWatcher(config_file, user_param.wax_account)
     farmer.init()
     farmer.start()
     log.info("开始自动化，请勿刷新浏览器，如需手工操作建议新开一个浏览器操作")
     return farmer.run_forever()
 
 
-def main():
+# 读取配置后使用账号的日志适配器，之前出错时使用全局的
+def run_log():
+    return logger.get_log(user_param.wax_account) if user_param.wax_account else log
+
+
+# 返回值作为进程退出码（见 utils.ExitCode），守护进程据此决定是否重启
+def main() -> int:
+    code = utils.ExitCode.Crashed
     try:
         user_yml = "user.yml"
-        if len(sys.argv) == 2:
+        account = None
+        if len(sys.argv) >= 2:
             user_yml = sys.argv[1]
-        run(user_yml)
+        if len(sys.argv) >= 3:
+            account = sys.argv[2]
+        code = run(user_yml, account)
+    except (CookieExpireException, StopException):
+        run_log().exception("start error")
+        code = utils.ExitCode.Fatal
     except Exception:
-        log.exception("start error")
-    input()
+        run_log().exception("start error")
+    # 由面板或守护进程启动时没有控制台，不等待输入
+    if sys.stdin.isatty():
+        input()
+    return code
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# 请求结果缓存：一轮扫描内相同的读请求只发一次，合约调用成功后使相关数据失效
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+# 全局配置表，与账号无关，跨扫描缓存
+global_tables = {"toolconfs", "cropconf", "anmconf", "mbsconf", "config"}
+
+# 合约动作会改变的数据（表名，或 assets、balance、account）
+action_tags = {
+    ("farmersworld", "claim"): ["tools", "accounts"],
+    ("farmersworld", "cropclaim"): ["crops", "accounts", "assets", "buildings"],
+    ("farmersworld", "anmclaim"): ["animals", "accounts", "assets"],
+    ("farmersworld", "bldclaim"): ["buildings", "accounts"],
+    ("farmersworld", "mbsclaim"): ["mbs", "accounts"],
+    ("farmersworld", "recover"): ["accounts"],
+    ("farmersworld", "repair"): ["tools", "accounts"],
+    ("farmersworld", "withdraw"): ["accounts", "balance"],
+    ("farmersworld", "mktbuy"): ["accounts", "assets"],
+    ("farmerstoken", "transfers"): ["accounts", "balance"],
+    ("atomicassets", "transfer"): ["assets", "animals", "breedings", "crops", "buildings", "tools", "mbs",
+                                   "accounts"],
+}
+
+
+def request_key(method: str, url: str, body) -> Tuple[str, str, str]:
+    return method, url, json.dumps(body, sort_keys=True, default=str)
+
+
+# 合约交易涉及的数据，未知的动作返回 None 表示全部失效
+def transaction_tags(transaction: dict):
+    tags = set()
+    for action in transaction.get("actions", []):
+        item = action_tags.get((action["account"], action["name"]))
+        if item is None:
+            return None
+        tags.update(item)
+    return tags
+
+
+class ScanMemo:
+    def __init__(self, global_ttl: float):
+        self.global_ttl = global_ttl
+        self.active = False
+        # key -> (tag, 过期时间（None为本轮扫描内有效）, 结果)
+        self.entries: Dict[Tuple, Tuple[str, float, Any]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # 开始一轮扫描
+    def begin(self):
+        with self.lock:
+            self.active = True
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    # 结束一轮扫描，清空本轮缓存，保留全局配置表
+    def end(self):
+        with self.lock:
+            self.active = False
+            self.entries = {key: value for key, value in self.entries.items() if value[1] is not None}
+
+    def get_or_fetch(self, key: Tuple, tag: str, fetch: Callable[[], Any]):
+        is_global = tag in global_tables
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and (entry[1] is None or entry[1] > now):
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            cacheable = self.active or is_global
+        value = fetch()
+        if cacheable:
+            expire = now + self.global_ttl if is_global else None
+            with self.lock:
+                self.entries[key] = (tag, expire, value)
+        return value
+
+    # tags 为 None 时使全部账号数据失效
+    def invalidate(self, tags: Iterable[str] = None):
+        with self.lock:
+            if tags is None:
+                keys = [key for key, value in self.entries.items() if value[0] not in global_tables]
+            else:
+                tags = set(tags)
+                keys = [key for key, value in self.entries.items() if value[0] in tags]
+            for key in keys:
+                del self.entries[key]
+            self.invalidations += len(keys)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self) -> str:
+        return "请求缓存: 命中{0}次 未命中{1}次 命中率{2:.0%} 失效{3}条".format(
+            self.hits, self.misses, self.hit_rate(), self.invalidations)
@@ -0,0 +1,173 @@
+# Prometheus 格式的运行指标：每个农民可选开启一个本地 http 端口（user.yml 的 metrics_port），
+# 抓取时直接读取农民已有的状态，只有浏览器内存需要查询进程，并做了缓存
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple
+import utils
+from settings import cfg
+
+# 计数器说明 {名称: (类型, 说明)}
+meta = {
+    "farmer_transactions_total": ("counter", "合约调用次数"),
+    "farmer_http_requests_total": ("counter", "http读请求次数"),
+    "farmer_http_request_seconds_total": ("counter", "http读请求累计耗时"),
+    "farmer_retries_total": ("counter", "操作失败进入重试队列的次数"),
+    "farmer_scans_total": ("counter", "扫描次数"),
+    "farmer_scan_seconds_total": ("counter", "扫描累计耗时"),
+}
+
+
+def format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    text = ",".join('{0}="{1}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                    for key, value in labels)
+    return "{" + text + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (名称, 标签) -> 值
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    # extra 为所有计数器共有的标签（账号）
+    def render_counters(self, extra: Tuple = ()) -> list:
+        with self.lock:
+            counters = sorted(self.counters.items())
+        lines = []
+        last_name = None
+        for (name, labels), value in counters:
+            if name != last_name:
+                kind, help_text = meta.get(name, ("counter", name))
+                lines.append("# HELP {0} {1}".format(name, help_text))
+                lines.append("# TYPE {0} {1}".format(name, kind))
+                last_name = name
+            lines.append("{0}{1} {2}".format(name, format_labels(extra + labels), value))
+        return lines
+
+
+# 浏览器进程（chromedriver、chrome 及其子进程）占用的内存，按进程登记表查找
+class BrowserMemory:
+    def __init__(self, account: str, ttl: float):
+        self.account = account
+        self.ttl = ttl
+        self.value: int = None
+        self.updated: float = 0
+
+    def rss(self) -> int:
+        if time.monotonic() - self.updated < self.ttl:
+            return self.value
+        import psutil
+        self.updated = time.monotonic()
+        try:
+            with open(utils.registry_path(self.account), "r", encoding="utf8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            self.value = None
+            return None
+        # selenium 模式下 chrome 既是 chromedriver 的子进程，也单独登记，按 pid 只统计一次
+        total = 0
+        seen = set()
+        for record in utils.entry_records(entry):
+            root = utils.find_process(record)
+            if not root:
+                continue
+            try:
+                procs = [root] + root.children(recursive=True)
+            except psutil.Error:
+                procs = [root]
+            for proc in procs:
+                if proc.pid in seen:
+                    continue
+                seen.add(proc.pid)
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+        self.value = total
+        return total
+
+
+def gauge(lines: list, name: str, help_text: str, value, labels: Tuple = ()):
+    if value is None:
+        return
+    lines.append("# HELP {0} {1}".format(name, help_text))
+    lines.append("# TYPE {0} gauge".format(name))
+    lines.append("{0}{1} {2}".format(name, format_labels(labels), float(value)))
+
+
+def render(farmer) -> str:
+    account = (("account", farmer.wax_account),)
+    lines = []
+    if farmer.resoure:
+        r = farmer.resoure
+        gauge(lines, "farmer_energy", "当前能量", r.energy, account)
+        gauge(lines, "farmer_max_energy", "最大能量", r.max_energy, account)
+        gauge(lines, "farmer_gold", "游戏内金币", r.gold, account)
+        gauge(lines, "farmer_wood", "游戏内木头", r.wood, account)
+        gauge(lines, "farmer_food", "游戏内食物", r.food, account)
+    if farmer.token:
+        gauge(lines, "farmer_fwg", "FWG余额", farmer.token.fwg, account)
+        gauge(lines, "farmer_fww", "FWW余额", farmer.token.fww, account)
+        gauge(lines, "farmer_fwf", "FWF余额", farmer.token.fwf, account)
+    now = farmer.clock.now()
+    window = now + timedelta(minutes=cfg.metrics_due_minutes)
+    items = list(farmer.items.values()) or list(farmer.not_operational)
+    due = sum(1 for item in items if item.next_availability <= window)
+    gauge(lines, "farmer_items_due", "即将可操作的东西数量", due,
+          account + (("minutes", cfg.metrics_due_minutes),))
+    gauge(lines, "farmer_retry_queue", "等待重试的东西数量", len(farmer.retry_queue), account)
+    gauge(lines, "farmer_transact_errors", "合约累计出错次数", farmer.count_error_total, account)
+    gauge(lines, "farmer_error_claims", "本轮扫描操作失败数量", farmer.count_error_claim, account)
+    gauge(lines, "farmer_success_claims", "本轮扫描操作成功数量", farmer.count_success_claim, account)
+    gauge(lines, "farmer_transact_seconds", "最近一次合约调用耗时", farmer.last_transact_latency, account)
+    gauge(lines, "farmer_claim_lag_seconds", "最近一次准时操作到期到提交的延迟", farmer.last_claim_lag, account)
+    gauge(lines, "farmer_chain_clock_offset_seconds", "链上时间与本机时间的偏差", farmer.clock.offset, account)
+    gauge(lines, "farmer_chrome_rss_bytes", "浏览器进程占用内存", farmer.browser_memory.rss(), account)
+    lines.extend(farmer.metrics.render_counters(account))
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    def __init__(self, farmer, port: int):
+        self.farmer = farmer
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def make_handler(self):
+        farmer = self.farmer
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                content = render(farmer).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
+
+    def start(self):
+        self.thread.start()
+        self.farmer.log.info("指标端口已开启: http://127.0.0.1:{0}/metrics".format(self.server.server_address[1]))
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
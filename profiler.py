@@ -0,0 +1,118 @@
+# 扫描性能分析：统计每轮扫描各阶段、各类I/O（http、浏览器、等待）的耗时，输出一行汇总；
+# 在 profile 目录下创建 <账号>.trigger 文件，下一轮扫描会被采样，输出火焰图可用的折叠栈文件
+# （flamegraph.pl 或 speedscope 可直接打开）。未开启时各计时点只返回一个空的上下文，几乎没有开销
+import contextlib
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+_null = contextlib.nullcontext()
+
+
+class Sampler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append("{0}:{1}".format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> Counter:
+        self.stop_event.set()
+        self.thread.join()
+        return self.stacks
+
+
+class Profiler:
+    def __init__(self, enabled: bool, account: str, path: str, sample_interval: float):
+        self.enabled = enabled
+        self.account = account
+        self.path = path
+        self.sample_interval = sample_interval
+        self.scan_begin: float = None
+        # 本轮扫描 {阶段: 耗时}
+        self.phases: Dict[str, float] = {}
+        # 本轮扫描 {I/O类型: [次数, 耗时]}
+        self.io_stats: Dict[str, List] = {}
+        self.sampler: Sampler = None
+
+    @contextlib.contextmanager
+    def _timed(self, table: dict, name: str):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            stat = table.setdefault(name, [0, 0.0])
+            stat[0] += 1
+            stat[1] += time.perf_counter() - begin
+
+    # 扫描阶段计时
+    def phase(self, name: str):
+        if not self.enabled:
+            return _null
+        return self._timed(self.phases, name)
+
+    # I/O计时：http、browser、sleep
+    def io(self, kind: str):
+        if not self.enabled:
+            return _null
+        return self._timed(self.io_stats, kind)
+
+    def trigger_file(self) -> str:
+        return os.path.join(self.path, "{0}.trigger".format(self.account))
+
+    def begin_scan(self):
+        if not self.enabled:
+            return
+        self.scan_begin = time.perf_counter()
+        self.phases = {}
+        self.io_stats = {}
+        if os.path.exists(self.trigger_file()):
+            os.remove(self.trigger_file())
+            self.sampler = Sampler(threading.get_ident(), self.sample_interval)
+            self.sampler.start()
+
+    # 结束一轮扫描，返回汇总行；采样时返回的汇总中带上火焰图文件路径
+    def end_scan(self) -> str:
+        if not self.enabled or self.scan_begin is None:
+            return None
+        total = time.perf_counter() - self.scan_begin
+        self.scan_begin = None
+        phases = " ".join("{0}:{1:.2f}s".format(name, stat[1]) for name, stat in self.phases.items())
+        io = " ".join("{0}:{1}次/{2:.2f}s".format(name, stat[0], stat[1]) for name, stat in self.io_stats.items())
+        line = "扫描耗时{0:.2f}s | {1} | {2}".format(total, phases, io)
+        if self.sampler:
+            stacks = self.sampler.stop()
+            self.sampler = None
+            file_path = self.write_folded(stacks)
+            line += " | 采样{0}次: {1}".format(sum(stacks.values()), file_path)
+        return line
+
+    def write_folded(self, stacks: Counter) -> str:
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        file_path = os.path.join(self.path, "{0}-{1}.folded".format(
+            self.account, datetime.now().strftime("%Y%m%d-%H%M%S")))
+        with open(file_path, "w", encoding="utf8") as file:
+            for stack, count in stacks.most_common():
+                file.write("{0} {1}\n".format(stack, count))
+        return file_path
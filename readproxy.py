@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+# 本地只读缓存代理，多个农民共用：
+#   把 user.yml 的 rpc_domain 和 assets_domain 都设置为 http://127.0.0.1:8800 即可
+#   全局配置表（toolconfs、cropconf、anmconf、mbsconf、config）按表缓存，
+#   相同的请求同时到达时只向上游发一次（请求合并），账号自己的数据直接转发
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple
+import requests
+from requests.exceptions import RequestException
+import logger
+from settings import cfg
+
+log = logger.get_log("readproxy")
+
+# (状态码, content-type, 内容)
+Response = Tuple[int, str, bytes]
+
+
+class InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Response = None
+        self.error: Exception = None
+
+
+# 请求合并 + 缓存
+class Coalescer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, InFlight] = {}
+        # key -> (过期时间, 响应)
+        self.cache: Dict[str, Tuple[float, Response]] = {}
+
+    # ttl 为0时只合并同时到达的请求，不缓存
+    def fetch(self, key: str, ttl: float, upstream, stats: dict) -> Response:
+        now = time.monotonic()
+        owner = False
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached and cached[0] > now:
+                stats["cache_hit"] += 1
+                return cached[1]
+            waiting = self.in_flight.get(key)
+            if waiting:
+                stats["coalesced"] += 1
+            else:
+                waiting = InFlight()
+                self.in_flight[key] = waiting
+                owner = True
+        if owner:
+            try:
+                waiting.response = upstream()
+                stats["upstream"] += 1
+                if ttl > 0 and waiting.response[0] == 200:
+                    with self.lock:
+                        self.cache[key] = (time.monotonic() + ttl, waiting.response)
+            except Exception as e:
+                waiting.error = e
+            finally:
+                with self.lock:
+                    self.in_flight.pop(key, None)
+                waiting.done.set()
+        else:
+            waiting.done.wait()
+        if waiting.error:
+            raise waiting.error
+        return waiting.response
+
+
+class ReadProxy:
+    def __init__(self, rpc_upstream: str, assets_upstream: str, table_ttl: Dict[str, float]):
+        self.rpc_upstream = rpc_upstream.rstrip("/")
+        self.assets_upstream = assets_upstream.rstrip("/")
+        self.table_ttl = table_ttl
+        self.coalescer = Coalescer()
+        self.local = threading.local()
+        self.stats = {"requests": 0, "upstream": 0, "cache_hit": 0, "coalesced": 0, "pass": 0}
+        self.stats_lock = threading.Lock()
+
+    def session(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+            self.local.session.trust_env = False
+        return self.local.session
+
+    def upstream_for(self, path: str) -> str:
+        if path.startswith("/v1/"):
+            return self.rpc_upstream
+        return self.assets_upstream
+
+    def forward(self, method: str, path: str, body: bytes) -> Response:
+        url = self.upstream_for(path) + path
+        headers = {"Content-Type": "application/json"} if body else {}
+        resp = self.session().request(method, url, data=body, headers=headers, timeout=30)
+        return resp.status_code, resp.headers.get("Content-Type", "application/json"), resp.content
+
+    # 返回 (缓存key, 缓存时间)，None 表示直接转发
+    def cache_policy(self, method: str, path: str, body: bytes):
+        if method == "GET" and (path.startswith("/atomicassets/") or path.startswith("/atomicmarket/")):
+            # 原子市场的相同查询只合并，不缓存
+            return "GET " + path, 0
+        if method == "POST" and path == "/v1/chain/get_table_rows":
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return None
+            table = data.get("table")
+            if data.get("code") == "farmersworld" and table in self.table_ttl and not data.get("lower_bound") \
+                    and not data.get("upper_bound"):
+                return "POST " + path + json.dumps(data, sort_keys=True), self.table_ttl[table]
+        return None
+
+    def handle(self, method: str, path: str, body: bytes) -> Response:
+        stats = {"upstream": 0, "cache_hit": 0, "coalesced": 0, "pass": 0}
+        policy = self.cache_policy(method, path, body)
+        try:
+            if policy is None:
+                stats["pass"] += 1
+                return self.forward(method, path, body)
+            key, ttl = policy
+            return self.coalescer.fetch(key, ttl, lambda: self.forward(method, path, body), stats)
+        finally:
+            with self.stats_lock:
+                self.stats["requests"] += 1
+                for name, value in stats.items():
+                    self.stats[name] += value
+
+    def report(self) -> str:
+        with self.stats_lock:
+            s = dict(self.stats)
+        saved = s["cache_hit"] + s["coalesced"]
+        return "请求{0} 上游{1} 缓存命中{2} 合并{3} 直接转发{4} 节省{5:.0%}".format(
+            s["requests"], s["upstream"] + s["pass"], s["cache_hit"], s["coalesced"], s["pass"],
+            saved / s["requests"] if s["requests"] else 0)
+
+
+def make_handler(proxy: ReadProxy):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            log.debug(format % args)
+
+        def send_cors(self):
+            # 浏览器里的 waxjs 也会使用 rpc_domain
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "*")
+
+        def do_OPTIONS(self):
+            self.send_response(204)
+            self.send_cors()
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            self.proxy("GET", b"")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.proxy("POST", self.rfile.read(length) if length else b"")
+
+        def proxy(self, method: str, body: bytes):
+            try:
+                status, content_type, content = proxy.handle(method, self.path, body)
+            except RequestException as e:
+                log.info("上游请求失败: {0} {1}".format(self.path, e))
+                status, content_type, content = 502, "text/plain", str(e).encode()
+            self.send_response(status)
+            self.send_cors()
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地只读缓存代理")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--rpc", default="https://api.wax.alohaeos.com", help="上游wax节点")
+    parser.add_argument("--assets", default="https://wax.api.atomicassets.io", help="上游原子市场节点")
+    args = parser.parse_args()
+    logger.init_loger("readproxy")
+    proxy = ReadProxy(args.rpc, args.assets, cfg.proxy_table_ttl)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(proxy))
+    server.daemon_threads = True
+    log.info("缓存代理已启动: http://{0}:{1} -> {2} | {3}".format(args.host, args.port, args.rpc, args.assets))
+
+    def report_forever():
+        while True:
+            time.sleep(60)
+            log.info(proxy.report())
+    threading.Thread(target=report_forever, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+# 流量回放：用 capture 录下的请求、响应和合约调用结果代替节点和浏览器，
+# 让未修改的 Farmer 离线跑同样的扫描，用于性能分析和改动前后的对比。
+# 每轮扫描前链上时间拨到录制时的时间，回放时的可操作判断与录制时一致
+import argparse
+import logging
+import sys
+import tempfile
+import time
+import logger
+import capture
+from farmer import Farmer, BridgeException
+from settings import cfg, UserParam, load_user_param
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的流量")
+    parser.add_argument("file", help="录制文件（capture 目录下的 .jsonl.gz）")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，1为按录制时的耗时，0为不等待")
+    parser.add_argument("--scans", type=int, default=0, help="扫描轮数，默认与录制时相同")
+    parser.add_argument("--profile", action="store_true", help="输出每轮扫描的性能分析")
+    parser.add_argument("--verbose", action="store_true", help="输出扫描日志")
+    args = parser.parse_args()
+
+    logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+    if not args.verbose and not args.profile:
+        logger.log.logger.setLevel(logging.WARNING)
+    replay = capture.Replay(args.file, args.speed)
+    param = load_user_param(replay.meta.get("user_param", {}), UserParam())
+    param.capture = False
+    param.use_proxy = False
+    param.action_feed = None
+    param.metrics_port = None
+    param.profile = args.profile
+    # 请求间隔、交易间隔随回放速度缩短，状态文件写到临时目录，不影响正在运行的账号
+    factor = 1 / args.speed if args.speed > 0 else 0
+    cfg.req_interval = cfg.req_interval * factor
+    cfg.transact_interval = cfg.transact_interval * factor
+    cfg.path_state = tempfile.mkdtemp(prefix="replay-state-")
+
+    farmer = Farmer(param)
+    farmer.wax_account = replay.meta.get("account") or param.wax_account
+    farmer.init()
+    capture.install_replay(farmer.http, replay)
+    farmer.transact_bridge = capture.replay_bridge(replay, BridgeException)
+    scans = args.scans or len(replay.scan_times) or 1
+    print("回放 {0}: 账号 {1}，{2}条记录，{3}轮扫描".format(args.file, farmer.wax_account, replay.total, scans))
+
+    begin = time.perf_counter()
+    farmer.prefetch()
+    print("启动: {0:.3f}s".format(time.perf_counter() - begin))
+    for index in range(scans):
+        scan_begin = time.perf_counter()
+        served = replay.served
+        # 每轮扫描前把链上时间拨到录制时这一轮开始的时间，加速回放时可操作的判断也不变
+        if index < len(replay.scan_times) and replay.scan_times[index]:
+            farmer.clock.offset = replay.scan_times[index] - time.time()
+        farmer.scan_all()
+        print("第{0}轮扫描: {1:.3f}s，回放{2}条".format(index + 1, time.perf_counter() - scan_begin,
+                                                replay.served - served))
+    print("合计: {0:.3f}s，回放{1}/{2}条，未录制的请求{3}个".format(
+        time.perf_counter() - begin, replay.served, replay.total, replay.misses))
+    farmer.close()
+
+
+if __name__ == '__main__':
+    main()
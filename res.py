@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from typing import List, ClassVar, Dict
 import utils
 
+# 各模板对应的类，加载游戏配置时不直接修改，见 GameConfig
 farming_table = {}
 
 
@@ -204,59 +205,6 @@ supported_animals = [Chicken, Chick, ChickenEgg, BabyCalf, Calf, FeMaleCalf, Mal
 farming_table.update({cls.template_id: cls for cls in supported_animals})
 
 
-def init_animal_config(rows: List[dict]):
-    for item in rows:
-        animal_class: Animal = farming_table.get(item["template_id"], None)
-        if animal_class:
-            animal_class.name = item["name"]
-            animal_class.energy_consumed = item["energy_consumed"]
-            animal_class.charge_time = timedelta(seconds=item["charge_time"])
-            animal_class.required_claims = item["required_claims"]
-            animal_class.daily_claim_limit = item["daily_claim_limit"]
-            animal_class.consumed_card = item["consumed_card"]
-            animal_class.required_building = item["required_building"]
-
-
-# 动物-从http返回的json数据构造对象
-def create_animal(item: dict, breeding=False) -> Animal:
-    animal_class = farming_table.get(item["template_id"], None)
-    if not animal_class:
-        return None
-    animal = animal_class()
-    animal.day_claims_at = [datetime.fromtimestamp(item) for item in item["day_claims_at"]]
-    animal.name = item["name"]
-    animal.template_id = item["template_id"]
-    animal.times_claimed = item.get("times_claimed", None)
-    animal.last_claimed = datetime.fromtimestamp(item["last_claimed"])
-    animal.next_availability = datetime.fromtimestamp(item["next_availability"])
-    if not breeding:
-        animal.asset_id = item["asset_id"]
-    else:
-        animal.required_claims = 9  # 繁殖目前就只有奶牛，先写死
-        animal.daily_claim_limit = 3  # 繁殖目前就只有奶牛，先写死
-        animal.consumed_card = 318607  # 繁殖目前就只有奶牛，先写死
-        animal.bearer_id = item["bearer_id"]
-        animal.partner_id = item["partner_id"]
-
-    return animal
-
-
-# 动物-从http返回的json数据构造对象
-def create_breeding(item: dict) -> Animal:
-    animal_class = farming_table.get(item["template_id"], None)
-    if not animal_class:
-        return None
-    animal = animal_class()
-    animal.day_claims_at = [datetime.fromtimestamp(item) for item in item["day_claims_at"]]
-    animal.asset_id = item["asset_id"]
-    animal.name = item["name"]
-    animal.template_id = item["template_id"]
-    animal.times_claimed = item.get("times_claimed", None)
-    animal.last_claimed = datetime.fromtimestamp(item["last_claimed"])
-    animal.next_availability = datetime.fromtimestamp(item["next_availability"])
-    return animal
-
-
 ####################################################### Animal #######################################################
 
 ####################################################### Crop #######################################################
@@ -302,30 +250,6 @@ supported_crops = [BarleySeed, CornSeed]
 farming_table.update({cls.template_id: cls for cls in supported_crops})
 
 
-def init_crop_config(rows: List[dict]):
-    for item in rows:
-        crop_class: Crop = farming_table.get(item["template_id"], None)
-        if crop_class:
-            crop_class.name = item["name"]
-            crop_class.charge_time = timedelta(seconds=item["charge_time"])
-            crop_class.energy_consumed = item["energy_consumed"]
-            crop_class.required_claims = item["required_claims"]
-
-
-# 从json构造农作物对象
-def create_crop(item: dict) -> Crop:
-    crop_class = farming_table.get(item["template_id"], None)
-    if not crop_class:
-        return None
-    crop = crop_class()
-    crop.asset_id = item["asset_id"]
-    crop.name = item["name"]
-    crop.times_claimed = item.get("times_claimed", None)
-    crop.last_claimed = datetime.fromtimestamp(item["last_claimed"])
-    crop.next_availability = datetime.fromtimestamp(item["next_availability"])
-    return crop
-
-
 ####################################################### Tool #######################################################
 
 # 工具
@@ -344,6 +268,8 @@ class Tool(Farming):
     energy_consumed: int = None
     # 耐久消耗
     durability_consumed: int = None
+    # 会员卡存储挖矿时，在链上可操作时间基础上推迟的时间
+    mbs_delay: timedelta = timedelta(0)
 
     def show(self, more=True) -> str:
         if more:
@@ -420,29 +346,6 @@ supported_tools = [Axe, StoneAxe, AncientStoneAxe, Saw, Chainsaw, FishingRod, Fi
 farming_table.update({cls.template_id: cls for cls in supported_tools})
 
 
-def init_tool_config(rows: List[dict]):
-    for item in rows:
-        tool_class = farming_table.get(item["template_id"], None)
-        if tool_class:
-            tool_class.mining_type = item["type"]
-            tool_class.charge_time = timedelta(seconds=item["charged_time"])
-            tool_class.energy_consumed = item["energy_consumed"]
-            tool_class.durability_consumed = item["durability_consumed"]
-
-
-# 从json构造工具对象
-def create_tool(item: dict) -> Tool:
-    tool_class = farming_table.get(item["template_id"], None)
-    if not tool_class:
-        return None
-    tool = tool_class()
-    tool.asset_id = item["asset_id"]
-    tool.next_availability = datetime.fromtimestamp(item["next_availability"])
-    tool.current_durability = item["current_durability"]
-    tool.durability = item["durability"]
-    return tool
-
-
 ####################################################### Tool #######################################################
 
 ####################################################### MBS  #######################################################
@@ -465,26 +368,6 @@ class MBS(Farming):
             return f"[{self.name}] [类型:{self.type}]"
 
 
-mbs_table: Dict[int, MBS] = {}
-
-
-def init_mbs_config(rows: List[dict]):
-    for item in rows:
-        mbs = MBS(item["template_id"], item["name"], item["type"], item["saved_claims"])
-        mbs_table[item["template_id"]] = mbs
-
-
-# 从json构造mbs对象
-def create_mbs(item: dict) -> MBS:
-    mbs_class = mbs_table.get(item["template_id"], None)
-    if not mbs_class:
-        return None
-    mbs = MBS(mbs_class.template_id, mbs_class.name, mbs_class.type, mbs_class.saved_claims)
-    mbs.asset_id = item["asset_id"]
-    mbs.next_availability = datetime.fromtimestamp(item["next_availability"])
-    return mbs
-
-
 ####################################################### MBS #######################################################
 
 
@@ -509,3 +392,125 @@ class Asset:
     is_burnable: bool
     schema_name: str
     template_id: str
+
+
+# 游戏配置：每个实例持有各模板类的子类，加载配置只修改自己的子类，
+# 同一进程中的多个账号各自加载、刷新配置，互不影响
+class GameConfig:
+    def __init__(self):
+        self.farming_table: Dict[int, type] = {
+            template_id: type(cls.__name__, (cls,), {}) for template_id, cls in farming_table.items()
+        }
+        self.mbs_table: Dict[int, MBS] = {}
+
+    # 加载工具配置
+    def init_tool_config(self, rows: List[dict]):
+        for item in rows:
+            tool_class = self.farming_table.get(item["template_id"], None)
+            if tool_class:
+                tool_class.mining_type = item["type"]
+                tool_class.charge_time = timedelta(seconds=item["charged_time"])
+                tool_class.energy_consumed = item["energy_consumed"]
+                tool_class.durability_consumed = item["durability_consumed"]
+
+    # 从json构造工具对象
+    def create_tool(self, item: dict) -> Tool:
+        tool_class = self.farming_table.get(item["template_id"], None)
+        if not tool_class:
+            return None
+        tool = tool_class()
+        tool.asset_id = item["asset_id"]
+        tool.next_availability = datetime.fromtimestamp(item["next_availability"])
+        tool.current_durability = item["current_durability"]
+        tool.durability = item["durability"]
+        return tool
+
+    # 加载作物配置
+    def init_crop_config(self, rows: List[dict]):
+        for item in rows:
+            crop_class: Crop = self.farming_table.get(item["template_id"], None)
+            if crop_class:
+                crop_class.name = item["name"]
+                crop_class.charge_time = timedelta(seconds=item["charge_time"])
+                crop_class.energy_consumed = item["energy_consumed"]
+                crop_class.required_claims = item["required_claims"]
+
+    # 从json构造农作物对象
+    def create_crop(self, item: dict) -> Crop:
+        crop_class = self.farming_table.get(item["template_id"], None)
+        if not crop_class:
+            return None
+        crop = crop_class()
+        crop.asset_id = item["asset_id"]
+        crop.name = item["name"]
+        crop.times_claimed = item.get("times_claimed", None)
+        crop.last_claimed = datetime.fromtimestamp(item["last_claimed"])
+        crop.next_availability = datetime.fromtimestamp(item["next_availability"])
+        return crop
+
+    # 加载动物配置
+    def init_animal_config(self, rows: List[dict]):
+        for item in rows:
+            animal_class: Animal = self.farming_table.get(item["template_id"], None)
+            if animal_class:
+                animal_class.name = item["name"]
+                animal_class.energy_consumed = item["energy_consumed"]
+                animal_class.charge_time = timedelta(seconds=item["charge_time"])
+                animal_class.required_claims = item["required_claims"]
+                animal_class.daily_claim_limit = item["daily_claim_limit"]
+                animal_class.consumed_card = item["consumed_card"]
+                animal_class.required_building = item["required_building"]
+
+    # 动物-从http返回的json数据构造对象
+    def create_animal(self, item: dict, breeding=False) -> Animal:
+        animal_class = self.farming_table.get(item["template_id"], None)
+        if not animal_class:
+            return None
+        animal = animal_class()
+        animal.day_claims_at = [datetime.fromtimestamp(item) for item in item["day_claims_at"]]
+        animal.name = item["name"]
+        animal.template_id = item["template_id"]
+        animal.times_claimed = item.get("times_claimed", None)
+        animal.last_claimed = datetime.fromtimestamp(item["last_claimed"])
+        animal.next_availability = datetime.fromtimestamp(item["next_availability"])
+        if not breeding:
+            animal.asset_id = item["asset_id"]
+        else:
+            animal.required_claims = 9  # 繁殖目前就只有奶牛，先写死
+            animal.daily_claim_limit = 3  # 繁殖目前就只有奶牛，先写死
+            animal.consumed_card = 318607  # 繁殖目前就只有奶牛，先写死
+            animal.bearer_id = item["bearer_id"]
+            animal.partner_id = item["partner_id"]
+
+        return animal
+
+    # 动物-从http返回的json数据构造对象
+    def create_breeding(self, item: dict) -> Animal:
+        animal_class = self.farming_table.get(item["template_id"], None)
+        if not animal_class:
+            return None
+        animal = animal_class()
+        animal.day_claims_at = [datetime.fromtimestamp(item) for item in item["day_claims_at"]]
+        animal.asset_id = item["asset_id"]
+        animal.name = item["name"]
+        animal.template_id = item["template_id"]
+        animal.times_claimed = item.get("times_claimed", None)
+        animal.last_claimed = datetime.fromtimestamp(item["last_claimed"])
+        animal.next_availability = datetime.fromtimestamp(item["next_availability"])
+        return animal
+
+    # 加载会员卡配置
+    def init_mbs_config(self, rows: List[dict]):
+        for item in rows:
+            mbs = MBS(item["template_id"], item["name"], item["type"], item["saved_claims"])
+            self.mbs_table[item["template_id"]] = mbs
+
+    # 从json构造mbs对象
+    def create_mbs(self, item: dict) -> MBS:
+        mbs_class = self.mbs_table.get(item["template_id"], None)
+        if not mbs_class:
+            return None
+        mbs = MBS(mbs_class.template_id, mbs_class.name, mbs_class.type, mbs_class.saved_claims)
+        mbs.asset_id = item["asset_id"]
+        mbs.next_availability = datetime.fromtimestamp(item["next_availability"])
+        return mbs
@@ -0,0 +1,89 @@
+# 合约失败分类与单个作物的重试队列：一个操作失败只推迟它自己，不影响本轮扫描的其他操作
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+
+# 失败类型
+class Kind:
+    # CPU/NET 资源不足
+    Cpu = "cpu"
+    # 合约断言失败（时间未到、耐久不足等）
+    Assertion = "assertion"
+    # 网络或浏览器错误
+    Network = "network"
+    # 交易过期、重复
+    Expired = "expired"
+    # 登录失效、权限不足，不可重试
+    Auth = "auth"
+    Other = "other"
+
+
+# 按顺序匹配，先匹配到的为准
+patterns = [
+    (Kind.Cpu, ["maximum billable", "billed CPU time", "tx_cpu_usage_exceeded", "net usage", "tx_net_usage_exceeded"]),
+    (Kind.Expired, ["expired transaction", "transaction has expired", "tx_exp", "duplicate transaction"]),
+    (Kind.Auth, ["missing required authority", "irrelevant auth", "unsatisfied_authorization",
+                 "not logged in"]),
+    (Kind.Assertion, ["assertion failure"]),
+    (Kind.Network, ["failed to fetch", "networkerror", "timeout", "timed out", "econnreset", "network"]),
+]
+
+# 不可重试的失败类型，出现时仍然停止程序
+fatal_kinds = {Kind.Auth}
+
+
+def classify(message) -> str:
+    if message is None:
+        return Kind.Network
+    text = str(message).lower()
+    for kind, keys in patterns:
+        if any(key.lower() in text for key in keys):
+            return kind
+    return Kind.Other
+
+
+@dataclass
+class RetryEntry:
+    kind: str
+    failures: int
+    retry_at: datetime
+    message: str = None
+
+
+class RetryQueue:
+    # policy: {失败类型: (首次等待秒数, 最长等待秒数)}，连续失败时翻倍
+    def __init__(self, policy: Dict[str, Tuple[float, float]]):
+        self.policy = policy
+        self.entries: Dict[str, RetryEntry] = {}
+
+    def backoff(self, kind: str, failures: int) -> timedelta:
+        base, cap = self.policy.get(kind, self.policy[Kind.Other])
+        return timedelta(seconds=min(base * 2 ** (failures - 1), cap))
+
+    # 记录一次失败，返回下次重试时间
+    def failed(self, key: str, kind: str, now: datetime, message: str = None) -> datetime:
+        entry = self.entries.get(key)
+        failures = entry.failures + 1 if entry and entry.kind == kind else 1
+        retry_at = now + self.backoff(kind, failures)
+        self.entries[key] = RetryEntry(kind, failures, retry_at, message)
+        return retry_at
+
+    def succeeded(self, key: str):
+        self.entries.pop(key, None)
+
+    # 还在等待重试时返回重试时间，否则返回 None
+    def blocked_until(self, key: str, now: datetime):
+        entry = self.entries.get(key)
+        if entry and entry.retry_at > now:
+            return entry.retry_at
+        return None
+
+    # 以 prefix 开头、还在等待重试的条目中最早的重试时间，没有时返回 None
+    def earliest(self, prefix: str, now: datetime):
+        times = [entry.retry_at for key, entry in self.entries.items()
+                 if key.startswith(prefix) and entry.retry_at > now]
+        return min(times, default=None)
+
+    def __len__(self):
+        return len(self.entries)
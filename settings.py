@@ -1,3 +1,4 @@
+import copy
 from dataclasses import dataclass
 from datetime import timedelta
 
@@ -15,10 +16,77 @@ class Settings:
     max_scan_interval = timedelta(minutes=15)
     # 每次扫描至少间隔10秒，哪怕是出错重扫
     min_scan_interval = timedelta(seconds=10)
+    # 全局配置表（工具、作物、动物、会员卡、提现费率）的缓存时间
+    global_table_ttl = timedelta(minutes=10)
+    # 本地缓存代理中各全局配置表的缓存时间（秒）
+    proxy_table_ttl = {"toolconfs": 600, "cropconf": 600, "anmconf": 600, "mbsconf": 600, "config": 60}
+    # GUI日志窗口最多保留的行数
+    gui_log_max_lines = 5000
+    # GUI日志窗口的刷新间隔（毫秒），期间的日志合并为一帧显示
+    gui_log_flush_ms = 100
+    # 进程登记目录，记录每个账号的 python、chromedriver、chrome 进程号
+    path_registry = "./run/"
+    # 运行状态输出目录，面板从这里读取各账号的状态
+    path_state = "./state/"
+    # 运行状态最短输出间隔（秒）
+    state_feed_interval = 2
+    # 面板停止账号时，等待程序自行退出的时间（秒），超时则强制结束
+    dashboard_stop_timeout = 60
+    # 空闲时至少每隔多少秒输出一次状态，作为心跳
+    state_heartbeat_interval = 60
+    # 守护进程：相邻两个账号启动的最小间隔（秒），错开浏览器启动
+    supervisor_launch_interval = 20
+    # 守护进程：异常退出后重启的等待时间（秒），每次连续失败翻倍，直到最大值
+    supervisor_backoff_min = 30
+    supervisor_backoff_max = 1800
+    # 守护进程：运行超过多少秒视为稳定，重启等待时间恢复为最小值
+    supervisor_stable_time = 600
+    # 守护进程：单个账号（含浏览器进程）的内存上限（MB），超过后回收重启
+    supervisor_memory_cap_mb = 1500
+    # 守护进程：多少秒内没有状态更新视为卡死，回收重启
+    supervisor_hang_timeout = 1800
+    # 开启链上动作流后，完整扫描只作为一致性检查，最长间隔
+    feed_scan_interval = timedelta(hours=1)
+    # 拉取链上动作流的间隔（秒）
+    feed_poll_interval = 5
+    # 同步链上时间的间隔（秒）
+    clock_sync_interval = 600
+    # 链上时间未同步时，可操作时间之后再等待的秒数
+    clock_default_padding = 5
+    # 到期前多久开始预热（刷新数据、准备食物和交易），到期后立即提交
+    jit_warmup = timedelta(seconds=5)
+    # 性能分析输出目录（触发文件和火焰图折叠栈文件）
+    path_profile = "./profile/"
+    # 性能分析采样间隔（秒）
+    profile_sample_interval = 0.005
+    # 流量录制文件目录
+    path_capture = "./capture/"
+    # 指标中统计多少分钟内即将可操作的东西
+    metrics_due_minutes = 10
+    # 指标中浏览器内存的缓存时间（秒）
+    metrics_rss_ttl = 30
+    # 检查游戏配置表是否变化的间隔（秒）
+    config_check_interval = 600
+    # 检查配置文件是否修改的间隔（秒），修改后在两轮扫描之间生效
+    config_reload_interval = 5
+    # 配置变化后重启浏览器失败时，重试的间隔（秒）
+    browser_restart_interval = 60
+    # 喂掉的食物在多少秒内分配食物时仍然排除（原子市场更新有延迟）
+    spent_food_ttl = 600
+    # 批量喂养时一个交易最多包含的动作数，受单个交易的CPU上限限制
+    feed_batch_size = 8
+    # 操作失败后的重试等待（秒）：{失败类型: (首次等待, 最长等待)}，连续失败时翻倍
+    retry_policy = {
+        "cpu": (60, 1800),
+        "assertion": (60, 3600),
+        "network": (10, 300),
+        "expired": (5, 120),
+        "other": (30, 1800),
+    }
 
 
-# 用户配置参数
-class user_param:
+# 用户配置参数，每个账号一个实例，类属性为默认值
+class UserParam:
     rpc_domain_list: list = []
     rpc_domain: str = None
     assets_domain: str = None
@@ -81,110 +149,156 @@ class user_param:
     # 自动买玉米种子
     buy_corn_seed: bool = False
     breeding: bool = False
+    # 补货：按多少小时内预计的消耗购买食物和种子
+    provision_hours: int = 24
+    # 补货每轮最多花费的金币，0为不限（以游戏内金币为准）
+    provision_gold: int = 0
+    # 链上动作流（Hyperion历史节点），为空时只靠定时扫描
+    action_feed: str = None
+    # 性能分析，每轮扫描输出各阶段和I/O耗时
+    profile: bool = False
+    # 指标端口（Prometheus格式，http://127.0.0.1:端口/metrics），为空时不开启
+    metrics_port: int = None
+    # 浏览器后端：selenium（经过 chromedriver）或 cdp（直连Chrome，少一个进程）
+    browser_backend: str = "selenium"
+    # Chrome路径，为空时自动查找（仅 cdp 后端使用）
+    chrome_path: str = None
+    # 录制 http 请求和合约调用（含耗时），写入 capture 目录，可用 replay.py 离线回放
+    capture: bool = False
+    # 故障注入场景文件（yaml），仅用于测试重试和退避，为空时不注入
+    fault_scenario: str = None
 
-    @staticmethod
-    def to_dict():
+    def to_dict(self) -> dict:
         return {
-            "rpc_domain_list": user_param.rpc_domain_list,
-            "rpc_domain": user_param.rpc_domain,
-            "assets_domain_list": user_param.assets_domain_list,
-            "assets_domain": user_param.assets_domain,
-            "wax_account": user_param.wax_account,
-            "use_proxy": user_param.use_proxy,
-            "proxy": user_param.proxy,
-            "build": user_param.build,
-            "mining": user_param.mining,
-            "chicken": user_param.chicken,
-            "plant": user_param.plant,
-            "cow": user_param.cow,
-            "mbs": user_param.mbs,
-            "mbs_mint": user_param.mbs_mint,
-            "recover_energy": user_param.recover_energy,
-            "withdraw": user_param.withdraw,
-            "auto_deposit": user_param.auto_deposit,
-            "sell_corn": user_param.sell_corn,
-            "sell_barley": user_param.sell_barley,
-            "sell_milk": user_param.sell_milk,
-            "sell_egg": user_param.sell_egg,
-            "auto_plant": user_param.auto_plant,
-            "min_energy": user_param.min_energy,
-            "on_server": user_param.on_server,
-            "need_fww": user_param.need_fww,
-            "need_fwf": user_param.need_fwf,
-            "need_fwg": user_param.need_fwg,
-            "withdraw_min": user_param.withdraw_min,
-            "remaining_corn_num": user_param.remaining_corn_num,
-            "remaining_barley_num": user_param.remaining_barley_num,
-            "remaining_milk_num": user_param.remaining_milk_num,
-            "remaining_egg_num": user_param.remaining_egg_num,
-            "barleyseed_num": user_param.barleyseed_num,
-            "cornseed_num": user_param.cornseed_num,
-            "fww_min": user_param.fww_min,
-            "deposit_fww": user_param.deposit_fww,
-            "fwf_min": user_param.fwf_min,
-            "deposit_fwf": user_param.deposit_fwf,
-            "fwg_min": user_param.fwg_min,
-            "deposit_fwg": user_param.deposit_fwg,
-            "min_durability": user_param.min_durability,
-
-            "buy_food": user_param.buy_food,
-            "buy_food_num": user_param.buy_food_num,
-            "buy_barley_seed": user_param.buy_barley_seed,
-            "buy_corn_seed": user_param.buy_corn_seed,
-            "breeding": user_param.breeding,
+            "rpc_domain_list": self.rpc_domain_list,
+            "rpc_domain": self.rpc_domain,
+            "assets_domain_list": self.assets_domain_list,
+            "assets_domain": self.assets_domain,
+            "wax_account": self.wax_account,
+            "use_proxy": self.use_proxy,
+            "proxy": self.proxy,
+            "build": self.build,
+            "mining": self.mining,
+            "chicken": self.chicken,
+            "plant": self.plant,
+            "cow": self.cow,
+            "mbs": self.mbs,
+            "mbs_mint": self.mbs_mint,
+            "recover_energy": self.recover_energy,
+            "withdraw": self.withdraw,
+            "auto_deposit": self.auto_deposit,
+            "sell_corn": self.sell_corn,
+            "sell_barley": self.sell_barley,
+            "sell_milk": self.sell_milk,
+            "sell_egg": self.sell_egg,
+            "auto_plant": self.auto_plant,
+            "min_energy": self.min_energy,
+            "on_server": self.on_server,
+            "need_fww": self.need_fww,
+            "need_fwf": self.need_fwf,
+            "need_fwg": self.need_fwg,
+            "withdraw_min": self.withdraw_min,
+            "remaining_corn_num": self.remaining_corn_num,
+            "remaining_barley_num": self.remaining_barley_num,
+            "remaining_milk_num": self.remaining_milk_num,
+            "remaining_egg_num": self.remaining_egg_num,
+            "barleyseed_num": self.barleyseed_num,
+            "cornseed_num": self.cornseed_num,
+            "fww_min": self.fww_min,
+            "deposit_fww": self.deposit_fww,
+            "fwf_min": self.fwf_min,
+            "deposit_fwf": self.deposit_fwf,
+            "fwg_min": self.fwg_min,
+            "deposit_fwg": self.deposit_fwg,
+            "min_durability": self.min_durability,
+
+            "buy_food": self.buy_food,
+            "buy_food_num": self.buy_food_num,
+            "buy_barley_seed": self.buy_barley_seed,
+            "buy_corn_seed": self.buy_corn_seed,
+            "breeding": self.breeding,
+            "provision_hours": self.provision_hours,
+            "provision_gold": self.provision_gold,
+            "action_feed": self.action_feed,
+            "profile": self.profile,
+            "metrics_port": self.metrics_port,
+            "browser_backend": self.browser_backend,
+            "chrome_path": self.chrome_path,
+            "capture": self.capture,
+            "fault_scenario": self.fault_scenario,
         }
 
+    def copy(self) -> "UserParam":
+        return copy.deepcopy(self)
+
+
+# 单账号运行（main.py、gui.pyw）时使用的配置
+user_param = UserParam()
+
+
+# 把配置文件的内容加载到 param 中，默认为全局的 user_param
+def load_user_param(user: dict, param: UserParam = None) -> UserParam:
+    if param is None:
+        param = user_param
+    param.rpc_domain_list = user.get("rpc_domain_list", ['https://api.wax.alohaeos.com'])
+    param.rpc_domain = user.get("rpc_domain", 'https://api.wax.alohaeos.com')
+    param.assets_domain_list = user.get("assets_domain_list", ['https://wax.api.atomicassets.io'])
+    param.assets_domain = user.get("assets_domain", 'https://wax.api.atomicassets.io')
+
+    param.wax_account = user["wax_account"]
+    param.use_proxy = user.get("use_proxy", True)
+    param.proxy = user.get("proxy", None)
+    param.build = user.get("build", True)
+    param.mining = user.get("mining", True)
+    param.chicken = user.get("chicken", True)
+    param.cow = user.get("cow", True)
+    param.plant = user.get("plant", True)
+    param.mbs = user.get("mbs", True)
+    param.mbs_mint = user.get("mbs_mint", False)
+    param.sell_corn = user.get("sell_corn", False)
+    param.sell_barley = user.get("sell_barley", False)
+    param.sell_milk = user.get("sell_milk", False)
+    param.sell_egg = user.get("sell_egg", False)
+    param.auto_plant = user.get("auto_plant", False)
+    param.recover_energy = user.get("recover_energy", 500)
+    param.min_energy = user.get("min_energy", 50)
+    param.min_durability = user.get("min_durability", 0)
+    param.withdraw = user.get("withdraw", False)
+    param.auto_deposit = user.get("auto_deposit", False)
+    param.need_fww = user.get("need_fww", 200)
+    param.need_fwf = user.get("need_fwf", 200)
+    param.need_fwg = user.get("need_fwg", 200)
+    param.withdraw_min = user.get("withdraw_min", 200)
+    param.remaining_corn_num = user.get("remaining_corn_num", 0)
+    param.remaining_barley_num = user.get("remaining_barley_num", 0)
+    param.remaining_milk_num = user.get("remaining_milk_num", 0)
+    param.remaining_egg_num = user.get("remaining_egg_num", 0)
+
+    param.barleyseed_num = user.get("barleyseed_num", 0)
+    param.cornseed_num = user.get("cornseed_num", 0)
+
+    param.fww_min = user.get("fww_min", 0)
+    param.deposit_fww = user.get("deposit_fww", 0)
+    param.fwf_min = user.get("fwf_min", 0)
+    param.deposit_fwf = user.get("deposit_fwf", 0)
+    param.fwg_min = user.get("fwg_min", 0)
+    param.deposit_fwg = user.get("deposit_fwg", 0)
 
-def load_user_param(user: dict):
-    user_param.rpc_domain_list = user.get("rpc_domain_list", ['https://api.wax.alohaeos.com'])
-    user_param.rpc_domain = user.get("rpc_domain", 'https://api.wax.alohaeos.com')
-    user_param.assets_domain_list = user.get("assets_domain_list", ['https://wax.api.atomicassets.io'])
-    user_param.assets_domain = user.get("assets_domain", 'https://wax.api.atomicassets.io')
-
-    user_param.wax_account = user["wax_account"]
-    user_param.use_proxy = user.get("use_proxy", True)
-    user_param.proxy = user.get("proxy", None)
-    user_param.build = user.get("build", True)
-    user_param.mining = user.get("mining", True)
-    user_param.chicken = user.get("chicken", True)
-    user_param.cow = user.get("cow", True)
-    user_param.plant = user.get("plant", True)
-    user_param.mbs = user.get("mbs", True)
-    user_param.mbs_mint = user.get("mbs_mint", False)
-    user_param.sell_corn = user.get("sell_corn", False)
-    user_param.sell_barley = user.get("sell_barley", False)
-    user_param.sell_milk = user.get("sell_milk", False)
-    user_param.sell_egg = user.get("sell_egg", False)
-    user_param.auto_plant = user.get("auto_plant", False)
-    user_param.recover_energy = user.get("recover_energy", 500)
-    user_param.min_energy = user.get("min_energy", 50)
-    user_param.min_durability = user.get("min_durability", 0)
-    user_param.withdraw = user.get("withdraw", False)
-    user_param.auto_deposit = user.get("auto_deposit", False)
-    user_param.need_fww = user.get("need_fww", 200)
-    user_param.need_fwf = user.get("need_fwf", 200)
-    user_param.need_fwg = user.get("need_fwg", 200)
-    user_param.withdraw_min = user.get("withdraw_min", 200)
-    user_param.remaining_corn_num = user.get("remaining_corn_num", 0)
-    user_param.remaining_barley_num = user.get("remaining_barley_num", 0)
-    user_param.remaining_milk_num = user.get("remaining_milk_num", 0)
-    user_param.remaining_egg_num = user.get("remaining_egg_num", 0)
-
-    user_param.barleyseed_num = user.get("barleyseed_num", 0)
-    user_param.cornseed_num = user.get("cornseed_num", 0)
-
-    user_param.fww_min = user.get("fww_min", 0)
-    user_param.deposit_fww = user.get("deposit_fww", 0)
-    user_param.fwf_min = user.get("fwf_min", 0)
-    user_param.deposit_fwf = user.get("deposit_fwf", 0)
-    user_param.fwg_min = user.get("fwg_min", 0)
-    user_param.deposit_fwg = user.get("deposit_fwg", 0)
-
-    user_param.buy_food = user.get("buy_food", False)
-    user_param.buy_food_num = user.get("buy_food_num", 0)
-    user_param.buy_barley_seed = user.get("buy_barley_seed", False)
-    user_param.buy_corn_seed = user.get("buy_corn_seed", False)
-    user_param.breeding = user.get("breeding", False)
+    param.buy_food = user.get("buy_food", False)
+    param.buy_food_num = user.get("buy_food_num", 0)
+    param.buy_barley_seed = user.get("buy_barley_seed", False)
+    param.buy_corn_seed = user.get("buy_corn_seed", False)
+    param.breeding = user.get("breeding", False)
+    param.provision_hours = user.get("provision_hours", 24)
+    param.provision_gold = user.get("provision_gold", 0)
+    param.action_feed = user.get("action_feed", None)
+    param.profile = user.get("profile", False)
+    param.metrics_port = user.get("metrics_port", None)
+    param.browser_backend = user.get("browser_backend", "selenium")
+    param.chrome_path = user.get("chrome_path", None)
+    param.capture = user.get("capture", False)
+    param.fault_scenario = user.get("fault_scenario", None)
+    return param
 
 
 cfg = Settings(
@@ -0,0 +1,43 @@
+# 农民运行状态的节流输出，供面板等外部程序读取，不依赖解析日志
+import json
+import os
+import time
+from settings import cfg
+
+
+class StateFeed:
+    def __init__(self, account: str, interval: float = None):
+        self.path = os.path.join(cfg.path_state, "{0}.json".format(account))
+        self.interval = cfg.state_feed_interval if interval is None else interval
+        self.last_publish = 0.0
+
+    # 节流写入，force为True时立即写入（如一轮扫描结束）
+    def publish(self, state: dict, force=False) -> bool:
+        now = time.monotonic()
+        if not force and now - self.last_publish < self.interval:
+            return False
+        self.last_publish = now
+        if not os.path.exists(cfg.path_state):
+            os.makedirs(cfg.path_state, exist_ok=True)
+        # 先写临时文件再替换，读取方不会读到写了一半的文件
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as file:
+            json.dump(state, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        return True
+
+
+def read_state(account: str) -> dict:
+    path = os.path.join(cfg.path_state, "{0}.json".format(account))
+    try:
+        with open(path, "r", encoding="utf8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def state_mtime(account: str) -> float:
+    try:
+        return os.path.getmtime(os.path.join(cfg.path_state, "{0}.json".format(account)))
+    except OSError:
+        return 0.0
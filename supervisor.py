@@ -0,0 +1,233 @@
+#!/usr/bin/python3
+# 多账号守护进程：每个账号一个 main.py 子进程，崩溃后按指数退避重启，内存超限或卡死时回收重启，
+# 并错开各账号的启动时间，避免浏览器同时启动
+import argparse
+import subprocess
+import sys
+import os
+import time
+from datetime import datetime
+from typing import List
+import logger
+import state
+import utils
+import fleet
+from settings import cfg
+
+log = logger.get_log("supervisor")
+
+
+class Worker:
+    def __init__(self, config_file: str, account: str):
+        self.config_file = config_file
+        self.account = account
+        self.process: subprocess.Popen = None
+        self.started_at: float = 0
+        # 连续异常退出次数
+        self.failures = 0
+        # 下一次允许启动的时间
+        self.next_start: float = 0
+        # 守护进程主动停止（回收），退出后立即重启
+        self.recycling = False
+        self.stop_sent_at: float = None
+        self.rss_mb: float = 0
+        # 需要人工处理而退出，不再自动重启
+        self.fatal = False
+
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        if getattr(sys, 'frozen', False):
+            command = [os.path.join(os.path.dirname(sys.executable), "main.exe"), self.config_file, self.account]
+        else:
+            command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py"),
+                       self.config_file, self.account]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL)
+        self.started_at = time.monotonic()
+        self.stop_sent_at = None
+        log.info("启动[{0}] pid: {1}".format(self.account, self.process.pid))
+
+    # 请求子进程自行退出（会关闭浏览器）
+    def stop(self):
+        if not self.running() or self.stop_sent_at is not None:
+            return
+        self.stop_sent_at = time.monotonic()
+        try:
+            self.process.stdin.write(b"stop\n")
+            self.process.stdin.flush()
+        except OSError:
+            pass
+
+    # 超时仍未退出则强制结束，并清理它留下的浏览器进程
+    def kill(self):
+        if self.running():
+            self.process.kill()
+            self.process.wait()
+        utils.clear_orphan_webdriver()
+
+
+class Supervisor:
+    def __init__(self, config_files: List[str], memory_cap_mb: int, launch_interval: int):
+        self.workers: List[Worker] = []
+        self.memory_cap_mb = memory_cap_mb
+        self.launch_interval = launch_interval
+        self.last_launch: float = 0
+        self.last_memory_check: float = 0
+        # 多账号配置文件中的每个账号各启动一个进程
+        for config_file in config_files:
+            for account in fleet.fleet_accounts(fleet.read_yaml(config_file)):
+                self.workers.append(Worker(os.path.abspath(config_file), account))
+
+    def run_forever(self):
+        log.info("守护{0}个账号，内存上限{1}MB，启动间隔{2}秒".format(len(self.workers), self.memory_cap_mb,
+                                                             self.launch_interval))
+        try:
+            while True:
+                self.check()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            log.info("正在停止全部账号")
+            self.stop_all()
+
+    def check(self):
+        now = time.monotonic()
+        for item in self.workers:
+            if item.process is not None and not item.running():
+                self.on_exit(item, now)
+            if item.running():
+                self.check_stopping(item, now)
+                self.check_hang(item, now)
+        if now - self.last_memory_check >= 30:
+            self.last_memory_check = now
+            self.check_memory()
+        self.launch_next(now)
+
+    def on_exit(self, item: Worker, now: float):
+        code = item.process.returncode
+        run_time = now - item.started_at
+        item.process = None
+        if item.recycling:
+            item.recycling = False
+            item.next_start = now
+            log.info("[{0}]已回收，准备重启".format(item.account))
+            return
+        if code == utils.ExitCode.Fatal:
+            item.fatal = True
+            log.error("[{0}]需要人工处理（cookie失效或不可恢复的错误），不再自动重启，处理后请重启守护进程".format(
+                item.account))
+            return
+        if run_time >= cfg.supervisor_stable_time:
+            item.failures = 0
+        item.failures += 1
+        backoff = min(cfg.supervisor_backoff_min * 2 ** (item.failures - 1), cfg.supervisor_backoff_max)
+        item.next_start = now + backoff
+        log.warning("[{0}]退出，退出码{1}，运行{2:.0f}秒，{3:.0f}秒后重启（连续第{4}次）".format(
+            item.account, code, run_time, backoff, item.failures))
+
+    def check_stopping(self, item: Worker, now: float):
+        if item.stop_sent_at is not None and now - item.stop_sent_at > cfg.dashboard_stop_timeout:
+            log.warning("[{0}]未能按时退出，强制结束".format(item.account))
+            item.kill()
+
+    # 长时间没有状态更新视为卡死
+    def check_hang(self, item: Worker, now: float):
+        if item.recycling or now - item.started_at < cfg.supervisor_hang_timeout:
+            return
+        mtime = state.state_mtime(item.account)
+        if time.time() - mtime > cfg.supervisor_hang_timeout:
+            log.warning("[{0}]超过{1}秒没有状态更新，回收重启".format(item.account, cfg.supervisor_hang_timeout))
+            self.recycle(item)
+
+    # 按登记表统计每个账号的进程（python + chromedriver + chrome 及其子进程）的内存，不遍历整个进程表
+    def check_memory(self):
+        import psutil
+        running = [item for item in self.workers if item.running()]
+        if not running:
+            return
+        entries = {entry.get("account"): entry for entry in utils.registered_entries()}
+        for item in running:
+            roots = []
+            try:
+                roots.append(psutil.Process(item.process.pid))
+            except psutil.Error:
+                pass
+            entry = entries.get(item.account)
+            if entry:
+                for record in [entry.get("python")] + utils.entry_records(entry):
+                    proc = utils.find_process(record)
+                    if proc:
+                        roots.append(proc)
+            total = 0
+            seen = set()
+            for root in roots:
+                try:
+                    procs = [root] + root.children(recursive=True)
+                except psutil.Error:
+                    procs = [root]
+                for proc in procs:
+                    if proc.pid in seen:
+                        continue
+                    seen.add(proc.pid)
+                    try:
+                        total += proc.memory_info().rss
+                    except psutil.Error:
+                        pass
+            item.rss_mb = total / 1024 / 1024
+            log.debug("[{0}]内存: {1:.0f}MB".format(item.account, item.rss_mb))
+            if item.rss_mb > self.memory_cap_mb and not item.recycling:
+                log.warning("[{0}]内存{1:.0f}MB超过上限{2}MB，回收重启".format(item.account, item.rss_mb,
+                                                                      self.memory_cap_mb))
+                self.recycle(item)
+
+    def recycle(self, item: Worker):
+        item.recycling = True
+        item.stop()
+
+    # 每次最多启动一个账号，两次启动至少间隔 launch_interval 秒
+    def launch_next(self, now: float):
+        if now - self.last_launch < self.launch_interval:
+            return
+        waiting = [item for item in self.workers
+                   if item.process is None and not item.fatal and item.next_start <= now]
+        if not waiting:
+            return
+        item = min(waiting, key=lambda x: x.next_start)
+        item.start()
+        self.last_launch = now
+
+    def stop_all(self):
+        for item in self.workers:
+            item.stop()
+        deadline = time.monotonic() + cfg.dashboard_stop_timeout
+        while time.monotonic() < deadline and any(item.running() for item in self.workers):
+            time.sleep(1)
+        for item in self.workers:
+            if item.running():
+                item.kill()
+        log.info("全部账号已停止")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多账号守护进程")
+    parser.add_argument("configs", nargs="+", help="账号配置文件（单账号或多账号），或配置文件所在目录")
+    parser.add_argument("--memory-cap", type=int, default=cfg.supervisor_memory_cap_mb,
+                        help="单个账号的内存上限（MB）")
+    parser.add_argument("--launch-interval", type=int, default=cfg.supervisor_launch_interval,
+                        help="相邻两个账号启动的最小间隔（秒）")
+    args = parser.parse_args()
+    config_files = []
+    for item in args.configs:
+        if os.path.isdir(item):
+            config_files.extend(sorted(os.path.join(item, name) for name in os.listdir(item)
+                                       if name.endswith(".yml")))
+        else:
+            config_files.append(item)
+    logger.init_loger("supervisor")
+    log.info("守护进程启动: {0}".format(utils.show_time(datetime.now())))
+    Supervisor(config_files, args.memory_cap, args.launch_interval).run_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,17 @@
-import psutil
 from datetime import datetime
 import platform
-from typing import List
+from typing import List, TYPE_CHECKING
+from contextlib import contextmanager
+import threading
 import shutil
+import glob
+import json
+import time
 import os
+from settings import cfg
+
+if TYPE_CHECKING:
+    import psutil
 
 def show_time(t):
     if isinstance(t, datetime):
@@ -37,7 +45,139 @@ plat.driver_path = shutil.which(plat.chromedriver)
 if not plat.driver_path:
     plat.driver_path = os.path.join(os.path.split(os.path.realpath(__file__))[0], plat.chromedriver)
 
+# 农民进程的退出码，守护进程据此决定是否重启
+class ExitCode:
+    # 按请求停止
+    Stopped = 0
+    # 异常退出，可以重启
+    Crashed = 1
+    # 需要人工处理（cookie失效、不可恢复的错误），重启也无法恢复
+    Fatal = 2
+
+
+# 记录启动各阶段的耗时，可在多个线程中同时使用
+class StageTimer:
+    def __init__(self):
+        self.begin = time.perf_counter()
+        # (阶段名, 开始时间偏移, 耗时)
+        self.stages = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stages.append((name, start - self.begin, time.perf_counter() - start))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.begin
+
+    def report(self) -> List[str]:
+        lines = ["启动耗时统计:"]
+        with self.lock:
+            stages = sorted(self.stages, key=lambda item: item[1])
+        for name, offset, seconds in stages:
+            lines.append("  [{0}] 开始于{1:.2f}秒 耗时{2:.2f}秒".format(name, offset, seconds))
+        lines.append("  总耗时{0:.2f}秒".format(self.elapsed()))
+        return lines
+
+
+# 进程登记：每个农民把自己的 python、chromedriver、chrome 进程号记录在 cfg.path_registry 下，
+# 清理时只检查登记过的进程，不再遍历整个系统进程表。
+# 同时记录进程创建时间，进程号被系统复用时不会误杀。
+# psutil 只在清理进程时用到，延迟导入以加快启动
+def process_record(pid: int) -> dict:
+    import psutil
+    try:
+        proc = psutil.Process(pid)
+        return {"pid": pid, "name": proc.name(), "create_time": proc.create_time()}
+    except psutil.Error:
+        return None
+
+
+# 登记的进程是否还是原来那个进程
+def find_process(record: dict):
+    import psutil
+    if not record:
+        return None
+    try:
+        proc = psutil.Process(record["pid"])
+        if abs(proc.create_time() - record["create_time"]) > 0.5:
+            return None
+        return proc
+    except psutil.Error:
+        return None
+
+
+def registry_path(account: str) -> str:
+    return os.path.join(cfg.path_registry, "{0}.json".format(account))
+
+
+# 登记当前农民进程，driver_pid 为 chromedriver（直连浏览器时为空），browser_pids 为 chrome 主进程
+def register_farmer(account: str, driver_pid: int = None, browser_pids: List[int] = ()):
+    import psutil
+    if driver_pid and not browser_pids:
+        # 只在登记时查询一次 chromedriver 的子进程
+        try:
+            browser_pids = [item.pid for item in psutil.Process(driver_pid).children()]
+        except psutil.Error:
+            browser_pids = []
+    entry = {
+        "account": account,
+        "python": process_record(os.getpid()),
+        "chromedriver": process_record(driver_pid) if driver_pid else None,
+        "chrome": [item for item in map(process_record, browser_pids) if item],
+    }
+    if not os.path.exists(cfg.path_registry):
+        os.makedirs(cfg.path_registry, exist_ok=True)
+    tmp_path = registry_path(account) + ".tmp"
+    with open(tmp_path, "w", encoding="utf8") as file:
+        json.dump(entry, file)
+    os.replace(tmp_path, registry_path(account))
+    return entry
+
+
+def unregister_farmer(account: str):
+    try:
+        os.remove(registry_path(account))
+    except OSError:
+        pass
+
+
+def registered_entries() -> List[dict]:
+    entries = []
+    for path in glob.glob(os.path.join(cfg.path_registry, "*.json")):
+        try:
+            with open(path, "r", encoding="utf8") as file:
+                entries.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return entries
+
+
+def entry_records(entry: dict) -> List[dict]:
+    records = [entry.get("chromedriver")] + entry.get("chrome", [])
+    return [item for item in records if item]
+
+
+# 只结束登记过的进程，chrome 的渲染等子进程会随主进程退出
+def kill_record(record: dict) -> bool:
+    import psutil
+    proc = find_process(record)
+    if not proc:
+        return False
+    try:
+        proc.kill()
+        return True
+    except psutil.Error:
+        return False
+
+
 def kill_process_tree_by_id(pid: int):
+    import psutil
     try:
         parent = psutil.Process(pid)
         process: List[psutil.Process] = parent.children(recursive=True)
@@ -52,46 +192,52 @@ def kill_process_tree_by_id(pid: int):
 
 
 def kill_process_tree_by_name(name: str):
-    for proc in psutil.process_iter():
-        if proc.name() == name:
-            kill_process_tree_by_id(proc.pid)
+    for entry in registered_entries():
+        for record in [entry.get("python")] + entry_records(entry):
+            if record and record["name"] == name:
+                kill_record(record)
 
 
-def all_webdriver() -> List[psutil.Process]:
+def all_webdriver() -> List["psutil.Process"]:
     process = []
-    for item in psutil.process_iter():
-        if item.name() == plat.chromedriver:
-            process.append(item)
+    for entry in registered_entries():
+        proc = find_process(entry.get("chromedriver"))
+        if proc:
+            process.append(proc)
     return process
 
 
 def clear_all_webdriver():
-    process = all_webdriver()
-    for item in process:
-        kill_process_tree_by_id(item.pid)
+    for entry in registered_entries():
+        for record in entry_records(entry):
+            kill_record(record)
 
 
 def clear_all_farmer():
-    for item in psutil.process_iter():
-        if item.name() == plat.python and "main.py" in item.cmdline():
-            kill_process_tree_by_id(item.pid)
-    clear_all_webdriver()
+    for entry in registered_entries():
+        python = entry.get("python")
+        if python and python["pid"] != os.getpid():
+            kill_record(python)
+        for record in entry_records(entry):
+            kill_record(record)
+        unregister_farmer(entry["account"])
 
 
+# 登记的 python 进程已不存在（或已被复用）时，结束它留下的 chromedriver 和 chrome，并删除登记
 def clear_orphan_webdriver():
-    process = all_webdriver()
     killed = []
-    for item in process:
-        if not item.parent():
-            kill_process_tree_by_id(item.pid)
-            killed.append(item)
-        elif item.parent().name().lower() == "systemd":
-            kill_process_tree_by_id(item.pid)
-            killed.append(item)
+    for entry in registered_entries():
+        if find_process(entry.get("python")):
+            continue
+        for record in entry_records(entry):
+            if kill_record(record):
+                killed.append(record)
+        unregister_farmer(entry["account"])
     return killed
 
 
 def test():
+    import psutil
     proc_list = []
     for proc in psutil.process_iter():
         if "python.exe" in proc.name():